@@ -0,0 +1,242 @@
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from main import (
+    AuthWorker, Exporter, ReportProcessor, export_via_selenium, drain_outbox, create_run_metrics
+)
+from date_selector import DateSelector
+from http_exporter import HttpExporter
+from chunked_export import ChunkedExporter
+from date_ranges import parse_range_spec, report_file_name, DATETIME_FORMAT
+from config import (
+    LOGGER_NAME, HTTP_EXPORT_ENABLED, FILE_FORMAT_TEXT, CHUNKING_ENABLED, CHUNK_SPAN, CHUNK_MAX_WORKERS
+)
+
+logger = logging.getLogger(LOGGER_NAME)
+
+class BatchRunner:
+    """
+    Выгружает несколько периодов в одной авторизованной сессии.
+    Вход и запуск браузера выполняются один раз на всю пачку.
+    """
+    def __init__(self, ranges, send=False, use_http=HTTP_EXPORT_ENABLED, auth_worker=None,
+                 chunk_span=CHUNK_SPAN if CHUNKING_ENABLED else None, chunk_workers=CHUNK_MAX_WORKERS):
+        """
+        :param chunk_span: Разбиение длинных периодов ('auto', day, week, month, Nd) или None.
+        """
+        self.ranges = ranges
+        self.send = send
+        self.use_http = use_http
+        self.auth_worker = auth_worker or AuthWorker()
+        self.download_dir = self.auth_worker.download_dir
+        self.http_exporter = None
+        self.date_selector = None
+        self.exporter = None
+        self.browser_failed = False
+        self.chunker = None
+        if chunk_span:
+            self.chunker = ChunkedExporter(
+                self.download_dir, span=chunk_span, workers=chunk_workers, use_http=use_http,
+                fallback=self._export_selenium,
+                session_cache_path=self.auth_worker.session_cache.cache_path,
+            )
+
+    def _ensure_http(self):
+        if self.http_exporter is None:
+            self.http_exporter = HttpExporter(
+                self.download_dir, session_cache_path=self.auth_worker.session_cache.cache_path
+            )
+            if not self.http_exporter.login():
+                # Сбой может быть временным: вход повторится для следующего периода
+                logger.warning("HTTP-вход не удался. Период будет выгружен через браузер.")
+                self.http_exporter.close()
+                self.http_exporter = None
+                return False
+        return True
+
+    def _ensure_browser(self):
+        if self.date_selector is None and not self.browser_failed:
+            if not self.auth_worker.login():
+                self.browser_failed = True
+                return False
+            driver = self.auth_worker.get_driver()
+            self.date_selector = DateSelector(driver)
+            self.exporter = Exporter(driver)
+        return not self.browser_failed
+
+    def warm_up(self, browser=False):
+        """
+        Заранее выполняет вход, чтобы первый экспорт не ждал авторизации.
+        Браузер запускается, если об этом просят или HTTP-экспорт недоступен.
+        """
+        http_ready = self.use_http and self._ensure_http()
+        if browser or not http_ready:
+            self._ensure_browser()
+
+    def refresh_sessions(self):
+        """
+        Проверяет уже открытые сессии и сбрасывает истекшие, чтобы
+        следующий экспорт выполнил повторный вход.
+        """
+        if self.http_exporter and not self.http_exporter.session_alive():
+            logger.info("HTTP-сессия истекла. Следующий экспорт выполнит повторный вход.")
+            self.http_exporter.close()
+            self.http_exporter = None
+        if self.date_selector and not self.auth_worker.is_session_alive():
+            logger.info("Сессия браузера истекла. Браузер будет перезапущен.")
+            self.auth_worker.cleanup()
+            self.date_selector = None
+            self.exporter = None
+
+    def export_range(self, start_dt, end_dt, report_type=None):
+        """
+        Выгружает один период и сохраняет файл под детерминированным именем.
+        Возвращает (путь, способ) или (None, описание ошибки).
+        """
+        start_date_str = start_dt.strftime(DATETIME_FORMAT)
+        end_date_str = end_dt.strftime(DATETIME_FORMAT)
+
+        if self.chunker and self.chunker.should_split(start_dt, end_dt, report_type or FILE_FORMAT_TEXT):
+            # Вход заранее: потоки частей восстанавливают сессию из кэша cookie
+            self.chunker.use_http = self.use_http and self._ensure_http()
+            with self.auth_worker.stage("chunked_export") as span:
+                file_path = self.chunker.export(start_dt, end_dt, report_type or FILE_FORMAT_TEXT)
+                if not file_path:
+                    span.fail()
+            if file_path:
+                return file_path, "chunked"
+            return None, "не удалось выгрузить период частями"
+
+        if self.use_http and self._ensure_http():
+            with self.auth_worker.stage("http_export") as span:
+                file_path = self.http_exporter.export(start_date_str, end_date_str, report_type)
+                if not file_path:
+                    span.fail()
+            if file_path:
+                return self._rename(file_path, start_dt, end_dt), "http"
+            logger.warning("HTTP-экспорт периода не удался. Пробуем через браузер.")
+
+        if not self._ensure_browser():
+            return None, "не удалось авторизоваться в браузере"
+        file_path = self._export_selenium(start_dt, end_dt, report_type)
+        if not file_path:
+            return None, "не удалось выгрузить отчет через браузер"
+        return self._rename(file_path, start_dt, end_dt), "selenium"
+
+    def _export_selenium(self, start_dt, end_dt, report_type=None):
+        if not self._ensure_browser():
+            return None
+        self.exporter.report_type = report_type or FILE_FORMAT_TEXT
+        return export_via_selenium(
+            self.auth_worker, start_dt.strftime(DATETIME_FORMAT), end_dt.strftime(DATETIME_FORMAT),
+            self.date_selector, self.exporter
+        )
+
+    def _rename(self, file_path, start_dt, end_dt):
+        extension = os.path.splitext(file_path)[1]
+        target_path = os.path.join(self.download_dir, report_file_name(start_dt, end_dt, extension))
+        if os.path.abspath(file_path) != os.path.abspath(target_path):
+            os.replace(file_path, target_path)
+        return target_path
+
+    def run_one(self, start_dt, end_dt, report_type=None):
+        """
+        Выгружает один период (и при необходимости отправляет письмо).
+        Возвращает запись манифеста.
+        """
+        started = time.time()
+        metrics = create_run_metrics(
+            start_dt.strftime(DATETIME_FORMAT), end_dt.strftime(DATETIME_FORMAT), report_type
+        )
+        self.auth_worker.metrics = metrics
+        entry = {
+            "start": start_dt.strftime(DATETIME_FORMAT),
+            "end": end_dt.strftime(DATETIME_FORMAT),
+            "report_type": report_type or FILE_FORMAT_TEXT,
+            "status": "failed",
+            "file": None,
+            "method": None,
+            "error": None,
+        }
+        try:
+            file_path, detail = self.export_range(start_dt, end_dt, report_type)
+            if file_path:
+                entry.update(status="ok", file=file_path, method=detail)
+                processor = ReportProcessor(file_path, start_dt, end_dt, entry, stage=self.auth_worker.stage)
+                if not processor.run(send=self.send):
+                    entry["status"] = "exported"
+            else:
+                entry["error"] = detail
+        except Exception as e:
+            logger.error(f"❌ Ошибка при выгрузке периода: {e}")
+            entry["error"] = str(e)
+        entry["duration_sec"] = round(time.time() - started, 2)
+        if metrics:
+            metrics.finish("ok" if entry["status"] == "ok" else "error")
+        self.auth_worker.metrics = None
+        return entry
+
+    def run(self):
+        """
+        Выгружает все периоды и записывает манифест с результатом по каждому.
+        Возвращает список записей манифеста.
+        """
+        manifest = []
+        try:
+            for index, (start_dt, end_dt) in enumerate(self.ranges, 1):
+                logger.info(f"Период {index}/{len(self.ranges)}: {start_dt:%Y-%m-%d} — {end_dt:%Y-%m-%d}")
+                manifest.append(self.run_one(start_dt, end_dt))
+        finally:
+            self.close()
+
+        write_manifest(manifest, self.download_dir)
+        if self.send:
+            drain_outbox()
+        return manifest
+
+    def close(self):
+        if self.chunker:
+            self.chunker.close()
+        if self.http_exporter:
+            self.http_exporter.close()
+            self.http_exporter = None
+        self.auth_worker.cleanup()
+
+def write_manifest(manifest, directory, prefix="batch_manifest"):
+    """
+    Сохраняет манифест пакетной выгрузки в JSON и возвращает путь к нему.
+    """
+    manifest_path = os.path.join(directory, f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    succeeded = sum(1 for entry in manifest if entry["status"] == "ok")
+    logger.info(f"Пакетная выгрузка завершена: {succeeded}/{len(manifest)} успешно. Манифест: {manifest_path}")
+    return manifest_path
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Пакетная выгрузка отчетов за несколько периодов.")
+    parser.add_argument(
+        "ranges", nargs="+",
+        help="Периоды: '2025-01-01..2025-02-01' или '2025-01-01..2025-10-01 by week' (шаг: day, week, month, Nd)"
+    )
+    parser.add_argument("--send", action="store_true", help="Отправлять каждый отчет по почте")
+    parser.add_argument("--no-http", action="store_true", help="Не использовать HTTP-экспорт, только браузер")
+    parser.add_argument("--chunk", default=CHUNK_SPAN if CHUNKING_ENABLED else None,
+                        help="Разбиение длинных периодов: auto, day, week, month, Nd")
+    parser.add_argument("--no-chunk", action="store_true", help="Не делить длинные периоды на части")
+    parser.add_argument("--chunk-workers", type=int, default=CHUNK_MAX_WORKERS, help="Параллельных выгрузок частей")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    ranges = []
+    for spec in args.ranges:
+        ranges.extend(parse_range_spec(spec))
+    runner = BatchRunner(ranges, send=args.send, use_http=HTTP_EXPORT_ENABLED and not args.no_http,
+                         chunk_span=None if args.no_chunk else args.chunk, chunk_workers=args.chunk_workers)
+    manifest = runner.run()
+    if any(entry["status"] != "ok" for entry in manifest):
+        raise SystemExit(1)
@@ -0,0 +1,342 @@
+import argparse
+import json
+import logging
+import os
+import smtplib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from mock_zkbio import MockSettings, MockZKBioServer, SmtpSink
+
+# Конфиг варианта (корень или v02) импортируется только в дочернем процессе,
+# поэтому имя логгера здесь задано явно.
+logger = logging.getLogger("stat2serg_logger")
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULT_MARKER = "BENCH_RESULT "
+
+# Вариант → каталог, из которого импортируются config и main
+VARIANTS = {
+    "root": {"dir": ROOT_DIR},
+    "root-clickwalk": {"dir": ROOT_DIR},
+    "root-http": {"dir": ROOT_DIR},
+    "v02": {"dir": os.path.join(ROOT_DIR, "v02")},
+}
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+# --- Дочерний процесс: один прогон одного варианта ---
+
+def _patch_config(variant, base_url, smtp_port, workdir):
+    """
+    Направляет конфиг варианта на локальные заглушки. Вызывается до импорта main,
+    чтобы значения попали и в `from config import ...`, и в аргументы по умолчанию.
+    """
+    sys.path.insert(0, VARIANTS[variant]["dir"])
+    import config
+    config.LOGIN_URL = f"{base_url}/bioLogin.do"
+    config.USERNAME = "admin"
+    config.PASSWORD = "admin"
+    config.SMTP_SERVER_OUT = "127.0.0.1"
+    config.EMAIL_ACCOUNT_OUT = "stat2serg@localhost"
+    config.EMAIL_PASSWORD_OUT = "benchmark"
+    config.EMAIL_RECEIVER = "reports@localhost"
+    config.CHROME_PROFILE_PATH = os.path.join(workdir, "profile")
+    if variant.startswith("root"):
+        config.EXPORT_URL = f"{base_url}/accTransaction.do?export"
+        config.SESSION_CHECK_URL = f"{base_url}/main.do"
+        config.SESSION_CACHE_PATH = os.path.join(workdir, "session.json")
+        config.METRICS_JSONL_PATH = os.path.join(workdir, "metrics", "runs.jsonl")
+        config.METRICS_TEXTFILE_PATH = os.path.join(workdir, "metrics", "stat2serg.prom")
+        # Состояние между запусками (история задержек, кэш селекторов, чекпоинты, базы)
+        # не должно переходить из прогона в прогон и попадать в рабочие файлы
+        config.LATENCY_HISTORY_PATH = os.path.join(workdir, "metrics", "latency_history.json")
+        config.SELECTOR_CACHE_PATH = os.path.join(workdir, "selector_cache.json")
+        config.CHECKPOINT_DIR = os.path.join(workdir, "checkpoints")
+        config.EVENT_STORE_PATH = os.path.join(workdir, "events.sqlite3")
+        config.OUTBOX_PATH = os.path.join(workdir, "outbox.sqlite3")
+
+    # EmailSender всегда подключается к порту 587 и делает STARTTLS
+    base_smtp = smtplib.SMTP
+
+    class SinkSMTP(base_smtp):
+        def __init__(self, host="", port=0, *args, **kwargs):
+            super().__init__("127.0.0.1", smtp_port, *args, **kwargs)
+
+        def starttls(self, *args, **kwargs):
+            return (220, b"TLS not used by benchmark sink")
+
+    smtplib.SMTP = SinkSMTP
+
+def _run_root(variant, start_str, end_str, download_dir):
+    from main import AuthWorker, export_via_selenium, export_via_http, send_report
+    from date_selector import DateSelector
+    from run_metrics import RunMetrics
+    import config
+
+    auth_worker = AuthWorker(download_dir=download_dir)
+    metrics = RunMetrics(start_str, end_str, config.FILE_FORMAT_TEXT,
+                         config.METRICS_JSONL_PATH, config.METRICS_TEXTFILE_PATH)
+    auth_worker.metrics = metrics
+    start_dt = datetime.strptime(start_str, "%Y-%m-%d %H:%M:%S")
+    end_dt = datetime.strptime(end_str, "%Y-%m-%d %H:%M:%S")
+    file_path = None
+    sent = False
+    try:
+        if variant == "root-http":
+            with auth_worker.stage("http_export") as span:
+                file_path = export_via_http(download_dir, start_str, end_str)
+                if not file_path:
+                    span.fail()
+        elif auth_worker.login():
+            date_selector = DateSelector(auth_worker.get_driver(),
+                                         use_calendar_api=(variant != "root-clickwalk"))
+            file_path = export_via_selenium(auth_worker, start_str, end_str, date_selector=date_selector)
+        if file_path:
+            with auth_worker.stage("email") as span:
+                sent = send_report(file_path, start_dt, end_dt)
+                if not sent:
+                    span.fail()
+    finally:
+        auth_worker.cleanup()
+    metrics.finish("ok" if sent else "error")
+    return {
+        "ok": sent,
+        "file": file_path,
+        "stages": {span.name: round(span.duration, 3) for span in metrics.spans},
+        "failed": [span.name for span in metrics.spans if span.outcome != "ok"],
+    }
+
+def _run_v02(start_str, end_str, download_dir):
+    """
+    Повторяет сценарий v02/main.py, замеряя каждый этап.
+    """
+    from main import AuthWorker, Exporter, find_new_file
+    from date_selector import DateSelector
+    from email_sender import EmailSender
+    from calendar_script import SET_DATE_SCRIPT
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    import config
+
+    stages = {}
+    failed = []
+
+    def timed(name, func):
+        started = time.time()
+        try:
+            result = func()
+        except Exception as e:
+            logger.error(f"❌ Этап {name} завершился ошибкой: {e}")
+            result = None
+        stages[name] = round(time.time() - started, 3)
+        if not result:
+            failed.append(name)
+        return result
+
+    auth_worker = AuthWorker()
+    auth_worker.download_dir = download_dir
+    file_path = None
+    sent = False
+    try:
+        if timed("login", auth_worker.login):
+            driver = auth_worker.get_driver()
+            date_selector = DateSelector(driver, set_date_script=SET_DATE_SCRIPT)
+            if timed("date_from", lambda: date_selector.select_date_and_time('Время с', start_str)) and \
+                    timed("date_to", lambda: date_selector.select_date_and_time('До', end_str)):
+                def search():
+                    WebDriverWait(driver, 10).until(EC.element_to_be_clickable(
+                        (By.XPATH, "//div[contains(@class, 'search_button_new') and @title='Поиск']")
+                    )).click()
+                    # Фиксированная пауза, как в v02/main.py
+                    time.sleep(5)
+                    return True
+                if timed("search", search):
+                    initial_files = os.listdir(download_dir)
+                    exporter = Exporter(driver)
+                    if timed("export_click", exporter.click_export_button_sequentially) and \
+                            timed("popup", exporter.interact_with_export_popup):
+                        file_path = timed("download", lambda: find_new_file(download_dir, initial_files))
+        if file_path:
+            email_sender = EmailSender(config.SMTP_SERVER_OUT, config.EMAIL_ACCOUNT_OUT, config.EMAIL_PASSWORD_OUT)
+            sent = timed("email", lambda: email_sender.send_email_with_attachment(
+                config.EMAIL_RECEIVER, "отчет за указанный период", "benchmark", file_path
+            ))
+    finally:
+        auth_worker.cleanup()
+    return {"ok": bool(sent), "file": file_path, "stages": stages, "failed": failed}
+
+def run_child(args):
+    workdir = tempfile.mkdtemp(prefix=f"stat2serg_bench_{args.child}_")
+    download_dir = os.path.join(workdir, "downloads")
+    os.makedirs(download_dir)
+    _patch_config(args.child, args.base_url, args.smtp_port, workdir)
+
+    end_dt = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start_dt = end_dt - timedelta(days=args.days)
+    start_str = start_dt.strftime("%Y-%m-%d %H:%M:%S")
+    end_str = end_dt.strftime("%Y-%m-%d %H:%M:%S")
+
+    started = time.time()
+    if args.child == "v02":
+        result = _run_v02(start_str, end_str, download_dir)
+    else:
+        result = _run_root(args.child, start_str, end_str, download_dir)
+    result["total"] = round(time.time() - started, 3)
+    result["file_size"] = os.path.getsize(result["file"]) if result.get("file") and os.path.exists(result["file"]) else 0
+    print(RESULT_MARKER + json.dumps(result, ensure_ascii=False), flush=True)
+
+# --- Родительский процесс: заглушки, прогоны, сводка ---
+
+def run_variant(variant, args, base_url, smtp_port):
+    command = [
+        sys.executable, os.path.abspath(__file__), "--child", variant,
+        "--base-url", base_url, "--smtp-port", str(smtp_port), "--days", str(args.days),
+    ]
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=args.run_timeout)
+    except subprocess.TimeoutExpired:
+        logger.error(f"❌ Вариант {variant}: прогон не уложился в {args.run_timeout} с.")
+        return {"ok": False, "stages": {}, "failed": ["timeout"], "total": args.run_timeout}
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    logger.error(f"❌ Вариант {variant}: нет результата (код {completed.returncode}).\n{completed.stderr[-2000:]}")
+    return {"ok": False, "stages": {}, "failed": ["crash"], "total": 0}
+
+def summarize(runs):
+    stages = {}
+    for run in runs:
+        for name, duration in list(run["stages"].items()) + [("total", run["total"])]:
+            stages.setdefault(name, []).append(duration)
+    summary = {}
+    for name, values in stages.items():
+        summary[name] = {
+            "median": round(statistics.median(values), 3),
+            "p95": round(percentile(values, 0.95), 3),
+            "min": round(min(values), 3),
+            "max": round(max(values), 3),
+            "n": len(values),
+        }
+    return summary
+
+def compare(report, baseline, max_regression, min_delta):
+    """
+    Сравнивает медианы этапов с эталоном. Возвращает список регрессий.
+    """
+    regressions = []
+    for variant, data in report["variants"].items():
+        base_variant = baseline.get("variants", {}).get(variant)
+        if not base_variant:
+            continue
+        for stage, stats in data["stages"].items():
+            base_stats = base_variant["stages"].get(stage)
+            if not base_stats:
+                continue
+            limit = base_stats["median"] * (1 + max_regression)
+            if stats["median"] > limit and stats["median"] - base_stats["median"] > min_delta:
+                regressions.append({
+                    "variant": variant, "stage": stage,
+                    "baseline": base_stats["median"], "current": stats["median"],
+                })
+    return regressions
+
+def run_benchmark(args):
+    settings = MockSettings(rows=args.rows, latency=args.latency, throughput=args.throughput,
+                            grid_latency_ms=args.grid_latency_ms)
+    server = MockZKBioServer(settings).start()
+    sink = SmtpSink().start()
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "settings": {"rows": args.rows, "latency": args.latency, "throughput": args.throughput,
+                     "grid_latency_ms": args.grid_latency_ms, "runs": args.runs, "days": args.days},
+        "variants": {},
+    }
+    try:
+        for variant in args.variants:
+            runs = []
+            for index in range(args.runs):
+                messages_before = len(sink.messages)
+                result = run_variant(variant, args, server.base_url, sink.address[1])
+                result["emails"] = len(sink.messages) - messages_before
+                runs.append(result)
+                status = "✅" if result["ok"] else f"❌ ({', '.join(result['failed'])})"
+                logger.info(f"{variant} #{index + 1}: {result['total']:.2f} с {status}")
+            report["variants"][variant] = {
+                "success": sum(1 for run in runs if run["ok"]),
+                "runs": len(runs),
+                "stages": summarize(runs),
+            }
+    finally:
+        server.stop()
+        sink.stop()
+    return report
+
+def print_report(report):
+    for variant, data in report["variants"].items():
+        logger.info(f"=== {variant}: успешно {data['success']}/{data['runs']} ===")
+        for stage, stats in data["stages"].items():
+            logger.info(f"  {stage:<14} median={stats['median']:.3f} с  p95={stats['p95']:.3f} с  "
+                        f"min={stats['min']:.3f}  max={stats['max']:.3f}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Сквозной бенчмарк экспорта на локальной заглушке ZKBio и SMTP-приемнике."
+    )
+    parser.add_argument("--variants", nargs="+", choices=sorted(VARIANTS), default=["root", "v02"],
+                        help="Какие варианты прогнать (по умолчанию root и v02)")
+    parser.add_argument("--runs", type=int, default=3, help="Прогонов на вариант")
+    parser.add_argument("--rows", type=int, default=5000, help="Строк в синтетической выгрузке")
+    parser.add_argument("--latency", type=float, default=0.5, help="Задержка формирования файла, с")
+    parser.add_argument("--throughput", type=int, default=0, help="Скорость отдачи файла, байт/с (0 — без ограничения)")
+    parser.add_argument("--grid-latency-ms", type=int, default=300, help="Время загрузки грида после Search, мс")
+    parser.add_argument("--days", type=int, default=7, help="Длина выгружаемого периода в днях")
+    parser.add_argument("--run-timeout", type=int, default=300, help="Таймаут одного прогона, с")
+    parser.add_argument("--output", help="Куда сохранить отчет в JSON")
+    parser.add_argument("--baseline", help="Эталонный отчет JSON для поиска регрессий")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Допустимый рост медианы этапа относительно эталона (0.2 = 20%%)")
+    parser.add_argument("--min-delta", type=float, default=0.1,
+                        help="Рост медианы меньше этого значения (с) регрессией не считается")
+    # Служебные параметры дочернего процесса
+    parser.add_argument("--child", choices=sorted(VARIANTS), help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    parser.add_argument("--smtp-port", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.child:
+        run_child(args)
+        sys.exit(0)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(name)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    report = run_benchmark(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        logger.info(f"Отчет сохранен: {args.output}")
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.max_regression, args.min_delta)
+        for item in regressions:
+            logger.error(f"❌ Регрессия {item['variant']}/{item['stage']}: "
+                         f"{item['baseline']:.3f} с → {item['current']:.3f} с")
+        if regressions:
+            exit_code = 1
+        else:
+            logger.info("✅ Регрессий относительно эталона нет.")
+    if any(data["success"] < data["runs"] for data in report["variants"].values()):
+        exit_code = 1
+    sys.exit(exit_code)
@@ -0,0 +1,45 @@
+# Установка даты за один вызов execute_script через объект dhtmlxCalendar,
+# привязанный к полю ввода. Используется обеими версиями DateSelector (корень и v02).
+# Аргументы: заголовок поля, [год, месяц, день, час, минута, секунда], текст для поля.
+# Возвращает {status, calendar, input}: status — 'ok', 'no-input', 'no-calendar' или 'no-date';
+# calendar — дата, которую календарь вернул из getDate() после setDate (до записи в поле),
+# input — значение поля после установки.
+SET_DATE_SCRIPT = """
+var title = arguments[0], parts = arguments[1], text = arguments[2];
+var input = document.evaluate("//input[@title='" + title + "']", document, null,
+    XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+if (!input) { return { status: 'no-input' }; }
+
+function boundTo(obj) {
+    if (!obj || typeof obj !== 'object' || typeof obj.setDate !== 'function' || !obj.i) { return false; }
+    for (var key in obj.i) {
+        if (obj.i[key] && obj.i[key].input === input) { return true; }
+    }
+    return false;
+}
+var calendar = null;
+for (var name in window) {
+    try {
+        if (boundTo(window[name])) { calendar = window[name]; break; }
+    } catch (e) {}
+}
+if (!calendar) { return { status: 'no-calendar' }; }
+
+var date = new Date(parts[0], parts[1] - 1, parts[2], parts[3], parts[4], parts[5]);
+calendar.setDate(date);
+// Проверяем то, что принял календарь, а не текст, который сами запишем в поле
+var actual = typeof calendar.getDate === 'function' ? calendar.getDate() : null;
+if (!actual || typeof actual.getFullYear !== 'function') { return { status: 'no-date' }; }
+var stored = [actual.getFullYear(), actual.getMonth() + 1, actual.getDate(),
+              actual.getHours(), actual.getMinutes(), actual.getSeconds()];
+if (stored.slice(0, 5).join() !== parts.slice(0, 5).join()) {
+    // Календарь не принял дату: поле не трогаем, расхождение увидит вызывающий код
+    return { status: 'ok', calendar: stored, input: input.value };
+}
+
+input.value = text;
+if (typeof calendar.callEvent === 'function') { calendar.callEvent('onClick', [date]); }
+input.dispatchEvent(new Event('change', { bubbles: true }));
+if (typeof calendar.hide === 'function') { calendar.hide(); }
+return { status: 'ok', calendar: stored, input: input.value };
+"""
@@ -0,0 +1,96 @@
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger("stat2serg_logger")
+
+# Этапы выгрузки по порядку. Этапы в браузере имеют смысл только в живой сессии.
+STAGES = ("started", "logged_in", "dates_set", "searched", "exported", "downloaded", "normalized", "stored", "mailed")
+BROWSER_STAGES = ("logged_in", "dates_set", "searched", "exported")
+
+def make_job_id(start_date_str, end_date_str, report_type):
+    """
+    Один и тот же период и формат дают тот же ID, поэтому повторный запуск
+    (например, из cron после сбоя) продолжает незавершенную выгрузку.
+    """
+    start = start_date_str[:10].replace("-", "")
+    end = end_date_str[:10].replace("-", "")
+    return f"{start}_{end}_{report_type.lower()}"
+
+class JobCheckpoint:
+    """
+    Последний успешно пройденный этап выгрузки, сохраняемый в JSON-файл на каждый job_id.
+    """
+    def __init__(self, job_id, directory):
+        self.job_id = job_id
+        self.path = os.path.join(directory, f"{job_id}.json")
+        self.data = self._load() or {"job_id": job_id, "stage": "started", "file": None,
+                                     "attempts": 0, "error": None, "history": []}
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать контрольную точку {self.path}: {e}")
+            return None
+
+    @property
+    def stage(self):
+        return self.data["stage"]
+
+    @property
+    def file(self):
+        return self.data.get("file")
+
+    def reached(self, stage):
+        return STAGES.index(self.stage) >= STAGES.index(stage)
+
+    def advance(self, stage, **fields):
+        self.data["stage"] = stage
+        self.data["error"] = None
+        self.data.update(fields)
+        self.data["history"].append({"stage": stage, "ts": round(time.time(), 3)})
+        self.save()
+        logger.info(f"Контрольная точка {self.job_id}: {stage}")
+
+    def rewind(self, stage, error=None):
+        """
+        Откат к более раннему этапу, например после потери сессии браузера.
+        """
+        if STAGES.index(stage) < STAGES.index(self.stage):
+            self.data["stage"] = stage
+        self.data["error"] = error
+        self.save()
+
+    def start_attempt(self):
+        """
+        Увеличивает общее число попыток по этому job_id за все запуски (для статистики).
+        """
+        self.data["attempts"] += 1
+        self.save()
+        return self.data["attempts"]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.data["updated"] = round(time.time(), 3)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def restore(self, browser_alive):
+        """
+        Приводит загруженную точку в соответствие с реальностью: этапы в браузере
+        без живой сессии не считаются пройденными, скачанный файл должен существовать.
+        """
+        if self.stage in BROWSER_STAGES and not browser_alive:
+            logger.info(f"Контрольная точка {self.job_id}: сессия браузера '{self.stage}' потеряна, начинаем со входа.")
+            self.data["stage"] = "started"
+        if self.reached("downloaded") and self.stage != "mailed" and not (self.file and os.path.exists(self.file)):
+            logger.warning(f"Контрольная точка {self.job_id}: файл {self.file} не найден, выгружаем заново.")
+            self.data["stage"] = "started"
+            self.data["file"] = None
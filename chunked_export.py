@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http_exporter import HttpExporter
+from csv_merge import merge_csv_files
+from date_ranges import split_span, report_file_name, DATETIME_FORMAT
+from config import (
+    CHUNK_SPAN, CHUNK_DEFAULT_SPAN, CHUNK_MIN_DAYS, CHUNK_TARGET_BYTES, CHUNK_MAX_WORKERS,
+    CHUNK_MERGE_EDGE_ROWS, EXPORT_SIZE_HISTORY_PATH, SESSION_CACHE_PATH
+)
+
+logger = logging.getLogger("stat2serg_logger")
+
+class ExportSizeHistory:
+    """
+    Размеры прошлых выгрузок в байтах на сутки периода, по формату отчета.
+    По ним подбирается длина части, чтобы каждая выгрузка была примерно CHUNK_TARGET_BYTES.
+    """
+    def __init__(self, path, window=50):
+        self.path = path
+        self.window = window
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.samples = json.load(f)
+        except (OSError, ValueError):
+            self.samples = {}
+
+    def record(self, report_type, size_bytes, start_dt, end_dt):
+        days = max((end_dt - start_dt).total_seconds() / 86400, 1 / 24)
+        with self._lock:
+            values = self.samples.setdefault(report_type.upper(), [])
+            values.append(round(size_bytes / days))
+            del values[:-self.window]
+
+    def bytes_per_day(self, report_type, fraction=0.9):
+        values = sorted(self.samples.get(report_type.upper(), []))
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(fraction * len(values)))]
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with self._lock, open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.samples, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить историю размеров {self.path}: {e}")
+
+class ChunkedExporter:
+    """
+    Выгружает длинный период частями: части скачиваются параллельно через HTTP
+    (у каждого потока своя сессия из общего кэша cookie), не выгрузившиеся — через
+    fallback (обычно браузер, последовательно), затем CSV склеиваются за один проход.
+    """
+    def __init__(self, download_dir, span=CHUNK_SPAN, workers=CHUNK_MAX_WORKERS, use_http=True,
+                 fallback=None, session_cache_path=SESSION_CACHE_PATH, size_history=None):
+        """
+        :param span: 'auto' или шаг разбиения (day, week, month, Nd).
+        :param fallback: callable(start_dt, end_dt, report_type) -> путь к файлу или None.
+        """
+        self.download_dir = download_dir
+        self.span = span
+        self.workers = workers
+        self.use_http = use_http
+        self.fallback = fallback
+        self.session_cache_path = session_cache_path
+        self.size_history = size_history or ExportSizeHistory(EXPORT_SIZE_HISTORY_PATH)
+        self._local = threading.local()
+        self._exporters = []
+        self._lock = threading.Lock()
+
+    def should_split(self, start_dt, end_dt, report_type):
+        if report_type.upper() != "CSV":
+            return False
+        return (end_dt - start_dt).days >= CHUNK_MIN_DAYS and len(self.plan(start_dt, end_dt, report_type)) > 1
+
+    def chunk_span(self, report_type):
+        if self.span != "auto":
+            return self.span
+        bytes_per_day = self.size_history.bytes_per_day(report_type)
+        if not bytes_per_day:
+            return CHUNK_DEFAULT_SPAN
+        return f"{max(1, int(CHUNK_TARGET_BYTES // bytes_per_day))}d"
+
+    def plan(self, start_dt, end_dt, report_type):
+        return split_span(start_dt, end_dt, self.chunk_span(report_type))
+
+    def export(self, start_dt, end_dt, report_type="CSV"):
+        """
+        Возвращает путь к склеенному файлу или None, если хотя бы одна часть не выгрузилась.
+        """
+        chunks = self.plan(start_dt, end_dt, report_type)
+        logger.info(f"Период {start_dt:%Y-%m-%d} — {end_dt:%Y-%m-%d} делится на {len(chunks)} частей "
+                    f"({self.chunk_span(report_type)}), потоков: {min(self.workers, len(chunks))}.")
+        chunk_dir = os.path.join(self.download_dir, f"chunks_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}")
+        os.makedirs(chunk_dir)
+        started = time.time()
+        files = [None] * len(chunks)
+        try:
+            if self.use_http:
+                with ThreadPoolExecutor(max_workers=min(self.workers, len(chunks)),
+                                        thread_name_prefix="chunk") as pool:
+                    futures = [
+                        pool.submit(self._export_http, chunk_dir, index, chunk_start, chunk_end, report_type)
+                        for index, (chunk_start, chunk_end) in enumerate(chunks)
+                    ]
+                    files = [future.result() for future in futures]
+
+            for index, (chunk_start, chunk_end) in enumerate(chunks):
+                if files[index] is None and self.fallback:
+                    logger.info(f"Часть {chunk_start:%Y-%m-%d} — {chunk_end:%Y-%m-%d} выгружаем запасным способом.")
+                    file_path = self.fallback(chunk_start, chunk_end, report_type)
+                    if file_path:
+                        files[index] = self._keep_chunk(file_path, chunk_dir, index, chunk_start, chunk_end, report_type)
+
+            missing = [f"{s:%Y-%m-%d}" for (s, _), path in zip(chunks, files) if path is None]
+            if missing:
+                logger.error(f"❌ Не выгружены части, начинающиеся с: {', '.join(missing)}.")
+                return None
+
+            output_path = os.path.join(self.download_dir, report_file_name(start_dt, end_dt, ".csv"))
+            merge_csv_files(files, output_path, CHUNK_MERGE_EDGE_ROWS)
+            self.size_history.save()
+            logger.info(f"✅ Период выгружен частями за {time.time() - started:.1f} с: {os.path.basename(output_path)}")
+            return output_path
+        finally:
+            shutil.rmtree(chunk_dir, ignore_errors=True)
+
+    def _http_exporter(self, chunk_dir):
+        exporter = getattr(self._local, "exporter", None)
+        if exporter is None:
+            exporter = HttpExporter(chunk_dir, session_cache_path=self.session_cache_path)
+            if not exporter.login():
+                exporter.close()
+                return None
+            self._local.exporter = exporter
+            with self._lock:
+                self._exporters.append(exporter)
+        exporter.download_dir = chunk_dir
+        return exporter
+
+    def _export_http(self, chunk_dir, index, chunk_start, chunk_end, report_type):
+        try:
+            exporter = self._http_exporter(chunk_dir)
+            if exporter is None:
+                return None
+            file_path = exporter.export(
+                chunk_start.strftime(DATETIME_FORMAT), chunk_end.strftime(DATETIME_FORMAT), report_type,
+                file_name=f"chunk_{index:03d}.{report_type.lower()}"
+            )
+            if file_path:
+                self.size_history.record(report_type, os.path.getsize(file_path), chunk_start, chunk_end)
+            return file_path
+        except Exception as e:
+            logger.warning(f"Часть {chunk_start:%Y-%m-%d} — {chunk_end:%Y-%m-%d} не выгружена через HTTP: {e}")
+            return None
+
+    def _keep_chunk(self, file_path, chunk_dir, index, chunk_start, chunk_end, report_type):
+        self.size_history.record(report_type, os.path.getsize(file_path), chunk_start, chunk_end)
+        target_path = os.path.join(chunk_dir, f"chunk_{index:03d}{os.path.splitext(file_path)[1].lower()}")
+        os.replace(file_path, target_path)
+        return target_path
+
+    def close(self):
+        with self._lock:
+            exporters, self._exporters = self._exporters, []
+        for exporter in exporters:
+            exporter.close()
+        self._local = threading.local()
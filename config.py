@@ -5,7 +5,7 @@ import os
 EMAIL_ACCOUNT_OUT = ""
 EMAIL_PASSWORD_OUT = "" # Используйте пароль приложения, а не основной пароль
 SMTP_SERVER_OUT = ""
-EMAIL_RECEIVER = ""
+EMAIL_RECEIVER = "" # Несколько адресов — через запятую
 
 
 
@@ -43,3 +43,194 @@ EXPORT_BUTTON_TEXT = "Export"
 ENCRYPTION_PASSWORD = None  # Вы сказали, что вам не нужно шифрование.
 #FILE_FORMAT_TEXT = "XLS" # Или "CSV", "PDF" и т.д.
 FILE_FORMAT_TEXT = "CSV" # Или "CSV", "PDF" и т.д.
+
+
+# --- Экспорт без браузера (HTTP) ---
+# Включает прямой POST формы экспорта; Selenium используется только как запасной вариант.
+HTTP_EXPORT_ENABLED = True
+# action формы экспорта (видно в логе "Данные формы перед отправкой" Selenium-варианта)
+EXPORT_URL = "https://IP:8098/accTransaction.do?export"
+# Дополнительные поля формы, которые serialize() отправляет помимо дат и формата
+EXPORT_FORM_EXTRA = {
+    "isEncrypt": "0",
+}
+# Сертификат устройства обычно самоподписанный
+HTTP_VERIFY_SSL = False
+
+# --- Кэш сессии ---
+# Cookie авторизованной сессии сохраняются между запусками, чтобы не входить заново.
+SESSION_CACHE_PATH = os.path.join(os.path.expanduser("~"), "selenium_profiles", "stat2serg_session.json")
+SESSION_CACHE_TTL = 8 * 60 * 60  # секунд
+# Любая страница, доступная только после входа: по ней проверяем, живы ли cookie
+SESSION_CHECK_URL = "https://IP:8098/main.do"
+
+# --- Отслеживание загрузок через Chrome DevTools ---
+# Точное время завершения, время до первого байта и скорость каждой загрузки.
+CDP_DOWNLOAD_TRACKING = True
+
+# --- Демон экспорта ---
+DAEMON_SOCKET_PATH = os.path.join(os.path.expanduser("~"), ".stat2serg.sock")
+# Как часто (сек) проверять сессию, пока нет заданий
+DAEMON_KEEPALIVE_INTERVAL = 300
+
+# --- Облегченный режим браузера ---
+# Блокирует картинки, шрифты и аналитику, включает стратегию загрузки "eager".
+LEAN_BROWSER_MODE = True
+# Шаблоны для CDP Network.setBlockedURLs. CSS не блокируем: от него зависит видимость элементов.
+LEAN_BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.ico", "*.bmp", "*.webp",
+    "*.woff", "*.woff2", "*.ttf", "*.eot", "*.otf",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+]
+
+# --- Профилирование команд WebDriver ---
+# Считает каждую команду драйвера и time.sleep по этапам; отчет пишется в папку загрузок.
+WEBDRIVER_PROFILING = False
+
+# --- Метрики запусков ---
+# Тайминги этапов: JSON lines и textfile для node-exporter (--collector.textfile.directory).
+METRICS_ENABLED = True
+METRICS_JSONL_PATH = os.path.join(os.path.expanduser("~"), "stat2serg_metrics", "runs.jsonl")
+METRICS_TEXTFILE_PATH = os.path.join(os.path.expanduser("~"), "stat2serg_metrics", "stat2serg.prom")
+
+# --- Адаптивные таймауты ---
+# Таймаут ожидания = перцентиль наблюдаемых длительностей этапа * множитель + запас,
+# в пределах жестких границ. Пока замеров мало, используются прежние фиксированные значения.
+ADAPTIVE_TIMEOUTS_ENABLED = True
+LATENCY_HISTORY_PATH = os.path.join(os.path.expanduser("~"), "stat2serg_metrics", "latency_history.json")
+LATENCY_HISTORY_WINDOW = 100          # Сколько последних замеров хранить на этап
+LATENCY_MIN_SAMPLES = 5               # Минимум замеров для адаптивного таймаута
+ADAPTIVE_TIMEOUT_PERCENTILE = 0.95
+ADAPTIVE_TIMEOUT_FACTOR = 1.5
+ADAPTIVE_TIMEOUT_MARGIN = 2.0         # секунды
+# Границы (мин, макс) в секундах по этапам ожидания
+ADAPTIVE_TIMEOUT_BOUNDS = {
+    "login_form": (5, 60),
+    "login_redirect": (5, 60),
+    "date_input": (3, 30),
+    "calendar": (2, 20),
+    "calendar_arrow": (1, 10),
+    "calendar_redraw": (1, 10),
+    "calendar_day": (2, 20),
+    "date_commit": (1, 10),
+    "search_button": (2, 20),
+    "grid": (5, 90),
+    "main_page": (5, 60),
+    "export_button": (2, 20),
+    "ok_button": (3, 40),
+    "popup_script": (5, 60),
+    "popup_field": (1, 20),
+    "modal_close": (5, 60),
+    "download": (10, 300),
+    # Скачивание по длине периода (см. DOWNLOAD_RANGE_BUCKETS): нижняя граница — минимум для таких выгрузок
+    "download:1d": (10, 300),
+    "download:7d": (20, 600),
+    "download:31d": (60, 1200),
+    "download:long": (120, 1800),
+}
+ADAPTIVE_TIMEOUT_DEFAULT_BOUNDS = (1, 120)
+# Замеры скачивания копятся отдельно для периодов до N дней, чтобы быстрые суточные
+# выгрузки не занижали таймаут месячных
+DOWNLOAD_RANGE_BUCKETS = (1, 7, 31)
+
+# --- Кэш селекторов ---
+# Запоминает, какой локатор/способ сработал на конкретном устройстве и языке интерфейса,
+# чтобы в следующий раз пробовать его первым и не ждать таймаут запасного варианта.
+SELECTOR_CACHE_ENABLED = True
+SELECTOR_CACHE_PATH = os.path.join(os.path.expanduser("~"), "selenium_profiles", "stat2serg_selectors.json")
+# Язык интерфейса устройства (часть ключа кэша). v02 работает с ru_RU.
+UI_LOCALE = "en_US"
+# Подписи элементов на всех поддерживаемых языках; первой идет подпись текущего языка
+EXPORT_BUTTON_TEXTS = [EXPORT_BUTTON_TEXT, "Экспорт"]
+OK_BUTTON_TEXTS = ["OK", "ОК"]
+NO_OPTION_TEXTS = ["No", "Нет"]
+DATE_FROM_TITLES = ["Time From", "Время с"]
+DATE_TO_TITLES = ["To", "До"]
+SEARCH_BUTTON_TITLES = ["Search", "Поиск"]
+# Если на устройстве запомнен обход календаря кликами, API календаря пробуется снова
+# раз в N установок даты (после обновления прошивки он мог заработать)
+CALENDAR_API_RETRY_EVERY = 20
+
+# --- Контрольные точки выгрузки ---
+# Состояние каждой выгрузки (job_id = период + формат) сохраняется после каждого этапа;
+# повтор продолжает с последнего успешного этапа.
+CHECKPOINT_DIR = os.path.join(os.path.expanduser("~"), "selenium_profiles", "stat2serg_checkpoints")
+EXPORT_MAX_ATTEMPTS = 3
+# Пауза перед повтором, секунды (умножается на номер попытки)
+EXPORT_RETRY_DELAY = 2
+
+# --- Разбиение больших периодов ---
+# Длинный период выгружается частями (параллельно через HTTP), CSV склеиваются потоково.
+CHUNKING_ENABLED = True
+# 'auto' — размер части по истории размеров выгрузок; иначе day, week, month или Nd
+CHUNK_SPAN = "auto"
+CHUNK_DEFAULT_SPAN = "week"          # для 'auto', пока истории нет
+CHUNK_MIN_DAYS = 14                  # периоды короче не делятся
+CHUNK_TARGET_BYTES = 20 * 1024 * 1024
+CHUNK_MAX_WORKERS = 3
+CHUNK_MERGE_EDGE_ROWS = 500          # сколько крайних строк части сравнивать при поиске дублей
+EXPORT_SIZE_HISTORY_PATH = os.path.join(os.path.expanduser("~"), "stat2serg_metrics", "export_sizes.json")
+
+# --- Нормализация выгрузки ---
+# После скачивания CSV/XLS приводится к единому CSV (UTF-8, канонические колонки, время ISO 8601).
+NORMALIZE_EXPORTS = True
+# Результат пишется в подпапку: файл в самой папке загрузок был бы принят за следующую выгрузку
+NORMALIZED_SUBDIR = "processed"
+
+# --- База событий ---
+# Каждая выгрузка загружается в локальную SQLite-базу; повторные вопросы по старым данным
+# решаются запросом к ней (python event_store.py query ...) без новой выгрузки.
+EVENT_STORE_ENABLED = True
+EVENT_STORE_PATH = os.path.join(os.path.expanduser("~"), "stat2serg_data", "events.sqlite3")
+EVENT_STORE_BATCH_SIZE = 5000        # строк в одном executemany
+EVENT_STORE_LOCK_TIMEOUT = 600       # ожидание загрузки из другого процесса, с (файл грузится одной транзакцией)
+
+# --- Вложение письма ---
+# Отчет сжимается потоком при отправке: 'zip' (открывается в Windows без программ), 'gzip' или None
+ATTACHMENT_COMPRESSION = "zip"
+ATTACHMENT_COMPRESS_MIN_BYTES = 256 * 1024   # файлы меньше отправляются без сжатия
+
+# --- Отправка почты ---
+# Одно TLS-соединение с релеем на процесс: письма идут подряд (RSET между ними),
+# при обрыве соединение открывается заново.
+SMTP_PORT = 587
+SMTP_IDLE_CHECK = 60                 # после простоя, с, соединение проверяется командой NOOP
+SMTP_RECONNECT_ATTEMPTS = 2
+
+# --- Очередь писем ---
+# Готовые выгрузки ставятся в очередь (SQLite в подпапке выгрузок) и отправляются фоновым потоком
+# с повторами; при недоступном SMTP отчет не теряется и уйдет при следующем запуске.
+# Не в самой папке загрузок: файлы базы (-wal, -shm) приняли бы за скачанный отчет.
+OUTBOX_ENABLED = True
+OUTBOX_PATH = os.path.join(os.path.expanduser("~"), "Downloads", "My_Exports", ".outbox", "outbox.sqlite3")
+OUTBOX_MAX_ATTEMPTS = 8              # после стольких неудач письмо переходит в dead
+OUTBOX_BACKOFF_BASE = 30             # пауза перед повтором, с: 30, 60, 120, ... (не больше OUTBOX_BACKOFF_MAX)
+OUTBOX_BACKOFF_MAX = 3600
+OUTBOX_LEASE_SECONDS = 600           # письмо в sending дольше этого (процесс упал) возвращается в очередь
+OUTBOX_POLL_INTERVAL = 30
+OUTBOX_DRAIN_TIMEOUT = 120           # сколько разовый запуск ждет отправки очереди перед выходом
+
+# --- Конвейер выгрузок ---
+# pipeline.py: выгрузка, обработка (нормализация, база) и отправка идут параллельно
+# на разных периодах; между стадиями — ограниченные очереди.
+PIPELINE_QUEUE_SIZE = 2              # готовых заданий перед стадией; при заполнении предыдущая стадия ждет
+PIPELINE_PROCESS_WORKERS = 2
+PIPELINE_MAIL_WORKERS = 1            # письма все равно идут через одно SMTP-соединение
+PIPELINE_REPORT_INTERVAL = 30        # как часто писать в лог глубину очередей, с
+PIPELINE_TEXTFILE_PATH = os.path.join(os.path.expanduser("~"), "stat2serg_metrics", "pipeline.prom")
+
+# --- Планировщик ---
+# scheduler.py выполняет задания по расписанию в одном процессе с теплой сессией.
+# cron: 'минута час день месяц день_недели' (или @daily, @weekly, ...).
+# period: previous_day, previous_week, previous_month, week_to_date, month_to_date, last_Nd
+# или явный период, как в batch.py ('2025-01-01..2025-02-01'); вычисляется в момент запуска.
+SCHEDULE_JOBS = [
+    {"name": "weekly", "cron": "0 7 * * mon", "period": "previous_week", "recipients": EMAIL_RECEIVER},
+    # {"name": "daily", "cron": "30 6 * * *", "period": "previous_day", "recipients": EMAIL_RECEIVER},
+]
+SCHEDULER_JITTER = 60                # случайная задержка запуска, до N секунд
+SCHEDULER_MAX_CONCURRENT_PER_APPLIANCE = 1
+SCHEDULER_KEEPALIVE_INTERVAL = 300   # как часто проверять сессию между запусками, с
+SCHEDULER_WARM_BROWSER = False       # держать открытым браузер, даже если выгрузка идет по HTTP
+# Профили и загрузки дополнительных исполнителей (при лимите больше 1)
+SCHEDULER_WORKER_ROOT = os.path.join(os.path.expanduser("~"), "selenium_profiles", "stat2serg_scheduler")
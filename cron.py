@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 1",
+    "@monthly": "0 0 1 * *",
+}
+_NAMES = {
+    "mon": 1, "tue": 2, "wed": 3, "thu": 4, "fri": 5, "sat": 6, "sun": 0,
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+
+def _parse_field(text, low, high):
+    values = set()
+    for part in text.lower().split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+        if part == "*":
+            first, last = low, high
+        elif "-" in part:
+            first_text, last_text = part.split("-", 1)
+            first, last = int(_NAMES.get(first_text, first_text)), int(_NAMES.get(last_text, last_text))
+        else:
+            first = int(_NAMES.get(part, part))
+            last = high if step > 1 else first
+        if not low <= first <= last <= high or step < 1:
+            raise ValueError(f"Значение '{part}' вне диапазона {low}-{high}")
+        values.update(range(first, last + 1, step))
+    return values
+
+class CronExpression:
+    """
+    Расписание в формате cron: 'минута час день месяц день_недели'
+    (*, списки, диапазоны, шаг, имена mon..sun/jan..dec, @daily/@weekly/...).
+    Как в cron, если заданы и день месяца, и день недели, подходит любой из них.
+    """
+    def __init__(self, expression):
+        self.expression = expression
+        fields = _ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Неверное cron-выражение: '{expression}' (нужно 5 полей).")
+        try:
+            self.minutes = _parse_field(fields[0], 0, 59)
+            self.hours = _parse_field(fields[1], 0, 23)
+            self.days = _parse_field(fields[2], 1, 31)
+            self.months = _parse_field(fields[3], 1, 12)
+            # 7 — тоже воскресенье
+            self.weekdays = {day % 7 for day in _parse_field(fields[4], 0, 7)}
+        except ValueError as e:
+            raise ValueError(f"Неверное cron-выражение '{expression}': {e}")
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, dt):
+        day_ok = dt.day in self.days
+        # Python: понедельник = 0, cron: воскресенье = 0
+        weekday_ok = (dt.weekday() + 1) % 7 in self.weekdays
+        if self._any_day:
+            return weekday_ok
+        if self._any_weekday:
+            return day_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, dt):
+        """
+        Ближайший момент срабатывания строго после dt.
+        """
+        current = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = current + timedelta(days=366 * 5)
+        while current < limit:
+            if current.month not in self.months:
+                current = (current.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(current):
+                current = current.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if current.hour not in self.hours:
+                current = current.replace(minute=0) + timedelta(hours=1)
+                continue
+            if current.minute not in self.minutes:
+                current += timedelta(minutes=1)
+                continue
+            return current
+        raise ValueError(f"Расписание '{self.expression}' никогда не срабатывает.")
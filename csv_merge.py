@@ -0,0 +1,82 @@
+import csv
+import logging
+import os
+from collections import deque
+
+logger = logging.getLogger("stat2serg_logger")
+
+def _edge_filter(rows, previous_edges, edge_rows):
+    """
+    Пропускает строки файла, убирая из первых и последних edge_rows строк те,
+    что уже были на краях предыдущего файла. Возвращает генератор строк,
+    а края текущего файла собирает в edges (заполняется по мере чтения).
+    """
+    edges = set()
+    tail = deque()
+    for index, row in enumerate(rows):
+        key = tuple(row)
+        if index < edge_rows:
+            edges.add(key)
+            if key in previous_edges:
+                continue
+            yield row
+            continue
+        tail.append(row)
+        if len(tail) > edge_rows:
+            yield tail.popleft()
+    for row in tail:
+        key = tuple(row)
+        edges.add(key)
+        if key not in previous_edges:
+            yield row
+    previous_edges.clear()
+    previous_edges.update(edges)
+
+def merge_csv_files(paths, output_path, edge_rows=500, encoding="utf-8-sig"):
+    """
+    Склеивает CSV-выгрузки соседних периодов за один потоковый проход.
+    Заголовок пишется один раз; дубли на стыках (событие на границе двух
+    периодов попадает в оба файла) отбрасываются. В памяти держатся только
+    крайние edge_rows строк каждого файла, поэтому порядок сортировки
+    выгрузки (по возрастанию или убыванию времени) не важен.
+    Возвращает (число строк, число отброшенных дублей).
+    """
+    header = None
+    written = 0
+    duplicates = 0
+    previous_edges = set()
+    tmp_path = output_path + ".part"
+    # surrogateescape: байты в неожиданной кодировке проходят без изменений
+    with open(tmp_path, "w", encoding=encoding, errors="surrogateescape", newline="") as out:
+        writer = csv.writer(out, lineterminator="\r\n")
+        for path in paths:
+            read = 0
+            with open(path, "r", encoding=encoding, errors="surrogateescape", newline="") as f:
+                reader = csv.reader(f)
+                file_header = next(reader, None)
+                if file_header is None:
+                    logger.warning(f"Пустой файл при склейке: {os.path.basename(path)}")
+                    continue
+                if header is None:
+                    header = file_header
+                    writer.writerow(header)
+                elif file_header != header:
+                    logger.warning(f"Заголовок {os.path.basename(path)} отличается от первого файла. Склеиваем как есть.")
+
+                def counted(rows):
+                    nonlocal read
+                    for row in rows:
+                        if not row:
+                            continue
+                        read += 1
+                        yield row
+
+                kept = 0
+                for row in _edge_filter(counted(reader), previous_edges, edge_rows):
+                    writer.writerow(row)
+                    kept += 1
+                written += kept
+                duplicates += read - kept
+    os.replace(tmp_path, output_path)
+    logger.info(f"✅ Склеено файлов: {len(paths)}, строк: {written}, дублей на стыках: {duplicates}.")
+    return written, duplicates
@@ -0,0 +1,179 @@
+import argparse
+import itertools
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from main import deliver_report, queue_report
+from batch import BatchRunner
+from date_ranges import parse_range_spec
+from config import (
+    LOGGER_NAME, HTTP_EXPORT_ENABLED, DAEMON_SOCKET_PATH, DAEMON_KEEPALIVE_INTERVAL, OUTBOX_ENABLED
+)
+
+logger = logging.getLogger(LOGGER_NAME)
+
+class DaemonJob:
+    def __init__(self, job_id, start_dt, end_dt, report_type=None, recipients=None):
+        self.job_id = job_id
+        self.start_dt = start_dt
+        self.end_dt = end_dt
+        self.report_type = report_type
+        self.recipients = recipients or []
+        self.result = None
+        self.done = threading.Event()
+
+class ExportDaemon:
+    """
+    Резидентный процесс: держит авторизованную сессию (HTTP и/или браузер)
+    и выполняет задания на экспорт из очереди по одному.
+    """
+    def __init__(self, socket_path=DAEMON_SOCKET_PATH, use_http=HTTP_EXPORT_ENABLED, warm_browser=False):
+        self.socket_path = socket_path
+        self.warm_browser = warm_browser
+        self.runner = BatchRunner([], use_http=use_http)
+        self.jobs = queue.Queue()
+        self._ids = itertools.count(1)
+
+    def submit(self, start_dt, end_dt, report_type=None, recipients=None):
+        job = DaemonJob(next(self._ids), start_dt, end_dt, report_type, recipients)
+        self.jobs.put(job)
+        logger.info(f"Задание {job.job_id} поставлено в очередь (в очереди: {self.jobs.qsize()}).")
+        return job
+
+    def _process(self, job):
+        self.runner.refresh_sessions()
+        entry = self.runner.run_one(job.start_dt, job.end_dt, job.report_type)
+        entry["job_id"] = job.job_id
+        if entry["status"] == "ok" and job.recipients and OUTBOX_ENABLED:
+            entry["outbox_id"], entry["outbox_status"] = queue_report(
+                entry["file"], job.start_dt, job.end_dt, job.recipients
+            )
+        elif entry["status"] == "ok" and job.recipients:
+            statuses = deliver_report(entry["file"], job.start_dt, job.end_dt, job.recipients)
+            entry["recipients"] = {receiver: status["status"] for receiver, status in statuses.items()}
+            failed = [receiver for receiver, status in statuses.items() if status["status"] != "sent"]
+            if failed:
+                entry.update(status="exported", error=f"не удалось отправить письмо: {', '.join(failed)}")
+        return entry
+
+    def _work_loop(self):
+        while True:
+            try:
+                job = self.jobs.get(timeout=DAEMON_KEEPALIVE_INTERVAL)
+            except queue.Empty:
+                # Простой: проверяем сессию, чтобы следующий запрос не ждал входа
+                self.runner.refresh_sessions()
+                continue
+            if job is None:
+                break
+            try:
+                job.result = self._process(job)
+            except Exception as e:
+                logger.error(f"❌ Ошибка при выполнении задания {job.job_id}: {e}")
+                job.result = {"job_id": job.job_id, "status": "failed", "error": str(e)}
+            finally:
+                job.done.set()
+
+    def serve(self):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        logger.info("Прогрев сессии...")
+        self.runner.warm_up(browser=self.warm_browser)
+        worker = threading.Thread(target=self._work_loop, name="export-daemon-worker", daemon=True)
+        worker.start()
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    request = json.loads(self.rfile.readline().decode("utf-8"))
+                    ranges = parse_range_spec(request["range"])
+                    jobs = [
+                        daemon.submit(start_dt, end_dt, request.get("report_type"), request.get("recipients"))
+                        for start_dt, end_dt in ranges
+                    ]
+                    self._reply({"status": "queued", "job_ids": [job.job_id for job in jobs]})
+                    if request.get("wait", True):
+                        for job in jobs:
+                            job.done.wait()
+                            self._reply(job.result)
+                except (ValueError, KeyError) as e:
+                    self._reply({"status": "rejected", "error": str(e)})
+
+            def _reply(self, payload):
+                self.wfile.write((json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8"))
+                self.wfile.flush()
+
+        with socketserver.ThreadingUnixStreamServer(self.socket_path, Handler) as server:
+            os.chmod(self.socket_path, 0o600)
+            logger.info(f"Демон экспорта слушает {self.socket_path}")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                logger.info("Остановка демона...")
+            finally:
+                # None — сигнал воркеру завершиться после текущего задания
+                self.jobs.put(None)
+                worker.join()
+                self.runner.close()
+                if os.path.exists(self.socket_path):
+                    os.remove(self.socket_path)
+
+def submit_job(range_spec, report_type=None, recipients=None, wait=True, socket_path=DAEMON_SOCKET_PATH):
+    """
+    Клиент: отправляет задание демону и возвращает список ответов.
+    """
+    request = {"range": range_spec, "report_type": report_type, "recipients": recipients or [], "wait": wait}
+    replies = []
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall((json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8"))
+        with client.makefile("r", encoding="utf-8") as stream:
+            for line in stream:
+                replies.append(json.loads(line))
+    return replies
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Демон экспорта с постоянно авторизованной сессией.")
+    parser.add_argument("--socket", default=DAEMON_SOCKET_PATH, help="Путь к Unix-сокету")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Запустить демон")
+    serve_parser.add_argument("--warm-browser", action="store_true", help="Держать браузер открытым даже при HTTP-экспорте")
+    serve_parser.add_argument("--no-http", action="store_true", help="Не использовать HTTP-экспорт, только браузер")
+
+    submit_parser = subparsers.add_parser("submit", help="Отправить задание и дождаться файла")
+    submit_parser.add_argument("range", help="Период, как в batch.py: '2025-01-01..2025-01-08'")
+    submit_parser.add_argument("--report-type", help="Формат отчета")
+    submit_parser.add_argument("--to", action="append", dest="recipients", help="Получатель письма (можно несколько)")
+    submit_parser.add_argument("--no-wait", action="store_true", help="Не ждать выполнения")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "serve":
+        ExportDaemon(
+            args.socket, use_http=HTTP_EXPORT_ENABLED and not args.no_http, warm_browser=args.warm_browser
+        ).serve()
+    else:
+        started = time.time()
+        replies = submit_job(args.range, args.report_type, args.recipients, not args.no_wait, args.socket)
+        results = [reply for reply in replies if "job_id" in reply and reply.get("status") != "queued"]
+        for reply in replies:
+            if reply.get("status") == "rejected":
+                print(f"Задание отклонено: {reply['error']}")
+                raise SystemExit(2)
+        for result in results:
+            print(result.get("file") or f"ошибка: {result.get('error')}")
+        if args.no_wait:
+            print(f"Поставлено в очередь: {replies[0].get('job_ids')}")
+        else:
+            print(f"Готово за {time.time() - started:.1f} с")
+        if any(result.get("status") != "ok" for result in results):
+            raise SystemExit(1)
@@ -0,0 +1,100 @@
+import re
+from datetime import datetime, timedelta
+
+DATE_FORMAT = "%Y-%m-%d"
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_SPAN_RE = re.compile(r"^\s*(\S+)\s*\.\.\s*(\S+)(?:\s+by\s+(\S+))?\s*$")
+_DAYS_RE = re.compile(r"^(\d+)d$")
+_LAST_DAYS_RE = re.compile(r"^last_(\d+)d$")
+
+def parse_date(value):
+    """
+    Принимает 'YYYY-MM-DD' или 'YYYY-MM-DD HH:MM:SS'.
+    """
+    for fmt in (DATETIME_FORMAT, DATE_FORMAT):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Неверный формат даты: '{value}'. Ожидается YYYY-MM-DD.")
+
+def add_months(dt, months):
+    month_index = dt.month - 1 + months
+    return dt.replace(year=dt.year + month_index // 12, month=month_index % 12 + 1, day=1)
+
+def step_forward(dt, chunk):
+    """
+    Сдвигает дату на один шаг: 'day', 'week', 'month' или 'Nd' (N дней).
+    """
+    if chunk == "day":
+        return dt + timedelta(days=1)
+    if chunk == "week":
+        return dt + timedelta(weeks=1)
+    if chunk == "month":
+        return add_months(dt, 1)
+    match = _DAYS_RE.match(chunk)
+    if match and int(match.group(1)) > 0:
+        return dt + timedelta(days=int(match.group(1)))
+    raise ValueError(f"Неизвестный шаг разбиения: '{chunk}'. Допустимо: day, week, month, Nd.")
+
+def split_span(start_dt, end_dt, chunk):
+    """
+    Делит полуинтервал [start_dt, end_dt) на последовательные периоды.
+    """
+    ranges = []
+    current = start_dt
+    while current < end_dt:
+        next_dt = min(step_forward(current, chunk), end_dt)
+        ranges.append((current, next_dt))
+        current = next_dt
+    return ranges
+
+def parse_range_spec(spec):
+    """
+    Разбирает '2025-01-01..2025-10-01' или '2025-01-01..2025-10-01 by week'
+    в список пар (начало, конец). Конец периода не включается, как в __main__.
+    """
+    match = _SPAN_RE.match(spec)
+    if not match:
+        raise ValueError(f"Неверный формат периода: '{spec}'. Пример: 2025-01-01..2025-10-01 by week")
+    start_dt, end_dt = parse_date(match.group(1)), parse_date(match.group(2))
+    if end_dt <= start_dt:
+        raise ValueError(f"Конец периода раньше начала: '{spec}'.")
+    if match.group(3):
+        return split_span(start_dt, end_dt, match.group(3))
+    return [(start_dt, end_dt)]
+
+def report_file_name(start_dt, end_dt, extension):
+    """
+    Детерминированное имя файла отчета за период.
+    """
+    extension = extension if extension.startswith(".") or not extension else "." + extension
+    return f"report_{start_dt.strftime('%Y%m%d')}_{end_dt.strftime('%Y%m%d')}{extension.lower()}"
+
+def relative_range(name, now=None):
+    """
+    Период относительно момента запуска (конец не включается):
+    previous_day, previous_week (с понедельника), previous_month, week_to_date,
+    month_to_date (до текущего часа) и last_Nd (N полных суток до сегодня).
+    """
+    now = now or datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    monday = today - timedelta(days=today.weekday())
+    if name == "previous_day":
+        return today - timedelta(days=1), today
+    if name == "previous_week":
+        return monday - timedelta(weeks=1), monday
+    if name == "previous_month":
+        return add_months(today, -1), today.replace(day=1)
+    if name in ("week_to_date", "month_to_date"):
+        start = monday if name == "week_to_date" else today.replace(day=1)
+        end = now.replace(minute=0, second=0, microsecond=0)
+        if end <= start:
+            raise ValueError(f"Период '{name}' пока пуст: начало {start:%Y-%m-%d %H:%M}.")
+        return start, end
+    match = _LAST_DAYS_RE.match(name)
+    if match and int(match.group(1)) > 0:
+        return today - timedelta(days=int(match.group(1))), today
+    raise ValueError(f"Неизвестный относительный период: '{name}'. Допустимо: previous_day, previous_week, "
+                     f"previous_month, week_to_date, month_to_date, last_Nd.")
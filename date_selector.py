@@ -2,23 +2,76 @@
 import logging
 import time
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 from datetime import datetime
+from waits import Waiter, visible_calendar, calendar_label, calendar_label_changed, input_value_contains
+from selector_cache import get_selector_cache
+from calendar_script import SET_DATE_SCRIPT
+from config import CALENDAR_API_RETRY_EVERY
 
 logger = logging.getLogger("stat2serg_logger")
 
 class DateSelector:
-    def __init__(self, driver):
+    def __init__(self, driver, use_calendar_api=True, selector_cache=None):
         self.driver = driver
+        self.use_calendar_api = use_calendar_api
+        self.waiter = Waiter(driver)
+        self.selectors = selector_cache or get_selector_cache()
+
+    def set_date_via_api(self, title, date_time_str):
+        """
+        Быстрый путь: устанавливает дату через API dhtmlxCalendar одним вызовом
+        и проверяет дату, которую принял календарь. Время не зависит от удаленности месяца.
+        :param title: Заголовок поля ввода.
+        :param date_time_str: Строка с датой и временем в формате 'YYYY-MM-DD HH:MM:SS'.
+        """
+        target_dt = datetime.strptime(date_time_str, "%Y-%m-%d %H:%M:%S")
+        parts = [target_dt.year, target_dt.month, target_dt.day, target_dt.hour, target_dt.minute, target_dt.second]
+        try:
+            result = self.driver.execute_script(SET_DATE_SCRIPT, title, parts, date_time_str) or {}
+        except WebDriverException as e:
+            logger.warning(f"Не удалось установить дату через API календаря: {e}")
+            return False
+
+        status = result.get("status")
+        if status != "ok":
+            logger.info(f"Быстрая установка даты недоступна ({status}). Используем навигацию по календарю.")
+            return False
+        # Секунды календарь может не хранить: сравниваем с точностью до минуты
+        if (result.get("calendar") or [])[:5] != parts[:5]:
+            logger.warning(f"Календарь принял дату {result.get('calendar')}, ожидалось '{date_time_str}'.")
+            return False
+        logger.info(f"✅ Дата '{result.get('input')}' установлена через API календаря для поля '{title}'.")
+        return True
+
+    def field_title(self, step, titles, timeout=15):
+        """
+        Заголовок поля даты на языке интерфейса: первый из titles, поле с которым есть
+        на странице (подошедший вариант запоминается в кэше селекторов).
+        Выбрасывает TimeoutException, если поля нет ни на одном языке.
+        """
+        title, _ = self.selectors.find(
+            self.waiter, step, [(title, (By.XPATH, f"//input[@title='{title}']")) for title in titles],
+            timeout, stage="date_input"
+        )
+        return title
 
     def select_date_and_time(self, title, date_time_str):
         """
         Метод для выбора даты в dhtmlx-календаре.
-        :param title: Заголовок поля ввода ('Time From' или 'To').
+        :param title: Заголовок поля ввода (см. field_title).
         :param date_time_str: Строка с датой и временем в формате 'YYYY-MM-DD HH:MM:SS'.
         """
+        # Если на этом устройстве API календаря уже не сработал, сразу идем по календарю,
+        # но время от времени проверяем API снова
+        api_allowed = self.selectors.preferred("date_input") != "click_walk" or \
+            self.selectors.due_for_retry("date_input", CALENDAR_API_RETRY_EVERY)
+        if self.use_calendar_api and api_allowed:
+            if self.set_date_via_api(title, date_time_str):
+                self.selectors.remember("date_input", "calendar_api")
+                return True
+
         try:
             target_dt = datetime.strptime(date_time_str, "%Y-%m-%d %H:%M:%S")
             logger.info(f"Начинаем процесс выбора даты: {target_dt.strftime('%Y-%m-%d')} для поля с заголовком '{title}'")
@@ -26,46 +79,29 @@ class DateSelector:
             # 1. Поиск поля ввода по заголовку (title)
             input_field_xpath = f"//input[@title='{title}']"
             
-            input_field = WebDriverWait(self.driver, 15).until(
-                EC.element_to_be_clickable((By.XPATH, input_field_xpath))
+            input_field = self.waiter.until(
+                EC.element_to_be_clickable((By.XPATH, input_field_xpath)), 15, stage="date_input"
             )
             logger.info(f"✅ Поле ввода найдено. ID: {input_field.get_attribute('id')}.")
             
             # 2. Клик по полю через JavaScript для вызова календаря
             logger.info("Клик на поле ввода через JavaScript...")
             self.driver.execute_script("arguments[0].click();", input_field)
-            time.sleep(5)
 
             # 3. Ожидание появления и видимости календаря
-            # Находим все элементы календарей и ищем среди них видимый
-            calendar_xpath = "//div[contains(@class, 'dhtmlxcalendar_dhx_web')]"
-            visible_calendar = None
+            # Ждем, пока среди всех элементов календарей появится видимый
             try:
-                calendars = WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_all_elements_located((By.XPATH, calendar_xpath))
-                )
-                for calendar in calendars:
-                    if calendar.is_displayed():
-                        visible_calendar = calendar
-                        logger.info("✅ Окно календаря загрузилось и стало видимым.")
-                        break
+                calendar = self.waiter.until(visible_calendar(), 10, stage="calendar")
+                logger.info("✅ Окно календаря загрузилось и стало видимым.")
             except TimeoutException:
                 logger.error("❌ Окно календаря не появилось или не стало видимым.")
                 return False
-            
-            if not visible_calendar:
-                logger.error("❌ Не удалось найти видимый календарь среди всех элементов.")
-                return False
 
             # 4. Навигация по месяцам и годам
             while True:
                 try:
                     # Ищем элементы внутри найденного контейнера календаря
-                    month_element = visible_calendar.find_element(By.XPATH, ".//span[contains(@class, 'dhtmlxcalendar_month_label_month')]")
-                    year_element = visible_calendar.find_element(By.XPATH, ".//span[contains(@class, 'dhtmlxcalendar_month_label_year')]")
-
-                    current_month_str = month_element.text.strip()
-                    current_year_str = year_element.text.strip()
+                    current_month_str, current_year_str = calendar_label(calendar)
 
                 except NoSuchElementException as e:
                     logger.error(f"❌ Не удалось найти или считать месяц/год внутри контейнера календаря. Ошибка: {e}")
@@ -87,33 +123,28 @@ class DateSelector:
                 logger.info(f"Текущий месяц: {current_month_str} {current_year_int}. Целевой: {target_dt.strftime('%B %Y')}")
 
                 if current_year_int > target_dt.year or (current_year_int == target_dt.year and current_month_dt.month > target_dt.month):
-                    arrow_locators = [
-                        ".//div[contains(@class, 'dhtmlxcalendar_month_arrow_left')]",
-                        ".//div[contains(@class, 'dhtmlxcalendar_month_arrow_left')]/parent::div"
-                    ]
+                    direction = "left"
                     logger.info("Переход на предыдущий месяц...")
                 elif current_year_int < target_dt.year or (current_year_int == target_dt.year and current_month_dt.month < target_dt.month):
-                    arrow_locators = [
-                        ".//div[contains(@class, 'dhtmlxcalendar_month_arrow_right')]",
-                        ".//div[contains(@class, 'dhtmlxcalendar_month_arrow_right')]/parent::div"
-                    ]
+                    direction = "right"
                     logger.info("Переход на следующий месяц...")
                 else:
                     logger.info("✅ Найден нужный месяц и год.")
-                    time.sleep(5)
                     break
                 
-                arrow_element = None
-                for locator in arrow_locators:
-                    try:
-                        arrow_element = WebDriverWait(visible_calendar, 5).until(
-                            EC.element_to_be_clickable((By.XPATH, locator))
-                        )
-                        logger.info(f"✅ Стрелка найдена по XPath: {locator}")
-                        break
-                    except TimeoutException:
-                        logger.warning(f"❌ Стрелка не найдена по XPath: {locator}.")
-                        continue
+                arrow_locators = [
+                    ("arrow", (By.XPATH, f".//div[contains(@class, 'dhtmlxcalendar_month_arrow_{direction}')]")),
+                    ("arrow_parent", (By.XPATH, f".//div[contains(@class, 'dhtmlxcalendar_month_arrow_{direction}')]/parent::div")),
+                ]
+                try:
+                    # Оба локатора проверяются в одном ожидании; сработавший запоминается
+                    _, arrow_element = self.selectors.find(
+                        Waiter(calendar), f"calendar_arrow_{direction}", arrow_locators, 5,
+                        clickable=True, stage="calendar_arrow"
+                    )
+                except TimeoutException:
+                    logger.warning("❌ Стрелка не найдена ни по одному из локаторов.")
+                    arrow_element = None
 
                 if not arrow_element:
                     if (current_year_int < target_dt.year or (current_year_int == target_dt.year and current_month_dt.month < target_dt.month)):
@@ -125,18 +156,27 @@ class DateSelector:
                     return False
 
                 self.driver.execute_script("arguments[0].click();", arrow_element)
-                time.sleep(5)
+                # Ждем, пока календарь перерисует подпись месяца
+                self.waiter.settle(
+                    calendar_label_changed(calendar, (current_month_str, current_year_str)),
+                    10, "смена месяца в календаре", stage="calendar_redraw"
+                )
 
             # 5. Выбор дня
             target_day_xpath = f".//li[contains(@class, 'dhtmlxcalendar_cell_month')]/div[@class='dhtmlxcalendar_label' and text()='{target_dt.day}']"
             logger.info(f"Поиск и выбор дня: {target_dt.day}. XPath: {target_day_xpath}")
-            day_element = WebDriverWait(visible_calendar, 10).until(
-                EC.element_to_be_clickable((By.XPATH, target_day_xpath))
+            day_element = Waiter(calendar).until(
+                EC.element_to_be_clickable((By.XPATH, target_day_xpath)), 10, stage="calendar_day"
             )
             self.driver.execute_script("arguments[0].click();", day_element)
             logger.info(f"✅ Выбран день: {target_dt.day}")
-            time.sleep(5) 
-            
+            # Ждем, пока выбранная дата попадет в поле ввода
+            self.waiter.settle(
+                input_value_contains(input_field, target_dt.strftime("%Y-%m-%d")),
+                10, "дата в поле ввода", stage="date_commit"
+            )
+            if self.use_calendar_api:
+                self.selectors.remember("date_input", "click_walk")
             return True
 
         except Exception as e:
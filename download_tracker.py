@@ -0,0 +1,176 @@
+import json
+import logging
+import os
+import time
+from selenium.common.exceptions import WebDriverException
+from download_watcher import completed_new_files
+
+logger = logging.getLogger("stat2serg_logger")
+
+# Chrome присылает события загрузки в домене Browser (при eventsEnabled)
+# и дублирует их в домене Page; обрабатываем оба варианта.
+_WILL_BEGIN = ("Browser.downloadWillBegin", "Page.downloadWillBegin")
+_PROGRESS = ("Browser.downloadProgress", "Page.downloadProgress")
+
+class DownloadRecord:
+    def __init__(self, guid, url, file_name, export_started):
+        self.guid = guid
+        self.url = url
+        self.file_name = file_name
+        self.export_started = export_started
+        self.began = time.time()
+        self.first_byte = None
+        self.finished = None
+        self.total_bytes = 0
+        self.received_bytes = 0
+        self.state = "inProgress"
+        # Итоговый путь: Chrome может переименовать файл ("name (1).csv"), если такой уже есть
+        self.file_path = None
+
+    def stats(self):
+        """
+        Время генерации на сервере (клик → начало загрузки), время до первого байта
+        и скорость передачи в байтах в секунду.
+        """
+        transfer_start = self.first_byte or self.began
+        transfer_time = (self.finished or time.time()) - transfer_start
+        return {
+            "guid": self.guid,
+            "file": self.file_name,
+            "state": self.state,
+            "bytes": self.received_bytes,
+            "server_wait_sec": round(self.began - self.export_started, 3),
+            "ttfb_sec": round(transfer_start - self.export_started, 3),
+            "transfer_sec": round(transfer_time, 3),
+            "bytes_per_sec": round(self.received_bytes / transfer_time) if transfer_time > 0 else None,
+        }
+
+class DownloadTracker:
+    """
+    Отслеживает загрузки через события Chrome DevTools (downloadWillBegin /
+    downloadProgress), которые читаются из performance-лога chromedriver.
+    Для работы в опциях Chrome нужна capability goog:loggingPrefs = {"performance": "ALL"}.
+    """
+    def __init__(self, driver, download_dir):
+        self.driver = driver
+        self.download_dir = download_dir
+        self.downloads = {}
+        self.export_started = None
+        self.current = None
+
+    def enable(self):
+        try:
+            self.driver.execute_cdp_cmd("Browser.setDownloadBehavior", {
+                "behavior": "allow",
+                "downloadPath": self.download_dir,
+                "eventsEnabled": True,
+            })
+            logger.info("События загрузки Chrome DevTools включены.")
+            return True
+        except WebDriverException as e:
+            logger.warning(f"Не удалось включить события загрузки CDP: {e}")
+            return False
+
+    def mark_export_started(self):
+        """
+        Вызывается перед кликом экспорта: следующая начатая загрузка относится к нему.
+        """
+        self._drain()
+        self.export_started = time.time()
+        self.current = None
+
+    def _drain(self):
+        try:
+            entries = self.driver.get_log("performance")
+        except WebDriverException:
+            return []
+        events = []
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            if message.get("method") in _WILL_BEGIN + _PROGRESS:
+                events.append(message)
+        return events
+
+    def _handle(self, message):
+        params = message.get("params", {})
+        guid = params.get("guid")
+        if message["method"] in _WILL_BEGIN:
+            if guid not in self.downloads:
+                self.downloads[guid] = DownloadRecord(
+                    guid, params.get("url"), params.get("suggestedFilename"), self.export_started or time.time()
+                )
+                logger.info(f"Началась загрузка {params.get('suggestedFilename')} (guid {guid}).")
+            self.current = self.downloads[guid]
+            return None
+        record = self.downloads.get(guid)
+        if record is None:
+            return None
+        record.total_bytes = params.get("totalBytes", record.total_bytes)
+        record.received_bytes = params.get("receivedBytes", record.received_bytes)
+        if record.first_byte is None and record.received_bytes > 0:
+            record.first_byte = time.time()
+        state = params.get("state", record.state)
+        if state != record.state and state in ("completed", "canceled"):
+            record.state = state
+            record.file_path = params.get("filePath")
+            record.finished = time.time()
+            return record
+        return None
+
+    def wait_for_completion(self, initial_files=None, timeout=60, poll_interval=0.2, folder_interval=1.0):
+        """
+        Ждет завершения загрузки, начатой после mark_export_started.
+        Пока событие начала загрузки не пришло, параллельно проверяет папку загрузок:
+        без событий CDP файл находится сразу, а не по истечении таймаута.
+        Возвращает путь к файлу или None (отмена или таймаут).
+        """
+        initial_files = set(initial_files or ())
+        end_time = time.time() + timeout
+        next_folder_check = time.time() + folder_interval
+        while time.time() < end_time:
+            for message in self._drain():
+                record = self._handle(message)
+                if record is None:
+                    continue
+                stats = record.stats()
+                if record.state == "canceled":
+                    logger.error(f"❌ Загрузка {record.file_name} отменена браузером: {stats}")
+                    return None
+                logger.info(f"✅ Загрузка завершена по событию CDP: {stats}")
+                return self._completed_path(record, initial_files)
+            if self.current is None and time.time() >= next_folder_check:
+                completed = completed_new_files(self.download_dir, initial_files)
+                if completed:
+                    logger.info("Файл появился в папке загрузок без событий CDP.")
+                    return os.path.join(self.download_dir, self._newest(completed))
+                next_folder_check = time.time() + folder_interval
+            time.sleep(poll_interval)
+        logger.warning("Событие завершения загрузки CDP не получено в течение таймаута.")
+        return None
+
+    def _completed_path(self, record, initial_files):
+        """
+        Путь к скачанному файлу: из события (новые версии Chrome), иначе — новый файл
+        в папке относительно initial_files. Имя из suggestedFilename — последний вариант:
+        при совпадении имен оно указывает на старый файл.
+        """
+        if record.file_path and os.path.isfile(record.file_path):
+            return record.file_path
+        completed = completed_new_files(self.download_dir, initial_files)
+        if completed:
+            return os.path.join(self.download_dir, self._newest(completed))
+        file_path = os.path.join(self.download_dir, record.file_name or "")
+        if os.path.isfile(file_path) and os.path.basename(file_path) not in initial_files:
+            return file_path
+        return None
+
+    def _newest(self, names):
+        return max(names, key=lambda name: os.path.getmtime(os.path.join(self.download_dir, name)))
+
+    def last_stats(self):
+        if not self.downloads:
+            return None
+        return list(self.downloads.values())[-1].stats()
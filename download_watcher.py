@@ -0,0 +1,146 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+
+logger = logging.getLogger("stat2serg_logger")
+
+# Имена, под которыми браузер и HttpExporter держат недокачанный файл
+PARTIAL_SUFFIXES = (".crdownload", ".part", ".tmp", ".download")
+PARTIAL_PREFIXES = (".com.google.Chrome.", "Unconfirmed ")
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+def is_partial(file_name):
+    return file_name.endswith(PARTIAL_SUFFIXES) or file_name.startswith(PARTIAL_PREFIXES)
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+_libc = _load_libc()
+
+def inotify_available():
+    return _libc is not None
+
+class InotifyWatcher:
+    """
+    Наблюдает за папкой загрузок через inotify (IN_CLOSE_WRITE / IN_MOVED_TO).
+    Chrome пишет в *.crdownload и переименовывает файл по готовности,
+    поэтому IN_MOVED_TO с обычным именем означает завершенную загрузку.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def read_names(self, timeout):
+        """
+        Ждет события не дольше timeout секунд и возвращает имена файлов из них.
+        """
+        readable, _, _ = select.select([self.fd], [], [], max(timeout, 0))
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        names = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if name and mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                names.append(os.fsdecode(name))
+        return names
+
+def completed_new_files(download_dir, initial_files):
+    """
+    Новые завершенные файлы в папке. Пока рядом есть частичный файл,
+    загрузка считается незавершенной (Chrome может заранее создать пустой файл).
+    """
+    new_files = set(os.listdir(download_dir)) - set(initial_files)
+    if any(is_partial(name) for name in new_files):
+        return []
+    return [
+        name for name in new_files
+        if os.path.isfile(os.path.join(download_dir, name)) and os.path.getsize(os.path.join(download_dir, name)) > 0
+    ]
+
+def wait_for_download_inotify(download_dir, initial_files, timeout=60):
+    """
+    Возвращает путь к скачанному файлу, как только браузер его переименует, или None.
+    """
+    initial_files = set(initial_files)
+    end_time = time.time() + timeout
+    with InotifyWatcher(download_dir) as watcher:
+        # Файл мог появиться до установки наблюдения
+        completed = completed_new_files(download_dir, initial_files)
+        if completed:
+            return os.path.join(download_dir, completed[0])
+        while time.time() < end_time:
+            for name in watcher.read_names(end_time - time.time()):
+                if name in initial_files or is_partial(name):
+                    continue
+                file_path = os.path.join(download_dir, name)
+                if os.path.isfile(file_path) and os.path.getsize(file_path) > 0:
+                    return file_path
+    return None
+
+def wait_for_download_polling(download_dir, initial_files, timeout=60, check_interval=1):
+    """
+    Запасной вариант без inotify: опрашивает папку и игнорирует частичные файлы.
+    """
+    end_time = time.time() + timeout
+    while time.time() < end_time:
+        completed = completed_new_files(download_dir, initial_files)
+        if completed:
+            file_path = os.path.join(download_dir, completed[0])
+            # Без события о закрытии файла убеждаемся, что размер перестал меняться
+            initial_size = -1
+            for _ in range(5):
+                try:
+                    current_size = os.path.getsize(file_path)
+                    if current_size > 0 and current_size == initial_size:
+                        return file_path
+                    initial_size = current_size
+                except OSError as e:
+                    logger.warning(f"Ошибка при проверке размера файла: {e}")
+                time.sleep(check_interval)
+            logger.warning(f"Найден файл {completed[0]}, но он, возможно, еще скачивается.")
+            return file_path
+        time.sleep(check_interval)
+    return None
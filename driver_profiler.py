@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+logger = logging.getLogger("stat2serg_logger")
+
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+_SKIP_FILES = (os.path.abspath(__file__),)
+_ATOM_RE = re.compile(r"^/\* (\w+) \*/")
+
+# time.sleep подменяется один раз на процесс; сон засчитывается профилировщику,
+# активному в вызывающем потоке, поэтому потоки других браузеров его не искажают
+_real_sleep = time.sleep
+_active = threading.local()
+_sleep_hook_lock = threading.Lock()
+_sleep_hook_installed = False
+
+def _profiled_sleep(seconds):
+    profiler = getattr(_active, "profiler", None)
+    if profiler is not None:
+        profiler.sleeps[profiler.current_stage()] += seconds
+    _real_sleep(seconds)
+
+def _install_sleep_hook():
+    global _sleep_hook_installed
+    with _sleep_hook_lock:
+        if not _sleep_hook_installed:
+            time.sleep = _profiled_sleep
+            _sleep_hook_installed = True
+
+class CommandRecord:
+    __slots__ = ("command", "locator", "duration", "stage")
+
+    def __init__(self, command, locator, duration, stage):
+        self.command = command
+        self.locator = locator
+        self.duration = duration
+        self.stage = stage
+
+class CommandProfiler:
+    """
+    Считает команды WebDriver и их длительность.
+    Подменяет driver.execute у конкретного экземпляра: через него проходят все
+    команды драйвера и его WebElement (find_element, get_attribute, is_displayed,
+    execute_script...), поэтому тип драйвера и элементов не меняется.
+    Дополнительно учитывает время, проведенное в time.sleep в потоке, который
+    установил профилировщик или вошел в его этап.
+    """
+    def __init__(self):
+        self.records = []
+        self.sleeps = defaultdict(float)
+        self.started = None
+        self._stage = threading.local()
+        self._driver = None
+        self._original_execute = None
+
+    def install(self, driver):
+        self._driver = driver
+        self._original_execute = driver.execute
+        self.started = time.perf_counter()
+        profiler = self
+
+        def execute(driver_command, params=None):
+            began = time.perf_counter()
+            try:
+                return profiler._original_execute(driver_command, params)
+            finally:
+                profiler.records.append(CommandRecord(
+                    profiler._command_name(driver_command, params),
+                    profiler._locator(driver_command, params),
+                    time.perf_counter() - began,
+                    profiler.current_stage(),
+                ))
+
+        driver.execute = execute
+        _install_sleep_hook()
+        _active.profiler = self
+        return driver
+
+    def uninstall(self):
+        if self._driver is not None:
+            self._driver.execute = self._original_execute
+            self._driver = None
+        if getattr(_active, "profiler", None) is self:
+            _active.profiler = None
+
+    @contextmanager
+    def stage(self, name):
+        previous = getattr(self._stage, "name", None)
+        previous_profiler = getattr(_active, "profiler", None)
+        self._stage.name = name
+        _active.profiler = self
+        try:
+            yield
+        finally:
+            self._stage.name = previous
+            _active.profiler = previous_profiler
+
+    def current_stage(self):
+        name = getattr(self._stage, "name", None)
+        if name:
+            return name
+        # Этап не задан явно: берем ближайшую функцию проекта в стеке вызовов
+        frame = sys._getframe(2)
+        while frame is not None:
+            file_name = os.path.abspath(frame.f_code.co_filename)
+            if file_name.startswith(_PROJECT_DIR) and file_name not in _SKIP_FILES:
+                return frame.f_code.co_name
+            frame = frame.f_back
+        return "unknown"
+
+    @staticmethod
+    def _command_name(driver_command, params):
+        # get_attribute / is_displayed в Selenium 4 выполняются через executeScript с атомом
+        if params and driver_command in ("executeScript", "executeAsyncScript", "w3cExecuteScript",
+                                         "w3cExecuteScriptAsync"):
+            match = _ATOM_RE.match(params.get("script", ""))
+            if match:
+                return match.group(1)
+        return driver_command
+
+    @staticmethod
+    def _locator(driver_command, params):
+        if not params:
+            return None
+        if "using" in params and "value" in params:
+            return f"{params['using']}={params['value']}"
+        script = params.get("script")
+        if script and not _ATOM_RE.match(script):
+            return " ".join(script.split())[:80]
+        return None
+
+    def report(self, top=10):
+        """
+        Сводка: команды и время по этапам, общее время, самые медленные локаторы, сон.
+        """
+        stages = defaultdict(lambda: {"commands": 0, "seconds": 0.0})
+        locators = defaultdict(lambda: {"calls": 0, "seconds": 0.0})
+        for record in self.records:
+            stages[record.stage]["commands"] += 1
+            stages[record.stage]["seconds"] += record.duration
+            if record.locator:
+                key = f"{record.command} {record.locator}"
+                locators[key]["calls"] += 1
+                locators[key]["seconds"] += record.duration
+        slowest = sorted(locators.items(), key=lambda item: item[1]["seconds"], reverse=True)[:top]
+        return {
+            "wall_seconds": round(time.perf_counter() - self.started, 3) if self.started else 0,
+            "commands_total": len(self.records),
+            "webdriver_seconds": round(sum(record.duration for record in self.records), 3),
+            "sleep_seconds": round(sum(self.sleeps.values()), 3),
+            "stages": {
+                name: {"commands": data["commands"], "seconds": round(data["seconds"], 3),
+                       "sleep_seconds": round(self.sleeps.get(name, 0.0), 3)}
+                for name, data in stages.items()
+            },
+            "slowest_locators": [
+                {"locator": key, "calls": data["calls"], "seconds": round(data["seconds"], 3)}
+                for key, data in slowest
+            ],
+        }
+
+    def log_report(self, report_path=None):
+        report = self.report()
+        logger.info(
+            f"Профиль WebDriver: {report['commands_total']} команд, {report['webdriver_seconds']} с в драйвере, "
+            f"{report['sleep_seconds']} с в time.sleep, всего {report['wall_seconds']} с"
+        )
+        for name, data in sorted(report["stages"].items(), key=lambda item: -item[1]["seconds"]):
+            logger.info(f"  этап {name}: {data['commands']} команд, {data['seconds']} с, сон {data['sleep_seconds']} с")
+        for item in report["slowest_locators"]:
+            logger.info(f"  медленно: {item['locator']} — {item['calls']} вызовов, {item['seconds']} с")
+        if report_path:
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            logger.info(f"Профиль сохранен: {report_path}")
+        return report
@@ -1,51 +1,362 @@
+import atexit
+import base64
 import logging
+import mimetypes
+import os
+import re
 import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
+import threading
+import time
+import zipfile
+import zlib
+from email.header import Header
+from email.utils import formatdate, make_msgid, encode_rfc2231
 
 logger = logging.getLogger("stat2serg_logger")
 
+READ_CHUNK = 64 * 1024
+# 57 байт исходных данных дают ровно одну строку base64 длиной 76 символов
+BASE64_LINE_BYTES = 57
+
+mimetypes.add_type("text/csv", ".csv")
+mimetypes.add_type("application/vnd.ms-excel", ".xls")
+
+class _ChunkSink:
+    """
+    Несмещаемый поток для zipfile: записанные байты забираются по частям через drain().
+    """
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+def _file_chunks(path, chunk_size=READ_CHUNK):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+def _gzip_chunks(path):
+    # wbits=31 — zlib пишет заголовок и контрольную сумму gzip
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in _file_chunks(path):
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def _zip_chunks(path):
+    sink = _ChunkSink()
+    # zipfile сам переходит в потоковый режим (data descriptor), раз sink не поддерживает seek
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(os.path.basename(path), "w",
+                          force_zip64=os.path.getsize(path) >= zipfile.ZIP64_LIMIT) as entry:
+            for chunk in _file_chunks(path):
+                entry.write(chunk)
+                data = sink.drain()
+                if data:
+                    yield data
+    yield sink.drain()
+
+_COMPRESSORS = {
+    "gzip": (_gzip_chunks, ".gz", "application/gzip"),
+    "zip": (_zip_chunks, ".zip", "application/zip"),
+}
+
+def attachment_stream(path, compression=None, compress_min_bytes=0):
+    """
+    Возвращает (имя вложения, MIME-тип, генератор байтов вложения).
+    Маленькие файлы (меньше compress_min_bytes) не сжимаются.
+    """
+    name = os.path.basename(path)
+    if compression and os.path.getsize(path) >= compress_min_bytes:
+        chunks, extension, mime_type = _COMPRESSORS[compression]
+        if compression == "zip":
+            name = os.path.splitext(name)[0]
+        return name + extension, mime_type, chunks(path)
+    mime_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    return name, mime_type, _file_chunks(path)
+
+def base64_lines(chunks):
+    """
+    Кодирует поток байтов в base64 строками по 76 символов, не накапливая весь поток.
+    """
+    rest = b""
+    for chunk in chunks:
+        rest += chunk
+        cut = len(rest) - len(rest) % BASE64_LINE_BYTES
+        if cut:
+            data, rest = rest[:cut], rest[cut:]
+            yield b"".join(base64.b64encode(data[i:i + BASE64_LINE_BYTES]) + b"\r\n"
+                           for i in range(0, len(data), BASE64_LINE_BYTES))
+    if rest:
+        yield base64.b64encode(rest) + b"\r\n"
+
+def parse_recipients(value):
+    """
+    Список адресов из строки 'a@x, b@y; c@z' или из списка.
+    """
+    if isinstance(value, str):
+        value = re.split(r"[,;]", value)
+    return [address.strip() for address in value if address and address.strip()]
+
 class EmailSender:
-    def __init__(self, smtp_server, email_account, email_password):
+    """
+    Держит одно авторизованное TLS-соединение с релеем и отправляет через него
+    письма подряд (RSET между транзакциями), переподключаясь при обрыве.
+    """
+    def __init__(self, smtp_server, email_account, email_password, compression=None, compress_min_bytes=0,
+                 port=587, idle_check=60, reconnect_attempts=2):
+        """
+        :param compression: Сжатие вложения: 'zip', 'gzip' или None.
+        :param compress_min_bytes: Файлы меньше этого размера отправляются без сжатия.
+        :param idle_check: После скольких секунд простоя проверять соединение командой NOOP.
+        :param reconnect_attempts: Сколько раз пробовать письмо при обрыве соединения.
+        """
+        if compression not in (None, *_COMPRESSORS):
+            raise ValueError(f"Неизвестный способ сжатия вложения: {compression}")
         self.smtp_server = smtp_server
         self.email_account = email_account
         self.email_password = email_password
+        self.compression = compression
+        self.compress_min_bytes = compress_min_bytes
+        self.port = port
+        self.idle_check = idle_check
+        self.reconnect_attempts = max(1, reconnect_attempts)
+        self.server = None
+        self.last_used = 0
+        self.connects = 0
+        self.messages_on_connection = 0
+        self._lock = threading.Lock()
+
+    def message_chunks(self, receiver_email, subject, body, attachment_path):
+        """
+        Генерирует письмо (MIME) частями. Все части в base64, поэтому строки
+        не начинаются с точки и не требуют экранирования в SMTP DATA.
+        """
+        boundary = f"=={make_msgid(domain='stat2serg')[1:-1]}=="
+        # Длинная тема переносится на несколько строк; в DATA допустим только CRLF
+        subject_header = Header(subject, "utf-8").encode(linesep="\r\n")
+        headers = [
+            f"From: {self.email_account}",
+            f"To: {receiver_email}",
+            f"Subject: {subject_header}",
+            f"Date: {formatdate(localtime=True)}",
+            f"Message-ID: {make_msgid()}",
+            "MIME-Version: 1.0",
+            f'Content-Type: multipart/mixed; boundary="{boundary}"',
+            "",
+            f"--{boundary}",
+            'Content-Type: text/plain; charset="utf-8"',
+            "Content-Transfer-Encoding: base64",
+            "",
+        ]
+        yield ("\r\n".join(headers) + "\r\n").encode("ascii")
+        yield from base64_lines([body.encode("utf-8")])
+
+        if attachment_path:
+            name, mime_type, chunks = attachment_stream(attachment_path, self.compression, self.compress_min_bytes)
+            if name.isascii():
+                disposition = f'filename="{name}"'
+            else:
+                disposition = f"filename*={encode_rfc2231(name, 'utf-8')}"
+            part_headers = [
+                f"--{boundary}",
+                f"Content-Type: {mime_type}",
+                "Content-Transfer-Encoding: base64",
+                f"Content-Disposition: attachment; {disposition}",
+                "",
+            ]
+            yield ("\r\n".join(part_headers) + "\r\n").encode("ascii")
+            yield from base64_lines(chunks)
+
+        yield f"--{boundary}--\r\n".encode("ascii")
+
+    def _connect(self):
+        self.close()
+        logger.info(f"Подключение к SMTP-серверу: {self.smtp_server}...")
+        server = smtplib.SMTP(self.smtp_server, self.port)
+        try:
+            server.starttls()
+            server.login(self.email_account, self.email_password)
+        except Exception:
+            server.close()
+            raise
+        self.server = server
+        self.connects += 1
+        self.messages_on_connection = 0
+
+    def _connection(self):
+        """
+        Возвращает открытое соединение. После простоя дольше idle_check оно проверяется
+        командой NOOP: релеи закрывают неактивные сессии, и лучше узнать об этом до DATA.
+        """
+        if self.server is not None and time.time() - self.last_used > self.idle_check:
+            try:
+                code, _ = self.server.noop()
+                if code != 250:
+                    raise smtplib.SMTPServerDisconnected(f"NOOP: {code}")
+            except (smtplib.SMTPException, OSError):
+                logger.info("SMTP-соединение закрыто сервером, подключаемся заново.")
+                self.close()
+        if self.server is None:
+            self._connect()
+        return self.server
+
+    def _transaction(self, server, recipients, chunks):
+        """
+        Одна SMTP-транзакция: MAIL, RCPT на каждого получателя, DATA потоком в сокет.
+        Возвращает (статусы получателей, число отправленных байтов).
+        """
+        if self.messages_on_connection:
+            # Сбрасываем состояние после предыдущего письма в этом соединении
+            server.rset()
+        server.ehlo_or_helo_if_needed()
+        code, reply = server.mail(self.email_account)
+        if code != 250:
+            raise smtplib.SMTPSenderRefused(code, reply, self.email_account)
+        statuses = {}
+        for recipient in recipients:
+            code, reply = server.rcpt(recipient)
+            statuses[recipient] = {"status": "accepted" if code in (250, 251) else "refused",
+                                   "code": code, "reply": reply.decode("utf-8", "replace")}
+        if not any(status["status"] == "accepted" for status in statuses.values()):
+            server.rset()
+            return statuses, 0
+
+        server.putcmd("data")
+        code, reply = server.getreply()
+        if code != 354:
+            raise smtplib.SMTPDataError(code, reply)
+        sent = 0
+        for chunk in chunks:
+            server.send(chunk)
+            sent += len(chunk)
+        server.send(b".\r\n")
+        code, reply = server.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, reply)
+        self.messages_on_connection += 1
+        for status in statuses.values():
+            if status["status"] == "accepted":
+                status.update(status="sent", code=code, reply=reply.decode("utf-8", "replace"))
+        return statuses, sent
+
+    def send_message(self, recipients, subject, body, attachment_path=None):
+        """
+        Отправляет одно письмо всем получателям через общее соединение.
+        Если сервер разорвал соединение, подключается заново и повторяет письмо.
+        Возвращает {адрес: {"status": sent|refused|failed, "code": ..., "reply": ...}}.
+        """
+        recipients = parse_recipients(recipients)
+        with self._lock:
+            for attempt in range(1, self.reconnect_attempts + 1):
+                started = time.time()
+                try:
+                    server = self._connection()
+                    statuses, sent = self._transaction(
+                        server, recipients, self.message_chunks(", ".join(recipients), subject, body, attachment_path)
+                    )
+                    self.last_used = time.time()
+                    break
+                except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+                    self.close()
+                    if attempt < self.reconnect_attempts:
+                        logger.warning(f"SMTP-соединение потеряно ({e}), подключаемся заново.")
+                        continue
+                    error = f"соединение потеряно: {e}"
+                except Exception as e:
+                    # Транзакция могла остаться незавершенной: соединение не переиспользуем
+                    self.close()
+                    error = str(e)
+                logger.error(f"❌ Не удалось отправить письмо: {error}")
+                return {recipient: {"status": "failed", "code": None, "reply": error} for recipient in recipients}
+
+        for recipient, status in statuses.items():
+            if status["status"] != "sent":
+                logger.error(f"❌ Получатель {recipient} отклонен: {status['code']} {status['reply']}")
+        delivered = sum(1 for status in statuses.values() if status["status"] == "sent")
+        if delivered:
+            source_size = os.path.getsize(attachment_path) if attachment_path else 0
+            logger.info(f"✅ Письмо отправлено {delivered}/{len(recipients)} получателям: {sent / 1024:.0f} КБ "
+                        f"(файл {source_size / 1024:.0f} КБ) за {time.time() - started:.1f} с.")
+        return statuses
+
+    def send_batch(self, messages):
+        """
+        Отправляет несколько писем (например, отфильтрованные варианты отчета для
+        разных руководителей) подряд через одно соединение.
+        :param messages: Список словарей с ключами recipients, subject, body, attachment_path.
+        Возвращает список статусов получателей в том же порядке.
+        """
+        started = time.time()
+        connects = self.connects
+        results = [
+            self.send_message(message["recipients"], message["subject"], message["body"],
+                              message.get("attachment_path"))
+            for message in messages
+        ]
+        delivered = sum(1 for statuses in results for status in statuses.values() if status["status"] == "sent")
+        total = sum(len(statuses) for statuses in results)
+        logger.info(f"Рассылка: писем {len(messages)}, доставлено получателям {delivered}/{total}, "
+                    f"подключений {self.connects - connects}, за {time.time() - started:.1f} с.")
+        return results
 
     def send_email_with_attachment(self, receiver_email, subject, body, attachment_path):
         """
-        Отправляет электронное письмо с вложением.
+        Отправляет электронное письмо с вложением одному или нескольким получателям
+        (адреса через запятую). Возвращает True, если письмо принято хотя бы для одного.
         """
+        statuses = self.send_message(receiver_email, subject, body, attachment_path)
+        return any(status["status"] == "sent" for status in statuses.values())
+
+    def close(self):
+        server, self.server = self.server, None
+        if server is None:
+            return
         try:
-            msg = MIMEMultipart()
-            msg['From'] = self.email_account
-            msg['To'] = receiver_email
-            msg['Subject'] = subject
-            
-            msg.attach(MIMEText(body, 'plain'))
-            
-            # Добавляем вложение
-            if attachment_path:
-                with open(attachment_path, "rb") as attachment:
-                    part = MIMEBase('application', 'octet-stream')
-                    part.set_payload(attachment.read())
-                encoders.encode_base64(part)
-                part.add_header(
-                    "Content-Disposition",
-                    f"attachment; filename= {attachment_path.split('/')[-1]}",
-                )
-                msg.attach(part)
-            
-            logger.info(f"Подключение к SMTP-серверу: {self.smtp_server}...")
-            with smtplib.SMTP(self.smtp_server, 587) as server:
-                server.starttls()
-                server.login(self.email_account, self.email_password)
-                server.send_message(msg)
-            
-            logger.info("✅ Письмо с файлом успешно отправлено.")
-            return True
-            
-        except Exception as e:
-            logger.error(f"❌ Не удалось отправить письмо: {e}")
-            return False
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+_senders = {}
+_senders_lock = threading.Lock()
+
+def get_email_sender(smtp_server, email_account, email_password, **options):
+    """
+    Общий отправитель процесса на каждый релей и учетную запись: одно соединение
+    с TLS и авторизацией используется для всех писем. Закрывается при выходе.
+    """
+    key = (smtp_server, email_account)
+    with _senders_lock:
+        sender = _senders.get(key)
+        if sender is None:
+            if not _senders:
+                atexit.register(close_email_senders)
+            sender = _senders[key] = EmailSender(smtp_server, email_account, email_password, **options)
+        return sender
+
+def close_email_senders():
+    with _senders_lock:
+        senders = list(_senders.values())
+        _senders.clear()
+    for sender in senders:
+        sender.close()
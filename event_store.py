@@ -0,0 +1,239 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from normalize_export import CANONICAL_COLUMNS, canonical_name, to_iso_time, to_identifier
+from date_ranges import parse_date
+from config import EVENT_STORE_PATH, EVENT_STORE_BATCH_SIZE, EVENT_STORE_LOCK_TIMEOUT
+
+logger = logging.getLogger("stat2serg_logger")
+
+EVENT_COLUMNS = tuple(CANONICAL_COLUMNS)
+# Событие однозначно определяется временем, устройством, точкой, человеком и типом события
+IDENTITY_COLUMNS = ("event_time", "device_name", "event_point", "person_id", "event_description")
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS events (
+    {", ".join(f"{column} TEXT NOT NULL DEFAULT ''" for column in EVENT_COLUMNS)},
+    extra TEXT,
+    source TEXT,
+    UNIQUE ({", ".join(IDENTITY_COLUMNS)})
+);
+CREATE INDEX IF NOT EXISTS events_person_time ON events (person_id, event_time);
+CREATE INDEX IF NOT EXISTS events_device_time ON events (device_name, event_time);
+CREATE INDEX IF NOT EXISTS events_time ON events (event_time);
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime REAL,
+    rows INTEGER,
+    imported REAL
+);
+"""
+
+_UPSERT = (
+    f"INSERT INTO events ({', '.join(EVENT_COLUMNS)}, extra, source) "
+    f"VALUES ({', '.join('?' for _ in EVENT_COLUMNS)}, ?, ?) "
+    f"ON CONFLICT ({', '.join(IDENTITY_COLUMNS)}) DO UPDATE SET "
+    + ", ".join(f"{column} = excluded.{column}"
+                for column in EVENT_COLUMNS + ("extra", "source") if column not in IDENTITY_COLUMNS)
+)
+
+class EventStore:
+    """
+    Локальная база событий (SQLite): каждая выгрузка загружается в нее пачками,
+    повторная загрузка того же события обновляет запись, а не дублирует ее.
+    """
+    def __init__(self, path=EVENT_STORE_PATH, batch_size=EVENT_STORE_BATCH_SIZE, timeout=EVENT_STORE_LOCK_TIMEOUT):
+        """
+        :param timeout: Сколько ждать, пока другой процесс закончит загрузку файла, с.
+            Загрузка файла — одна транзакция, поэтому ожидание должно покрывать ее целиком.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=timeout)
+        self.conn.row_factory = sqlite3.Row
+        # WAL: чтение запросами не блокируется загрузкой новой выгрузки
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def ingest(self, file_path):
+        """
+        Загружает CSV-выгрузку (лучше нормализованную) в базу.
+        Возвращает число обработанных строк или None при ошибке.
+        """
+        name = os.path.basename(file_path)
+        started = time.time()
+        try:
+            with open(file_path, "r", encoding="utf-8-sig", errors="replace", newline="") as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if header is None:
+                    logger.warning(f"Пустой файл, в базу событий нечего загружать: {name}")
+                    return 0
+                columns = [canonical_name(label) for label in header]
+                known = [(index, EVENT_COLUMNS.index(column)) for index, column in enumerate(columns)
+                         if column in EVENT_COLUMNS]
+                if "event_time" not in columns:
+                    logger.error(f"❌ В {name} нет колонки со временем события, загрузка в базу невозможна.")
+                    return None
+                extra = [(index, column) for index, column in enumerate(columns) if column not in EVENT_COLUMNS]
+                time_slot = EVENT_COLUMNS.index("event_time")
+                id_slots = [EVENT_COLUMNS.index(column) for column in ("person_id", "card_number")]
+
+                rows = 0
+                batch = []
+                with self.conn:
+                    for row in reader:
+                        if not row:
+                            continue
+                        values = [""] * len(EVENT_COLUMNS)
+                        for index, slot in known:
+                            if index < len(row):
+                                values[slot] = row[index]
+                        values[time_slot] = to_iso_time(values[time_slot])
+                        for slot in id_slots:
+                            values[slot] = to_identifier(values[slot])
+                        extra_values = {column: row[index] for index, column in extra if index < len(row) and row[index]}
+                        batch.append(values + [json.dumps(extra_values, ensure_ascii=False) if extra_values else None, name])
+                        if len(batch) >= self.batch_size:
+                            self.conn.executemany(_UPSERT, batch)
+                            rows += len(batch)
+                            batch = []
+                    if batch:
+                        self.conn.executemany(_UPSERT, batch)
+                        rows += len(batch)
+                    stat = os.stat(file_path)
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO imports (source, size, mtime, rows, imported) VALUES (?, ?, ?, ?, ?)",
+                        (name, stat.st_size, stat.st_mtime, rows, time.time())
+                    )
+        except (OSError, sqlite3.Error, csv.Error) as e:
+            logger.error(f"❌ Не удалось загрузить {name} в базу событий: {e}")
+            return None
+        duration = time.time() - started
+        logger.info(f"✅ В базу событий загружено {rows} строк из {name} за {duration:.1f} с "
+                    f"({round(rows / duration) if duration else rows} строк/с).")
+        return rows
+
+    def query(self, start=None, end=None, person=None, name=None, device=None, limit=None):
+        """
+        События за период (границы включительно), по человеку (ID), фамилии/имени или устройству.
+        """
+        sql, params = self._where(start, end, person, name, device)
+        sql = f"SELECT {', '.join(EVENT_COLUMNS)} FROM events{sql} ORDER BY event_time"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def people(self, start=None, end=None, device=None):
+        """
+        Сводка по людям за период: число событий, первое и последнее событие.
+        """
+        sql, params = self._where(start, end, None, None, device)
+        sql = ("SELECT person_id, last_name, first_name, department, COUNT(*) AS events, "
+               f"MIN(event_time) AS first_event, MAX(event_time) AS last_event FROM events{sql} "
+               "GROUP BY person_id ORDER BY last_name, first_name")
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def _where(self, start, end, person, name, device):
+        conditions = []
+        params = []
+        if start:
+            conditions.append("event_time >= ?")
+            params.append(_iso_bound(start, end=False))
+        if end:
+            conditions.append("event_time <= ?")
+            params.append(_iso_bound(end, end=True))
+        if person:
+            conditions.append("person_id = ?")
+            params.append(person)
+        if name:
+            conditions.append("(last_name LIKE ? OR first_name LIKE ?)")
+            params.extend([f"%{name}%", f"%{name}%"])
+        if device:
+            conditions.append("device_name = ?")
+            params.append(device)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def close(self):
+        self.conn.close()
+
+def _iso_bound(value, end):
+    """
+    Граница периода в формате колонки event_time; дата без времени для конца — весь день.
+    """
+    dt = parse_date(value)
+    if end and len(value.strip()) <= 10:
+        return dt.strftime("%Y-%m-%dT23:59:59")
+    return dt.strftime("%Y-%m-%dT%H:%M:%S")
+
+# SQLite допускает одного писателя: потоки процесса загружают файлы по очереди,
+# а не ждут друг друга внутри busy timeout
+_ingest_lock = threading.Lock()
+
+def ingest_export(file_path, path=EVENT_STORE_PATH):
+    """
+    Загружает одну выгрузку в базу событий. Возвращает число строк или None.
+    """
+    with _ingest_lock:
+        try:
+            store = EventStore(path)
+        except sqlite3.Error as e:
+            logger.error(f"❌ Не удалось открыть базу событий {path}: {e}")
+            return None
+        try:
+            return store.ingest(file_path)
+        finally:
+            store.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Локальная база событий ZKBio.")
+    parser.add_argument("--db", default=EVENT_STORE_PATH, help="Путь к базе SQLite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="Загрузить выгрузки в базу")
+    ingest.add_argument("files", nargs="+", help="CSV-файлы выгрузок")
+
+    for command, help_text in (("query", "События за период"), ("people", "Сводка по людям")):
+        sub = commands.add_parser(command, help=help_text)
+        sub.add_argument("--from", dest="start", help="Начало периода (YYYY-MM-DD [HH:MM:SS])")
+        sub.add_argument("--to", dest="end", help="Конец периода (YYYY-MM-DD [HH:MM:SS])")
+        sub.add_argument("--device", help="Имя устройства")
+        if command == "query":
+            sub.add_argument("--person", help="ID персонала")
+            sub.add_argument("--name", help="Часть фамилии или имени")
+            sub.add_argument("--limit", type=int, help="Не больше N событий")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(name)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    args = parse_args()
+    store = EventStore(args.db)
+    try:
+        if args.command == "ingest":
+            failed = [path for path in args.files if store.ingest(path) is None]
+            if failed:
+                raise SystemExit(1)
+        else:
+            started = time.time()
+            if args.command == "query":
+                rows = store.query(args.start, args.end, args.person, args.name, args.device, args.limit)
+            else:
+                rows = store.people(args.start, args.end, args.device)
+            if rows:
+                writer = csv.DictWriter(sys.stdout, fieldnames=list(rows[0]), lineterminator="\n")
+                writer.writeheader()
+                writer.writerows(rows)
+            logger.info(f"Найдено записей: {len(rows)} за {(time.time() - started) * 1000:.0f} мс.")
+    finally:
+        store.close()
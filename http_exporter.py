@@ -0,0 +1,162 @@
+import logging
+import os
+import re
+import time
+from urllib.parse import unquote, urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from session_cache import SessionCookieCache
+from config import (
+    LOGIN_URL, USERNAME, PASSWORD, USERNAME_FIELD_ID, PASSWORD_FIELD_ID,
+    START_TIME_FIELD_ID_PREFIX, END_TIME_FIELD_ID_PREFIX, FILE_FORMAT_TEXT,
+    EXPORT_URL, EXPORT_FORM_EXTRA, HTTP_VERIFY_SSL,
+    SESSION_CACHE_PATH, SESSION_CACHE_TTL, SESSION_CHECK_URL
+)
+
+logger = logging.getLogger("stat2serg_logger")
+
+# Типы ответа, которые считаются файлом выгрузки даже без Content-Disposition: attachment
+EXPORT_CONTENT_TYPES = ("text/csv", "application/csv", "application/vnd.ms-excel",
+                        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+class HttpExporter:
+    """
+    Экспорт отчета без браузера: повторяет POST формы экспорта,
+    который в Selenium-варианте формирует interact_with_export_popup.
+    """
+    def __init__(self, download_dir, pool_size=4, timeout=120, chunk_size=64 * 1024,
+                 session_cache_path=SESSION_CACHE_PATH):
+        self.download_dir = download_dir
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        # Одна сессия с пулом соединений: keep-alive и cookie JSESSIONID живут между запросами
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=2)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.verify = HTTP_VERIFY_SSL
+        if not HTTP_VERIFY_SSL:
+            requests.packages.urllib3.disable_warnings()
+        self.session_cache = SessionCookieCache(session_cache_path, SESSION_CACHE_TTL)
+
+    def restore_session(self):
+        """
+        Подставляет cookie из кэша (общего с AuthWorker) и проверяет их одним GET.
+        """
+        cookies = self.session_cache.load()
+        if not cookies:
+            return False
+        self.session_cache.inject_into_session(self.session, cookies, urlparse(LOGIN_URL).hostname)
+        if self.session_alive():
+            logger.info("✅ HTTP-сессия восстановлена из кэша.")
+            return True
+        logger.info("Сервер отклонил сохраненную сессию. Выполняем полный вход.")
+        self.session_cache.clear()
+        self.session.cookies.clear()
+        return False
+
+    def session_alive(self):
+        """
+        Проверяет текущие cookie одним GET к SESSION_CHECK_URL.
+        """
+        try:
+            response = self.session.get(SESSION_CHECK_URL, timeout=self.timeout)
+            return response.ok and not self._is_login_page(response)
+        except requests.RequestException as e:
+            logger.warning(f"Не удалось проверить сессию: {e}")
+            return False
+
+    def login(self):
+        if self.restore_session():
+            return True
+        try:
+            logger.info(f"HTTP-авторизация на {LOGIN_URL}...")
+            # GET нужен, чтобы сервер выдал JSESSIONID до отправки учетных данных
+            self.session.get(LOGIN_URL, timeout=self.timeout)
+            response = self.session.post(
+                LOGIN_URL,
+                data={USERNAME_FIELD_ID: USERNAME, PASSWORD_FIELD_ID: PASSWORD},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            if self._is_login_page(response):
+                logger.error("HTTP-авторизация не удалась. Сервер вернул страницу входа.")
+                return False
+            logger.info("✅ HTTP-авторизация успешна.")
+            self.session_cache.save(self.session_cache.from_session(self.session))
+            return True
+        except requests.RequestException as e:
+            logger.error(f"Ошибка HTTP-авторизации: {e}")
+            return False
+
+    def _is_login_page(self, response):
+        if response.url.split("?")[0] == LOGIN_URL:
+            return True
+        content_type = response.headers.get("Content-Type", "")
+        return "text/html" in content_type and f'id="{PASSWORD_FIELD_ID}"' in response.text
+
+    def build_form_payload(self, start_date_str, end_date_str, report_type=None):
+        """
+        Собирает те же поля, что $('#form_id').serialize() в модальном окне экспорта.
+        :param start_date_str: Начало периода в формате 'YYYY-MM-DD HH:MM:SS'.
+        :param end_date_str: Конец периода в формате 'YYYY-MM-DD HH:MM:SS'.
+        """
+        payload = dict(EXPORT_FORM_EXTRA)
+        payload[START_TIME_FIELD_ID_PREFIX] = start_date_str
+        payload[END_TIME_FIELD_ID_PREFIX] = end_date_str
+        payload["reportType"] = report_type or FILE_FORMAT_TEXT
+        payload["reportType_new_value"] = "true"
+        return payload
+
+    def export(self, start_date_str, end_date_str, report_type=None, file_name=None):
+        """
+        Отправляет форму экспорта и потоково сохраняет ответ на диск.
+        Возвращает путь к файлу или None.
+        """
+        payload = self.build_form_payload(start_date_str, end_date_str, report_type)
+        logger.info(f"HTTP-экспорт: {EXPORT_URL}, данные формы: {payload}")
+        started = time.time()
+        part_path = None
+        try:
+            with self.session.post(EXPORT_URL, data=payload, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                disposition = response.headers.get("Content-Disposition", "")
+                content_type = response.headers.get("Content-Type", "").lower()
+                if "attachment" not in disposition.lower() and not content_type.startswith(EXPORT_CONTENT_TYPES):
+                    # Страница ошибки или JSON {"ret": ...} вместо файла: пусть выгрузку сделает браузер
+                    if self._is_login_page(response):
+                        logger.error("❌ Сессия не авторизована: вместо файла получена страница входа.")
+                    else:
+                        logger.error(f"❌ Вместо файла сервер вернул '{content_type or 'без типа'}': "
+                                     f"{response.text[:200]!r}")
+                    return None
+                name = file_name or self._file_name_from_disposition(disposition) or \
+                    f"export_{int(started)}.{payload['reportType'].lower()}"
+                file_path = os.path.join(self.download_dir, name)
+                # Пишем во временный файл, чтобы find_new_file не увидел недокачанный отчет
+                part_path = file_path + ".part"
+                size = 0
+                with open(part_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        if chunk:
+                            f.write(chunk)
+                            size += len(chunk)
+                os.replace(part_path, file_path)
+            logger.info(f"✅ Файл скачан по HTTP: {file_path} ({size} байт за {time.time() - started:.1f} с)")
+            return file_path
+        except (requests.RequestException, OSError) as e:
+            logger.error(f"❌ Ошибка HTTP-экспорта: {e}")
+            # Обрыв посреди потока: недокачанный файл не должен остаться в папке загрузок
+            if part_path and os.path.exists(part_path):
+                os.remove(part_path)
+            return None
+
+    @staticmethod
+    def _file_name_from_disposition(disposition):
+        match = re.search(r"filename\*?=(?:UTF-8'')?\"?([^\";]+)\"?", disposition)
+        if not match:
+            return None
+        return os.path.basename(unquote(match.group(1).strip()))
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,139 @@
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+from config import (
+    ADAPTIVE_TIMEOUTS_ENABLED, LATENCY_HISTORY_PATH, LATENCY_HISTORY_WINDOW, LATENCY_MIN_SAMPLES,
+    ADAPTIVE_TIMEOUT_PERCENTILE, ADAPTIVE_TIMEOUT_FACTOR, ADAPTIVE_TIMEOUT_MARGIN,
+    ADAPTIVE_TIMEOUT_BOUNDS, ADAPTIVE_TIMEOUT_DEFAULT_BOUNDS, DOWNLOAD_RANGE_BUCKETS
+)
+
+logger = logging.getLogger("stat2serg_logger")
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+class LatencyHistory:
+    """
+    История длительностей ожиданий по этапам. Из нее вычисляются таймауты:
+    перцентиль * множитель + запас, в пределах границ этапа.
+    Новые замеры копятся в памяти и дописываются в файл при flush().
+    """
+    def __init__(self, path, window=LATENCY_HISTORY_WINDOW, min_samples=LATENCY_MIN_SAMPLES,
+                 fraction=ADAPTIVE_TIMEOUT_PERCENTILE, factor=ADAPTIVE_TIMEOUT_FACTOR,
+                 margin=ADAPTIVE_TIMEOUT_MARGIN, bounds=None):
+        self.path = path
+        self.window = window
+        self.min_samples = min_samples
+        self.fraction = fraction
+        self.factor = factor
+        self.margin = margin
+        self.bounds = bounds if bounds is not None else ADAPTIVE_TIMEOUT_BOUNDS
+        self.samples = self._load()
+        self.pending = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать историю задержек {self.path}: {e}")
+            return {}
+
+    def record(self, stage, duration):
+        with self._lock:
+            self.pending.setdefault(stage, []).append(round(duration, 3))
+            values = self.samples.setdefault(stage, [])
+            values.append(round(duration, 3))
+            del values[:-self.window]
+
+    def timeout(self, stage, default):
+        """
+        Таймаут для этапа. Пока замеров меньше min_samples — default (в пределах границ).
+        """
+        # Для этапа с уточнением ('download:7d') без своих границ берутся границы базового этапа
+        lower, upper = self.bounds.get(stage) or self.bounds.get(stage.split(":")[0], ADAPTIVE_TIMEOUT_DEFAULT_BOUNDS)
+        with self._lock:
+            values = list(self.samples.get(stage, []))
+        if len(values) < self.min_samples:
+            return min(max(default, lower), upper)
+        value = percentile(values, self.fraction) * self.factor + self.margin
+        return round(min(max(value, lower), upper), 1)
+
+    def flush(self):
+        """
+        Дописывает накопленные замеры в файл. Файл общий для пула, демона и cron,
+        поэтому запись идет под блокировкой поверх актуального содержимого.
+        """
+        with self._lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + ".lock", "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                stored = self._load()
+                for stage, values in pending.items():
+                    merged = stored.setdefault(stage, [])
+                    merged.extend(values)
+                    del merged[:-self.window]
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(stored, f)
+                os.replace(tmp_path, self.path)
+            with self._lock:
+                for stage, values in stored.items():
+                    self.samples[stage] = (values + self.pending.get(stage, []))[-self.window:]
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить историю задержек {self.path}: {e}")
+
+_history = None
+_history_lock = threading.Lock()
+
+def get_latency_history():
+    """
+    Общая история процесса (или None, если адаптивные таймауты выключены).
+    """
+    global _history
+    if not ADAPTIVE_TIMEOUTS_ENABLED:
+        return None
+    with _history_lock:
+        if _history is None:
+            _history = LatencyHistory(LATENCY_HISTORY_PATH)
+            atexit.register(_history.flush)
+        return _history
+
+def range_stage(stage, start_dt, end_dt, buckets=DOWNLOAD_RANGE_BUCKETS):
+    """
+    Имя этапа с корзиной длины периода: 'download:1d', 'download:7d', ..., 'download:long'.
+    """
+    days = (end_dt - start_dt).total_seconds() / 86400
+    for limit in buckets:
+        if days <= limit:
+            return f"{stage}:{limit}d"
+    return f"{stage}:long"
+
+def adaptive_timeout(stage, default):
+    history = get_latency_history()
+    return history.timeout(stage, default) if history else default
+
+def record_latency(stage, duration):
+    history = get_latency_history()
+    if history:
+        history.record(stage, duration)
+
+def record_timeout(stage, timeout):
+    """
+    Ожидание не дождалось: настоящая задержка не меньше таймаута, он и записывается
+    (цензурированный замер). Иначе на медленном сервере в историю попадали бы только
+    быстрые успехи, и таймаут этапа никогда бы не вырос.
+    """
+    record_latency(stage, timeout)
@@ -0,0 +1,112 @@
+import logging
+import os
+from selenium.common.exceptions import WebDriverException
+
+logger = logging.getLogger("stat2serg_logger")
+
+# Функции Chrome, которые сценарию экспорта не нужны
+LEAN_CHROME_ARGS = [
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-translate",
+    "--disable-features=Translate,OptimizationHints,MediaRouter,AutofillServerCommunication",
+    "--mute-audio",
+    "--no-first-run",
+    "--blink-settings=imagesEnabled=false",
+]
+
+# 2 = запретить; картинки и уведомления на странице не используются
+LEAN_CONTENT_PREFS = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.default_content_setting_values.notifications": 2,
+    "profile.default_content_setting_values.geolocation": 2,
+}
+
+_NAVIGATION_TIMING_JS = """
+var nav = performance.getEntriesByType('navigation')[0];
+if (!nav) { return null; }
+return {
+    dom_content_loaded_ms: Math.round(nav.domContentLoadedEventEnd),
+    load_ms: Math.round(nav.loadEventEnd),
+    transfer_bytes: nav.transferSize,
+    resources: performance.getEntriesByType('resource').length
+};
+"""
+
+def apply_lean_options(chrome_options, prefs):
+    """
+    Дополняет опции Chrome облегченным режимом. prefs нужно передать
+    до вызова add_experimental_option("prefs", ...).
+    """
+    prefs.update(LEAN_CONTENT_PREFS)
+    for argument in LEAN_CHROME_ARGS:
+        chrome_options.add_argument(argument)
+    # Не ждем картинок и iframe: скрипты страницы готовы уже к DOMContentLoaded
+    chrome_options.page_load_strategy = "eager"
+
+def block_heavy_assets(driver, patterns):
+    """
+    Блокирует загрузку статических ресурсов по шаблонам через CDP Network.setBlockedURLs.
+    Стили не блокируются: от них зависит is_displayed() и видимость календарей.
+    """
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(patterns)})
+        logger.info(f"Облегченный режим: заблокировано шаблонов URL: {len(patterns)}.")
+        return True
+    except WebDriverException as e:
+        logger.warning(f"Не удалось заблокировать ресурсы через CDP: {e}")
+        return False
+
+def _children(pid):
+    children = []
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", "r") as f:
+            children = [int(child) for child in f.read().split()]
+    except (OSError, ValueError):
+        pass
+    return children
+
+def _rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+def browser_rss_bytes(driver):
+    """
+    Суммарный RSS chromedriver и всех процессов Chrome (только Linux, через /proc).
+    """
+    try:
+        root_pid = driver.service.process.pid
+    except AttributeError:
+        return None
+    if not os.path.isdir(f"/proc/{root_pid}"):
+        return None
+    total = 0
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        total += _rss_bytes(pid)
+        pending.extend(_children(pid))
+    return total
+
+def log_browser_stats(driver, label):
+    """
+    Пишет в лог время загрузки текущей страницы и память браузера.
+    """
+    try:
+        timing = driver.execute_script(_NAVIGATION_TIMING_JS)
+    except WebDriverException:
+        timing = None
+    rss = browser_rss_bytes(driver)
+    rss_text = f"{rss / (1024 * 1024):.0f} МБ" if rss else "н/д"
+    logger.info(f"[{label}] Загрузка страницы: {timing or 'н/д'}, память браузера (RSS): {rss_text}")
+    return {"timing": timing, "rss_bytes": rss}
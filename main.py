@@ -1,21 +1,45 @@
 import logging
 import time
 import os
+import threading
+from contextlib import contextmanager, ExitStack
 from date_selector import DateSelector
-from email_sender import EmailSender # Импортируем наш новый класс
-from datetime import datetime, timedelta
+from email_sender import get_email_sender, parse_recipients
+from outbox import Outbox, OutboxWorker
+from http_exporter import HttpExporter
+from session_cache import SessionCookieCache
+from driver_profiler import CommandProfiler
+from run_metrics import RunMetrics, NULL_SPAN
+from popup_script import EXPORT_POPUP_SCRIPT
+from lean_browser import apply_lean_options, block_heavy_assets, log_browser_stats
+from download_tracker import DownloadTracker
+from download_watcher import inotify_available, wait_for_download_inotify, wait_for_download_polling
+from waits import Waiter, page_idle, grid_loaded, overlay_gone, combo_value_committed
+from latency_history import adaptive_timeout, record_latency, record_timeout, get_latency_history, range_stage
+from selector_cache import get_selector_cache
+from checkpoint import JobCheckpoint, make_job_id
+from date_ranges import parse_date, relative_range, DATETIME_FORMAT
+from normalize_export import normalize_export
+from event_store import ingest_export
+from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 from config import (
     LOGIN_URL, USERNAME, PASSWORD, USERNAME_FIELD_ID,
     PASSWORD_FIELD_ID, SUBMIT_BUTTON_ID, CHROME_PROFILE_PATH, LOGGER_NAME, FILE_FORMAT_TEXT,
-    EXPORT_BUTTON_TEXT, OK_BUTTON_ID_PREFIX,
-    EMAIL_ACCOUNT_OUT, EMAIL_PASSWORD_OUT, SMTP_SERVER_OUT, EMAIL_RECEIVER
+    OK_BUTTON_ID_PREFIX, EXPORT_BUTTON_TEXTS, OK_BUTTON_TEXTS, NO_OPTION_TEXTS,
+    DATE_FROM_TITLES, DATE_TO_TITLES, SEARCH_BUTTON_TITLES,
+    EMAIL_ACCOUNT_OUT, EMAIL_PASSWORD_OUT, SMTP_SERVER_OUT, EMAIL_RECEIVER,
+    HTTP_EXPORT_ENABLED, SESSION_CACHE_PATH, SESSION_CACHE_TTL, SESSION_CHECK_URL,
+    CDP_DOWNLOAD_TRACKING, LEAN_BROWSER_MODE, LEAN_BLOCKED_URL_PATTERNS, WEBDRIVER_PROFILING,
+    METRICS_ENABLED, METRICS_JSONL_PATH, METRICS_TEXTFILE_PATH,
+    CHECKPOINT_DIR, EXPORT_MAX_ATTEMPTS, EXPORT_RETRY_DELAY, NORMALIZE_EXPORTS, NORMALIZED_SUBDIR,
+    EVENT_STORE_ENABLED, ATTACHMENT_COMPRESSION, ATTACHMENT_COMPRESS_MIN_BYTES,
+    SMTP_PORT, SMTP_IDLE_CHECK, SMTP_RECONNECT_ATTEMPTS, OUTBOX_ENABLED, OUTBOX_PATH, OUTBOX_DRAIN_TIMEOUT
 )
 
 # Настройка логирования
@@ -23,54 +47,51 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(name)s] %(message
 logger = logging.getLogger(LOGGER_NAME)
 
 OK_BUTTON_ID_PREFIX = "editForm"  # Или любое другое значение, если оно изменилось
-FILE_FORMAT_TEXT = "CSV"  # Или "PDF", "CSV" и т.д.
+
+# Проверка сессии запросом из страницы: fetch с cookie браузера не уводит его с текущей страницы.
+# Возвращает {status, url, login} или {error}.
+_SESSION_CHECK_JS = """
+var url = arguments[0], fieldId = arguments[1], done = arguments[arguments.length - 1];
+fetch(url, { credentials: 'same-origin', cache: 'no-store' }).then(function (response) {
+    return response.text().then(function (body) {
+        var login = new RegExp("id=[\"']" + fieldId + "[\"']").test(body);
+        done({ status: response.status, url: response.url, login: login });
+    });
+}).catch(function (e) { done({ error: String(e) }); });
+"""
 
 class AuthWorker:
-    def __init__(self):
+    def __init__(self, download_dir=None, profile_dir=CHROME_PROFILE_PATH, session_cache_path=SESSION_CACHE_PATH,
+                 lean=LEAN_BROWSER_MODE, profile_commands=WEBDRIVER_PROFILING):
+        """
+        :param download_dir: Папка для загрузок (по умолчанию ~/Downloads/My_Exports).
+        :param profile_dir: Профиль Chrome; у параллельных браузеров он должен быть свой.
+        :param session_cache_path: Файл кэша cookie сессии.
+        :param lean: Облегченный режим: без картинок, шрифтов и лишних функций Chrome.
+        :param profile_commands: Считать команды WebDriver и их длительность по этапам.
+        """
         self.driver = None
+        self.lean = lean
+        self.profiler = CommandProfiler() if profile_commands else None
+        # RunMetrics текущего запуска; задается снаружи (см. __main__ и BatchRunner)
+        self.metrics = None
+        self.profile_dir = profile_dir
+        self.download_tracker = None
+        self.session_cache = SessionCookieCache(session_cache_path, SESSION_CACHE_TTL)
         # Задаем папку для загрузок
-        self.download_dir = os.path.join(os.path.expanduser("~"), "Downloads", "My_Exports")
+        self.download_dir = download_dir or os.path.join(os.path.expanduser("~"), "Downloads", "My_Exports")
         if not os.path.exists(self.download_dir):
             os.makedirs(self.download_dir)
             logger.info(f"Создана папка для загрузок: {self.download_dir}")
 
     def login(self):
         try:
-            logger.info("Инициализация браузера Chrome...")
-            chrome_options = Options()
-            if CHROME_PROFILE_PATH:
-                chrome_options.add_argument(f"user-data-dir={CHROME_PROFILE_PATH}")
-            chrome_options.add_argument("--start-maximized")
-            
-            # Настройка опций для загрузки
-            prefs = {
-                "download.default_directory": self.download_dir,
-                "download.prompt_for_download": False,
-                "download.directory_upgrade": True,
-                "safebrowsing.enabled": True
-            }
-            chrome_options.add_experimental_option("prefs", prefs)
-            chrome_options.add_argument("--headless=new")
-
-            
-            service = Service()
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
-            self.driver.get(LOGIN_URL)
-            logger.info("Переход на страницу входа.")
-            WebDriverWait(self.driver, 20).until(
-                EC.presence_of_element_located((By.ID, USERNAME_FIELD_ID))
-            )
-            logger.info("Страница загружена. Вводим данные.")
-            self.driver.find_element(By.ID, USERNAME_FIELD_ID).send_keys(USERNAME)
-            self.driver.find_element(By.ID, PASSWORD_FIELD_ID).send_keys(PASSWORD)
-            submit_button = self.driver.find_element(By.ID, SUBMIT_BUTTON_ID)
-            submit_button.click()
-            time.sleep(5)
-            if self.driver.current_url != LOGIN_URL:
-                logger.info("Авторизация успешна.")
-                return True
-            else:
-                logger.error("Авторизация не удалась. Проверьте логин и пароль.")
+            with self.stage("browser_start"):
+                self.start_browser()
+            with self.stage("login") as span:
+                if self.authenticate():
+                    return True
+                span.fail("авторизация не удалась")
                 return False
         except (TimeoutException, NoSuchElementException) as e:
             logger.error(f"Ошибка во время авторизации: {e}")
@@ -79,24 +100,162 @@ class AuthWorker:
             logger.error(f"Ошибка веб-драйвера: {e}")
             return False
 
+    def start_browser(self):
+        logger.info("Инициализация браузера Chrome...")
+        chrome_options = Options()
+        if self.profile_dir:
+            chrome_options.add_argument(f"user-data-dir={self.profile_dir}")
+        chrome_options.add_argument("--start-maximized")
+        
+        # Настройка опций для загрузки
+        prefs = {
+            "download.default_directory": self.download_dir,
+            "download.prompt_for_download": False,
+            "download.directory_upgrade": True,
+            "safebrowsing.enabled": True
+        }
+        if self.lean:
+            apply_lean_options(chrome_options, prefs)
+        chrome_options.add_experimental_option("prefs", prefs)
+        chrome_options.add_argument("--headless=new")
+        if CDP_DOWNLOAD_TRACKING:
+            # События загрузки DevTools читаются из performance-лога
+            chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+        service = Service()
+        self.driver = webdriver.Chrome(service=service, options=chrome_options)
+        if self.profiler:
+            self.profiler.install(self.driver)
+        if CDP_DOWNLOAD_TRACKING:
+            tracker = DownloadTracker(self.driver, self.download_dir)
+            self.download_tracker = tracker if tracker.enable() else None
+        if self.lean:
+            block_heavy_assets(self.driver, LEAN_BLOCKED_URL_PATTERNS)
+
+    def authenticate(self):
+        """
+        Открывает страницу входа в уже запущенном браузере: сначала пробует
+        кэш сессии, затем вводит учетные данные.
+        """
+        self.driver.get(LOGIN_URL)
+        logger.info("Переход на страницу входа.")
+        Waiter(self.driver).until(
+            EC.presence_of_element_located((By.ID, USERNAME_FIELD_ID)), 20, stage="login_form"
+        )
+        log_browser_stats(self.driver, "страница входа, облегченный режим" if self.lean else "страница входа")
+        if self.restore_session():
+            return True
+        logger.info("Страница загружена. Вводим данные.")
+        self.driver.find_element(By.ID, USERNAME_FIELD_ID).send_keys(USERNAME)
+        self.driver.find_element(By.ID, PASSWORD_FIELD_ID).send_keys(PASSWORD)
+        submit_button = self.driver.find_element(By.ID, SUBMIT_BUTTON_ID)
+        submit_button.click()
+        try:
+            Waiter(self.driver).until(EC.url_changes(LOGIN_URL), 20, stage="login_redirect")
+        except TimeoutException:
+            pass
+        if self.driver.current_url != LOGIN_URL:
+            logger.info("Авторизация успешна.")
+            self.session_cache.save(self.driver.get_cookies())
+            return True
+        else:
+            logger.error("Авторизация не удалась. Проверьте логин и пароль.")
+            return False
+
+    def restore_session(self):
+        """
+        Подставляет cookie из кэша и проверяет их одним запросом к SESSION_CHECK_URL.
+        Вызывается, когда открыта страница входа (add_cookie требует домен текущей страницы).
+        """
+        cookies = self.session_cache.load()
+        if not cookies:
+            return False
+        try:
+            logger.info("Найден кэш сессии. Пробуем войти без ввода пароля...")
+            self.session_cache.inject_into_driver(self.driver, cookies)
+            self.driver.get(SESSION_CHECK_URL)
+            if self.driver.current_url.split("?")[0] != LOGIN_URL and \
+                    not self.driver.find_elements(By.ID, USERNAME_FIELD_ID):
+                logger.info("✅ Сессия восстановлена из кэша.")
+                return True
+        except WebDriverException as e:
+            logger.warning(f"Не удалось восстановить сессию из кэша: {e}")
+        logger.info("Сервер отклонил сохраненную сессию. Выполняем полный вход.")
+        self.session_cache.clear()
+        self.driver.delete_all_cookies()
+        self.driver.get(LOGIN_URL)
+        Waiter(self.driver).until(
+            EC.presence_of_element_located((By.ID, USERNAME_FIELD_ID)), 20, stage="login_form"
+        )
+        return False
+
+    def is_session_alive(self, timeout=15):
+        """
+        Проверяет сессию запросом к SESSION_CHECK_URL из открытой страницы: сессия жива,
+        если сервер ответил 2xx и не перенаправил на страницу входа.
+        """
+        if not self.driver:
+            return False
+        try:
+            self.driver.set_script_timeout(timeout)
+            result = self.driver.execute_async_script(_SESSION_CHECK_JS, SESSION_CHECK_URL, USERNAME_FIELD_ID)
+        except WebDriverException as e:
+            logger.warning(f"Не удалось проверить сессию браузера: {e}")
+            return False
+        if not result or result.get("error"):
+            logger.warning(f"Запрос проверки сессии не выполнен: {(result or {}).get('error')}")
+            return False
+        return 200 <= result["status"] < 300 and not result["login"] and \
+            result["url"].split("?")[0] != LOGIN_URL
+
     def get_driver(self):
         return self.driver
 
+    @contextmanager
+    def stage(self, name):
+        """
+        Контекст этапа: помечает команды WebDriver для профилировщика и пишет
+        тайминг этапа в метрики запуска. Возвращает span (span.fail() — этап не удался).
+        """
+        with ExitStack() as stack:
+            if self.profiler:
+                stack.enter_context(self.profiler.stage(name))
+            yield stack.enter_context(self.metrics.span(name)) if self.metrics else NULL_SPAN
+
     def cleanup(self):
+        if self.profiler and self.profiler.records:
+            report_name = f"webdriver_profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            self.profiler.log_report(os.path.join(self.download_dir, report_name))
+            self.profiler.uninstall()
         if self.driver:
             logger.info("Закрываем браузер.")
-            self.driver.quit()
+            try:
+                self.driver.quit()
+            except WebDriverException as e:
+                logger.warning(f"Ошибка при закрытии браузера: {e}")
+            self.driver = None
+        history = get_latency_history()
+        if history:
+            history.flush()
 
 class Exporter:
-    def __init__(self, driver):
+    def __init__(self, driver, report_type=None, use_single_script=True, selector_cache=None):
         self.driver = driver
+        self.report_type = report_type or FILE_FORMAT_TEXT
+        self.use_single_script = use_single_script
+        self.waiter = Waiter(driver)
+        self.selectors = selector_cache or get_selector_cache()
 
     def click_export_button_sequentially(self):
         try:
             logger.info("Поиск и клик по кнопке 'Export'...")
-            export_button_div = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, f"//div[text()='{EXPORT_BUTTON_TEXT}']"))
+            _, export_button_div = self.selectors.find(
+                self.waiter, "export_button",
+                [(text, (By.XPATH, f"//div[text()='{text}']")) for text in EXPORT_BUTTON_TEXTS],
+                10, stage="export_button"
             )
+            # Оверлей от предыдущего окна перехватывает клики
+            self.waiter.settle(overlay_gone(), 10, "скрытие оверлея")
             export_button_div.click()
             logger.info("Кнопка 'Export' нажата. Ожидаем всплывающее окно...")
             return True
@@ -107,12 +266,63 @@ class Exporter:
 
 ##################################################################
 
+    def interact_with_export_popup_script(self, timeout=None):
+        """
+        Быстрый путь: весь сценарий модального окна выполняется в браузере
+        за один вызов execute_async_script. Возвращает структурированный результат
+        (шаги, итоговый reportType, данные формы, тайминги) или None при ошибке.
+        :param timeout: Таймаут ожидания кнопки OK и закрытия окна, с (по умолчанию из истории задержек).
+        """
+        logger.info("Обрабатываем модальное окно одним скриптом в браузере...")
+        timeout = timeout or adaptive_timeout("popup_script", 30)
+        try:
+            self.driver.set_script_timeout(timeout * 2 + 5)
+            result = self.driver.execute_async_script(
+                EXPORT_POPUP_SCRIPT, OK_BUTTON_ID_PREFIX, OK_BUTTON_TEXTS, NO_OPTION_TEXTS,
+                PASSWORD, self.report_type, timeout * 1000
+            )
+        except WebDriverException as e:
+            logger.warning(f"Скрипт модального окна завершился с ошибкой: {e}")
+            return None
+        logger.info(f"Результат скрипта модального окна: шаги={result.get('steps')}, "
+                    f"reportType={result.get('reportType')}, тайминги={result.get('timings')}")
+        logger.info(f"Данные формы перед отправкой: {result.get('form')}")
+        if not result.get("ok"):
+            if "ok_clicked" in (result.get("steps") or []):
+                # Выгрузка уже запущена: повторный клик по OK из пошагового пути запустил бы вторую
+                logger.warning(f"OK нажата, но модальное окно не закрылось ({result.get('error')}), "
+                               f"считаем выгрузку запущенной.")
+                return result
+            logger.warning(f"Скрипт модального окна не завершился успешно: {result.get('error')}")
+            return None
+        record_latency("popup_script", result.get("timings", {}).get("total", 0) / 1000)
+        return result
+
     def interact_with_export_popup(self):
+        if self.use_single_script and self.selectors.preferred("popup_mode") != "stepwise":
+            if self.interact_with_export_popup_script():
+                self.selectors.remember("popup_mode", "script")
+                return True
+            logger.info("Переходим к пошаговой обработке модального окна.")
+        if self.interact_with_export_popup_stepwise():
+            if self.use_single_script:
+                self.selectors.remember("popup_mode", "stepwise")
+            return True
+        self.selectors.forget("popup_mode")
+        return False
+
+    def interact_with_export_popup_stepwise(self):
+        """
+        Пошаговая обработка модального окна командами WebDriver (запасной путь).
+        """
         logger.info("Начинаем комплексную диагностику модального окна... [%s]", datetime.now().strftime("%Y-%m-%d %H:%M:%S EEST"))
         try:
             logger.info("Ожидаем появления кнопки 'OK' во всплывающем окне...")
-            ok_button = WebDriverWait(self.driver, 20).until(
-                EC.element_to_be_clickable((By.XPATH, f"//button[starts-with(@id, '{OK_BUTTON_ID_PREFIX}') and text()='OK']"))
+            _, ok_button = self.selectors.find(
+                self.waiter, "ok_button",
+                [(text, (By.XPATH, f"//button[starts-with(@id, '{OK_BUTTON_ID_PREFIX}') and text()='{text}']"))
+                 for text in OK_BUTTON_TEXTS],
+                20, clickable=True, stage="ok_button"
             )
             logger.info("Кнопка 'OK' найдена.")
 
@@ -125,10 +335,12 @@ class Exporter:
 
             # Шаг 1: Пробуем кликнуть по опции 'No'
             logger.info("Шаг 1: Пробуем кликнуть по опции 'No'...")
-            try:
-                no_radio_input = WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_element_located((By.ID, "no"))
-                )
+            # Радиокнопка по ID и подписи на всех языках ищутся одним ожиданием
+            no_locators = [("radio_id", (By.ID, "no"))] + [
+                (f"label:{text}", (By.XPATH, f"//label[contains(text(), '{text}')]")) for text in NO_OPTION_TEXTS
+            ]
+            no_strategy, no_element = self.selectors.find(self.waiter, "no_option", no_locators, 10, stage="popup_field")
+            if no_strategy == "radio_id":
                 logger.info("Элемент 'No' по ID найден. Пробуем кликнуть через JavaScript.")
                 self.driver.execute_script(
                     """
@@ -136,63 +348,70 @@ class Exporter:
                     input.checked = true;
                     var event = new Event('change', { bubbles: true });
                     input.dispatchEvent(event);
-                    """, no_radio_input
+                    """, no_element
                 )
                 logger.info("Успешный клик по опции 'No' через JavaScript (ID).")
-                time.sleep(1)  # Даем время на обработку inputPassword()
-            except Exception as e:
-                logger.warning(f"Не удалось кликнуть по 'No' через ID. Причина: {e}")
-                logger.info("Пробуем альтернативный вариант.")
-                no_label = WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_element_located((By.XPATH, "//label[contains(text(), 'No')]"))
-                )
+            else:
                 logger.info("Элемент 'No' по тексту найден. Пробуем кликнуть через JavaScript.")
-                self.driver.execute_script("arguments[0].click();", no_label)
+                self.driver.execute_script("arguments[0].click();", no_element)
                 logger.info("Успешный клик по опции 'No' через JavaScript (XPATH).")
-                time.sleep(1)
 
             # Шаг 2: Пробуем найти и ввести пароль, если нужно
             try:
                 logger.info("Пробуем найти поле для пароля пользователя...")
-                user_password_field = WebDriverWait(self.driver, 5).until(
-                    EC.visibility_of_element_located((By.ID, "loginPwd"))
-                )
+                if self.selectors.preferred("password_field") == "absent":
+                    # На этом устройстве после 'No' поле пароля скрыто: проверяем без ожидания
+                    user_password_field = next(
+                        (field for field in self.driver.find_elements(By.ID, "loginPwd") if field.is_displayed()), None
+                    )
+                    if user_password_field is None:
+                        raise NoSuchElementException("поле пароля скрыто")
+                else:
+                    user_password_field = self.waiter.until(
+                        EC.visibility_of_element_located((By.ID, "loginPwd")), 5, stage="popup_field"
+                    )
                 if user_password_field.is_displayed() and user_password_field.is_enabled():
                     logger.info("Поле для пароля найдено и активно. Имитируем ввод.")
                     user_password_field.click()
                     user_password_field.clear()
                     user_password_field.send_keys(PASSWORD)
                     logger.info("Пароль пользователя введен.")
-                    time.sleep(5)
                     self.driver.find_element(By.TAG_NAME, "body").click()
-                    time.sleep(2)
+                    # Потеря фокуса может запускать AJAX-проверку пароля
+                    self.waiter.settle(page_idle(), 10, "проверка пароля")
+                    self.selectors.remember("password_field", "visible")
                 else:
                     logger.info("Поле для пароля пользователя не видимо или не активно, пропускаем этот шаг.")
             except (TimeoutException, NoSuchElementException):
                 logger.info("Поле для пароля пользователя не найдено, пропускаем этот шаг.")
+                self.selectors.remember("password_field", "absent")
 
             # Шаг 3: Пробуем установить формат через DHTMLX Combo API
-            from config import FILE_FORMAT_TEXT
-            logger.info(f"Шаг 3: Пытаемся установить формат '{FILE_FORMAT_TEXT}' через DHTMLX Combo...")
+            report_type = self.report_type
+            logger.info(f"Шаг 3: Пытаемся установить формат '{report_type}' через DHTMLX Combo...")
             try:
+                if self.selectors.preferred("report_type") == "hidden_inputs":
+                    raise Exception("на этом устройстве combo-box ранее не сработал (кэш селекторов)")
                 # Находим combo-box
-                combo_container = WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'search-combo-box') and contains(@comid, 'reportType')]"))
+                combo_container = self.waiter.until(
+                    EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'search-combo-box') and contains(@comid, 'reportType')]")),
+                    10, stage="popup_field"
                 )
                 combo_id = combo_container.get_attribute('comid')
                 logger.info(f"Найден combo-box с comid: {combo_id}")
 
                 # Устанавливаем значение через DHTMLX Combo API
                 self.driver.execute_script(
-                    f'ZKUI.Combo.get("#{combo_id}").combo.setComboValue("{FILE_FORMAT_TEXT}");'
+                    f'ZKUI.Combo.get("#{combo_id}").combo.setComboValue("{report_type}");'
                 )
-                time.sleep(1)  # Даем время на синхронизацию UI
+                # Ждем синхронизации скрытого поля с combo-box
+                self.waiter.settle(combo_value_committed("reportType", report_type), 5, "значение combo-box")
 
                 # Проверяем значение в скрытом поле
                 selected_value = self.driver.find_element(By.CSS_SELECTOR, "input[name='reportType']").get_attribute("value")
                 logger.info(f"Значение reportType после установки через Combo: {selected_value}")
-                if selected_value.lower() != FILE_FORMAT_TEXT.lower():
-                    raise Exception(f"Формат не изменился на {FILE_FORMAT_TEXT}")
+                if selected_value.lower() != report_type.lower():
+                    raise Exception(f"Формат не изменился на {report_type}")
 
                 # Устанавливаем reportType_new_value в true
                 self.driver.execute_script(
@@ -200,6 +419,7 @@ class Exporter:
                 )
                 new_value_flag = self.driver.find_element(By.CSS_SELECTOR, "input[name='reportType_new_value']").get_attribute("value")
                 logger.info(f"reportType_new_value установлено: {new_value_flag}")
+                self.selectors.remember("report_type", "combo_api")
             except Exception as e:
                 logger.warning(f"Не удалось установить формат через DHTMLX Combo: {e}. Пробуем через скрытые поля...")
 
@@ -210,21 +430,25 @@ class Exporter:
                     input.value = arguments[0];
                     var event = new Event('change', { bubbles: true });
                     input.dispatchEvent(event);
-                    """, FILE_FORMAT_TEXT
+                    """, report_type
                 )
                 self.driver.execute_script(
                     'document.querySelector("input[name=\'reportType_new_value\']").value = "true";'
                 )
-                time.sleep(1)
                 selected_value = self.driver.find_element(By.CSS_SELECTOR, "input[name='reportType']").get_attribute("value")
                 new_value_flag = self.driver.find_element(By.CSS_SELECTOR, "input[name='reportType_new_value']").get_attribute("value")
                 logger.info(f"Формат установлен через скрытые поля: reportType={selected_value}, reportType_new_value={new_value_flag}")
+                if selected_value.lower() == report_type.lower():
+                    self.selectors.remember("report_type", "hidden_inputs")
+                else:
+                    self.selectors.forget("report_type")
 
             # Шаг 4: Динамически находим форму и проверяем данные
             logger.info("Шаг 4: Проверяем данные формы перед отправкой...")
             try:
-                export_form = WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'dhxwin_active')]//form[contains(@id, 'editForm')]"))
+                export_form = self.waiter.until(
+                    EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'dhxwin_active')]//form[contains(@id, 'editForm')]")),
+                    10, stage="popup_field"
                 )
                 form_id = export_form.get_attribute("id")
                 logger.info(f"Найдена форма с ID: {form_id}")
@@ -241,138 +465,562 @@ class Exporter:
             logger.info("Кнопка 'OK' нажата. Начинается загрузка файла.")
 
             try:
-                WebDriverWait(self.driver, 30).until(
-                    EC.staleness_of(ok_button)
-                )
+                self.waiter.until(EC.staleness_of(ok_button), 30, stage="modal_close")
                 logger.info("Модальное окно закрылось.")
             except TimeoutException:
-                logger.warning("Модальное окно не закрылось автоматически в течение 30 секунд.")
+                logger.warning("Модальное окно не закрылось автоматически.")
 
             return True
         except Exception as e:
             logger.error(f"Критическая ошибка при работе со всплывающим окном: {e}")
-            time.sleep(30)
             return False
 
 ########################################################################################
             
-def find_new_file(download_dir, initial_files, timeout=60, check_interval=1):
+def find_new_file(download_dir, initial_files, timeout=None, check_interval=1, stage="download"):
     """
     Находит новый файл в указанной директории после скачивания.
+    На Linux ждет события inotify, иначе опрашивает папку.
+    Без явного timeout он берется из истории задержек этапа stage.
     """
     logger.info("Начинаем поиск нового файла в папке загрузок...")
-    end_time = time.time() + timeout
-    while time.time() < end_time:
-        current_files = os.listdir(download_dir)
-        new_files = list(set(current_files) - set(initial_files))
-        
-        if new_files:
-            file_name = new_files[0]
-            file_path = os.path.join(download_dir, file_name)
-            
-            initial_size = -1
-            for _ in range(5):
-                try:
-                    current_size = os.path.getsize(file_path)
-                    if current_size > 0 and current_size == initial_size:
-                        logger.info(f"✅ Новый файл найден и полностью скачан: {file_name}")
-                        return file_path
-                    initial_size = current_size
-                except Exception as e:
-                    logger.warning(f"Ошибка при проверке размера файла: {e}")
-                time.sleep(check_interval)
-            
-            logger.warning(f"Найден файл {file_name}, но он, возможно, еще скачивается.")
-            return file_path
-            
-        time.sleep(check_interval)
-    
+    adaptive = timeout is None
+    if adaptive:
+        timeout = adaptive_timeout(stage, 60)
+    started = time.time()
+    file_path = None
+    if inotify_available():
+        try:
+            file_path = wait_for_download_inotify(download_dir, initial_files, timeout)
+        except OSError as e:
+            logger.warning(f"inotify недоступен ({e}). Переходим к опросу папки.")
+            file_path = wait_for_download_polling(download_dir, initial_files, timeout, check_interval)
+    else:
+        file_path = wait_for_download_polling(download_dir, initial_files, timeout, check_interval)
+
+    if file_path:
+        logger.info(f"✅ Новый файл найден и полностью скачан: {os.path.basename(file_path)}")
+        if adaptive:
+            record_latency(stage, time.time() - started)
+        return file_path
     logger.error("❌ Не удалось найти новый файл в папке загрузок в течение установленного таймаута.")
+    if adaptive:
+        record_timeout(stage, timeout)
     return None
 
-if __name__ == "__main__":
-    auth_worker = AuthWorker()
-    if auth_worker.login():
-        logger.info("Авторизация прошла успешно. Переходим к экспорту.")
-        time.sleep(15)
-        driver = auth_worker.get_driver()
-        date_selector = DateSelector(driver)
-
-
-        # 1. Рассчитываем даты
-        now = datetime.now()
-        # Вычисляем дату текущего понедельника (weekday() возвращает 0 для понедельника)
-        days_since_monday = now.weekday()
-        current_monday = now - timedelta(days=days_since_monday)
-        
-        # Вычисляем дату понедельника прошлой недели
-        last_monday = current_monday - timedelta(weeks=1)
+def get_last_week_range(now=None):
+    """
+    Возвращает (понедельник прошлой недели, текущий понедельник) без времени.
+    """
+    return relative_range("previous_week", now)
 
-        # Форматируем даты в нужный формат
-        start_date_str = last_monday.strftime("%Y-%m-%d 00:00:00")
-        end_date_str = current_monday.strftime("%Y-%m-%d 00:00:00")
-        
-        # 2. Вызываем универсальную функцию с рассчитанными датами
-        success_start = date_selector.select_date_and_time('Time From', start_date_str)
-##        success_start = True
-##        success_end = True
-        success_end = False
-        if success_start:
-            success_end = date_selector.select_date_and_time('To', end_date_str)
-        
-#        success_start = date_selector.select_date_and_time('Time From', "2025-09-20 00:00:00")
-#        success_end = False
-#        if success_start:
-#            success_end = date_selector.select_date_and_time('To', "2025-09-22 23:59:59")
-        
-        if success_start and success_end:
-            logger.info("Обе даты установлены. Нажимаем на кнопку 'Поиск'.")
-            search_button_xpath = "//div[contains(@class, 'search_button_new') and @title='Search']"
+def set_report_dates(auth_worker, date_selector, start_date_str, end_date_str):
+    """
+    Устанавливает период отчета в полях начала и конца (подписи на любом из языков
+    DATE_FROM_TITLES / DATE_TO_TITLES). Возвращает True/False.
+    """
+    try:
+        from_title = date_selector.field_title("date_from_field", DATE_FROM_TITLES)
+        to_title = date_selector.field_title("date_to_field", DATE_TO_TITLES)
+    except TimeoutException:
+        logger.error(f"❌ Поля периода не найдены ни по одной подписи: {DATE_FROM_TITLES}, {DATE_TO_TITLES}.")
+        return False
+    with auth_worker.stage("date_from") as span:
+        success_start = date_selector.select_date_and_time(from_title, start_date_str)
+        if not success_start:
+            span.fail()
+    success_end = False
+    if success_start:
+        with auth_worker.stage("date_to") as span:
+            success_end = date_selector.select_date_and_time(to_title, end_date_str)
+            if not success_end:
+                span.fail()
+
+    if not (success_start and success_end):
+        logger.error("❌ Тест провален. Не удалось установить одну или обе даты.")
+        return False
+    return True
+
+def run_search(auth_worker):
+    """
+    Нажимает 'Search' и ждет загрузки грида. Возвращает True/False.
+    """
+    driver = auth_worker.get_driver()
+    logger.info("Обе даты установлены. Нажимаем на кнопку 'Поиск'.")
+    try:
+        with auth_worker.stage("search"):
+            _, search_button = get_selector_cache().find(
+                Waiter(driver), "search_button",
+                [(title, (By.XPATH, f"//div[contains(@class, 'search_button_new') and @title='{title}']"))
+                 for title in SEARCH_BUTTON_TITLES],
+                10, clickable=True, stage="search_button"
+            )
+            search_button.click()
+            logger.info("✅ Кнопка 'Поиск' нажата.")
+            Waiter(driver).settle(grid_loaded(), 30, "загрузка грида", stage="grid")
+        return True
+    except TimeoutException:
+        logger.error(f"❌ Не удалось найти или нажать на кнопку 'Поиск' ни по одной подписи: {SEARCH_BUTTON_TITLES}.")
+    except Exception as e:
+        logger.error(f"❌ Произошла непредвиденная ошибка при клике на 'Поиск': {e}")
+    return False
+
+def trigger_export(auth_worker, exporter):
+    """
+    Нажимает 'Export' и заполняет модальное окно.
+    Возвращает список файлов папки загрузок до начала скачивания или None при ошибке.
+    """
+    # Получаем список файлов до начала загрузки
+    initial_files = os.listdir(auth_worker.download_dir)
+    tracker = auth_worker.download_tracker
+    if tracker:
+        tracker.mark_export_started()
+    with auth_worker.stage("export_click") as span:
+        if not exporter.click_export_button_sequentially():
+            logger.error("Клик на кнопку 'Export' не удался.")
+            span.fail()
+            return None
+    with auth_worker.stage("popup") as span:
+        if not exporter.interact_with_export_popup():
+            logger.error("Не удалось завершить взаимодействие с всплывающим окном.")
+            span.fail()
+            return None
+    logger.info("Взаимодействие с всплывающим окном завершено. Ожидаем скачивания файла...")
+    return initial_files
+
+def download_stage(start_date_str, end_date_str):
+    """
+    Этап истории задержек для скачивания: таймаут зависит от длины периода.
+    """
+    return range_stage("download", parse_date(start_date_str), parse_date(end_date_str))
+
+def wait_for_download(auth_worker, initial_files, stage="download"):
+    """
+    Ждет завершения скачивания: по событиям CDP, иначе по папке загрузок.
+    :param stage: Этап истории задержек (см. download_stage).
+    Возвращает путь к файлу или None.
+    """
+    tracker = auth_worker.download_tracker
+    with auth_worker.stage("download") as span:
+        file_path = None
+        if tracker:
+            started = time.time()
+            timeout = adaptive_timeout(stage, 60)
+            file_path = tracker.wait_for_completion(initial_files, timeout=timeout)
+            if file_path:
+                record_latency(stage, time.time() - started)
+            elif time.time() - started >= timeout:
+                record_timeout(stage, timeout)
+        if not file_path:
+            # Без CDP (или если события не пришли) ищем файл в папке загрузок
+            file_path = find_new_file(auth_worker.download_dir, initial_files, timeout=5 if tracker else None,
+                                      stage=stage)
+        if not file_path:
+            span.fail()
+        return file_path
+
+def export_via_selenium(auth_worker, start_date_str, end_date_str, date_selector=None, exporter=None):
+    """
+    Выгружает отчет через UI в уже авторизованной сессии.
+    date_selector и exporter можно передать, чтобы переиспользовать их между периодами.
+    Возвращает путь к скачанному файлу или None.
+    """
+    driver = auth_worker.get_driver()
+    date_selector = date_selector or DateSelector(driver)
+    if not set_report_dates(auth_worker, date_selector, start_date_str, end_date_str):
+        return None
+    if not run_search(auth_worker):
+        return None
+    try:
+        initial_files = trigger_export(auth_worker, exporter or Exporter(driver))
+        if initial_files is None:
+            return None
+        return wait_for_download(auth_worker, initial_files, download_stage(start_date_str, end_date_str))
+    except Exception as e:
+        logger.error(f"❌ Произошла непредвиденная ошибка при экспорте: {e}")
+    return None
+
+def export_via_http(download_dir, start_date_str, end_date_str):
+    """
+    Быстрый путь без браузера. Возвращает путь к файлу или None.
+    """
+    http_exporter = HttpExporter(download_dir)
+    try:
+        if not http_exporter.login():
+            return None
+        return http_exporter.export(start_date_str, end_date_str)
+    finally:
+        http_exporter.close()
+
+def deliver_report(file_path, start_dt, end_dt, receiver_email=EMAIL_RECEIVER):
+    """
+    Отправляет отчет всем получателям одним письмом через общее SMTP-соединение процесса.
+    Возвращает статусы по каждому получателю.
+    """
+    logger.info(f"Готов к отправке файл: {file_path}")
+    email_sender = get_email_sender(
+        SMTP_SERVER_OUT, EMAIL_ACCOUNT_OUT, EMAIL_PASSWORD_OUT, compression=ATTACHMENT_COMPRESSION,
+        compress_min_bytes=ATTACHMENT_COMPRESS_MIN_BYTES, port=SMTP_PORT, idle_check=SMTP_IDLE_CHECK,
+        reconnect_attempts=SMTP_RECONNECT_ATTEMPTS
+    )
+    email_subject = "отчет за указанный период"
+    email_body = f"Здравствуйте,\n\nВ приложении находится ежедневный отчет за период с {start_dt.strftime('%d.%m.%Y')} по {end_dt.strftime('%d.%m.%Y')}."
+    return email_sender.send_message(receiver_email, email_subject, email_body, file_path)
+
+def send_report(file_path, start_dt, end_dt, receiver_email=EMAIL_RECEIVER):
+    statuses = deliver_report(file_path, start_dt, end_dt, receiver_email)
+    if any(status["status"] == "sent" for status in statuses.values()):
+        logger.info("✅ Файл успешно отправлен по электронной почте.")
+        return True
+    logger.error("❌ Не удалось отправить файл по электронной почте.")
+    return False
+
+_outbox_worker = None
+_outbox_lock = threading.Lock()
+
+def _deliver_outbox_item(item):
+    return deliver_report(item["file"], parse_date(item["start"]), parse_date(item["end"]), item["recipients"])
+
+def get_outbox_worker():
+    """
+    Фоновая отправка писем из очереди; запускается при первом обращении и сразу
+    подхватывает письма, не отправленные прошлыми запусками.
+    """
+    global _outbox_worker
+    with _outbox_lock:
+        if _outbox_worker is None:
+            _outbox_worker = OutboxWorker(Outbox(OUTBOX_PATH), _deliver_outbox_item).start()
+        return _outbox_worker
+
+def queue_report(file_path, start_dt, end_dt, receiver_email=EMAIL_RECEIVER, key=None):
+    """
+    Ставит отчет в очередь писем и сразу возвращает управление.
+    :param key: Ключ идемпотентности (по умолчанию — имя файла и получатели).
+    Возвращает (id письма, статус в очереди).
+    """
+    recipients = parse_recipients(receiver_email)
+    key = f"{key or os.path.basename(file_path)}|{','.join(sorted(recipients))}"
+    worker = get_outbox_worker()
+    result = worker.outbox.enqueue(key, file_path, start_dt.strftime(DATETIME_FORMAT),
+                                   end_dt.strftime(DATETIME_FORMAT), recipients)
+    worker.wake()
+    return result
+
+def drain_outbox(timeout=OUTBOX_DRAIN_TIMEOUT):
+    """
+    Перед выходом разового запуска дает очереди писем время отправиться.
+    Неотправленные письма остаются в очереди до следующего запуска.
+    """
+    if _outbox_worker is None:
+        return True
+    return _outbox_worker.drain(timeout)
+
+@contextmanager
+def _no_stage(name):
+    yield NULL_SPAN
+
+class ReportProcessor:
+    """
+    Обработка скачанной выгрузки: нормализация → база событий → письмо.
+    Одна реализация для разового запуска (ExportStateMachine), пакета и конвейера;
+    результат и ошибки шагов записываются в entry (запись манифеста).
+    Сбой нормализации или базы не останавливает отправку: письмо важнее.
+    """
+    def __init__(self, file_path, start_dt, end_dt, entry=None, receiver_email=EMAIL_RECEIVER, key=None,
+                 stage=None):
+        """
+        :param key: Ключ идемпотентности письма в очереди (см. queue_report).
+        :param stage: Контекст этапа для метрик (AuthWorker.stage).
+        """
+        self.file_path = file_path
+        self.start_dt = start_dt
+        self.end_dt = end_dt
+        self.entry = entry if entry is not None else {}
+        self.receiver_email = receiver_email
+        self.key = key
+        self.stage = stage or _no_stage
+
+    def normalize(self):
+        """
+        Приводит выгрузку к единому CSV. При ошибке остается исходный файл.
+        """
+        if not NORMALIZE_EXPORTS:
+            return self.file_path
+        output_dir = os.path.join(os.path.dirname(self.file_path), NORMALIZED_SUBDIR)
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, os.path.splitext(os.path.basename(self.file_path))[0] + ".normalized.csv")
+        with self.stage("normalize") as span:
+            normalized_path, stats = normalize_export(self.file_path, output_path)
+            if not normalized_path:
+                span.fail()
+                logger.warning("Отправляем исходный файл без нормализации.")
+                self.entry["normalize_stats"] = stats
+                return self.file_path
+        self.entry.update(file=normalized_path, source_file=self.file_path,
+                          rows=stats["rows"], normalize_rows_per_sec=stats["rows_per_sec"])
+        self.file_path = normalized_path
+        return normalized_path
+
+    def store(self):
+        """
+        Загружает выгрузку в базу событий. Возвращает число строк или None.
+        """
+        if not EVENT_STORE_ENABLED:
+            return None
+        with self.stage("store") as span:
+            self.entry["stored_rows"] = ingest_export(self.file_path)
+            if self.entry["stored_rows"] is None:
+                span.fail()
+                logger.warning("Выгрузка не попала в базу событий, продолжаем без нее.")
+                self.entry["error"] = "выгрузка не загружена в базу событий"
+        return self.entry["stored_rows"]
+
+    def mail(self):
+        """
+        Ставит отчет в очередь писем (или отправляет сразу, если очередь выключена).
+        Возвращает True, если отчет принят к отправке.
+        """
+        if OUTBOX_ENABLED:
+            # Отправкой с повторами занимается фоновый поток
+            self.entry["outbox_id"], _ = queue_report(self.file_path, self.start_dt, self.end_dt,
+                                                      self.receiver_email, key=self.key)
+            return True
+        with self.stage("email") as span:
+            statuses = deliver_report(self.file_path, self.start_dt, self.end_dt, self.receiver_email)
+            self.entry["recipients"] = {receiver: status["status"] for receiver, status in statuses.items()}
+            if any(status["status"] == "sent" for status in statuses.values()):
+                logger.info("✅ Файл успешно отправлен по электронной почте.")
+                return True
+            span.fail()
+        logger.error("❌ Не удалось отправить файл по электронной почте.")
+        self.entry["error"] = "не удалось отправить письмо"
+        return False
+
+    def run(self, send=True):
+        """
+        Все шаги подряд. Возвращает True, если отчет обработан (и принят к отправке).
+        """
+        self.normalize()
+        self.store()
+        return self.mail() if send else True
+
+class ExportStateMachine:
+    """
+    Выгрузка одного периода как цепочка этапов с контрольной точкой на job_id:
+    logged_in → dates_set → searched → exported → downloaded → normalized → stored → mailed.
+    Повтор продолжает с последнего успешного этапа: в живой сессии браузера
+    не нужно входить заново, а при ошибке SMTP повторно отправляется уже скачанный файл.
+    """
+    def __init__(self, auth_worker, start_date_str, end_date_str, report_type=None, job_id=None,
+                 send=True, receiver_email=EMAIL_RECEIVER, use_http=HTTP_EXPORT_ENABLED,
+                 max_attempts=EXPORT_MAX_ATTEMPTS, checkpoint_dir=CHECKPOINT_DIR):
+        self.auth_worker = auth_worker
+        self.start_date_str = start_date_str
+        self.end_date_str = end_date_str
+        self.report_type = report_type or FILE_FORMAT_TEXT
+        self.send = send
+        self.receiver_email = receiver_email
+        self.use_http = use_http
+        self.max_attempts = max_attempts
+        self.checkpoint = JobCheckpoint(
+            job_id or make_job_id(start_date_str, end_date_str, self.report_type), checkpoint_dir
+        )
+        self.date_selector = None
+        self.exporter = None
+        self.initial_files = None
+
+    @property
+    def final_stage(self):
+        return "mailed" if self.send else "stored"
+
+    @property
+    def file_path(self):
+        return self.checkpoint.file
+
+    def run(self):
+        """
+        Проходит оставшиеся этапы с повторами. Возвращает True, если выгрузка завершена.
+        """
+        checkpoint = self.checkpoint
+        checkpoint.restore(self.auth_worker.is_session_alive())
+        if checkpoint.reached(self.final_stage):
+            logger.info(f"Выгрузка {checkpoint.job_id} уже завершена ({checkpoint.stage}). Пропускаем.")
+            return True
+
+        # Лимит попыток действует в пределах запуска; счетчик в контрольной точке — общая статистика
+        attempt = 0
+        while True:
+            attempt += 1
+            total = checkpoint.start_attempt()
+            logger.info(f"Выгрузка {checkpoint.job_id}: попытка {attempt} (всего {total}), "
+                        f"продолжаем с этапа '{checkpoint.stage}'.")
+            if self._run_stages():
+                logger.info(f"✅ Выгрузка {checkpoint.job_id} завершена.")
+                return True
+            if attempt >= self.max_attempts:
+                logger.error(f"❌ Выгрузка {checkpoint.job_id} не удалась после {attempt} попыток "
+                             f"(последний успешный этап: {checkpoint.stage}).")
+                return False
+            time.sleep(EXPORT_RETRY_DELAY * attempt)
+
+    def _run_stages(self):
+        handlers = {
+            "started": self._login,
+            "logged_in": self._set_dates,
+            "dates_set": self._search,
+            "searched": self._export,
+            "exported": self._download,
+            "downloaded": self._normalize,
+            "normalized": self._store,
+            "stored": self._mail,
+        }
+        while not self.checkpoint.reached(self.final_stage):
+            stage = self.checkpoint.stage
             try:
-                search_button = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, search_button_xpath))
-                )
-                search_button.click()
-                logger.info("✅ Кнопка 'Поиск' нажата.")
-                time.sleep(5)
-                
-                # Получаем список файлов до начала загрузки
-                initial_files = os.listdir(auth_worker.download_dir)
-
-                exporter = Exporter(driver)
-                if exporter.click_export_button_sequentially():
-                    if exporter.interact_with_export_popup():
-                        logger.info("Взаимодействие с всплывающим окном завершено. Ожидаем скачивания файла...")
-                        
-                        # НОВЫЙ КОД: Поиск и получение пути к скачанному файлу
-                        downloaded_file_path = find_new_file(auth_worker.download_dir, initial_files)
-
-                        if downloaded_file_path:
-                            # Теперь используем downloaded_file_path для отправки по почте
-                            logger.info(f"Готов к отправке файл: {downloaded_file_path}")
-                            
-                            email_sender = EmailSender(SMTP_SERVER_OUT, EMAIL_ACCOUNT_OUT, EMAIL_PASSWORD_OUT)
-                            email_subject = "отчет за указанный период"
-                            #email_body = f"Здравствуйте,\n\nВ приложении находится отчет за период с {start_date_str} по {end_date_str}."
-                            email_body = f"Здравствуйте,\n\nВ приложении находится ежедневный отчет за период с {last_monday.strftime('%d.%m.%Y')} по {current_monday.strftime('%d.%m.%Y')}."
-                            
-                            if email_sender.send_email_with_attachment(EMAIL_RECEIVER, email_subject, email_body, downloaded_file_path):
-                                logger.info("✅ Файл успешно отправлен по электронной почте.")
-                            else:
-                                logger.error("❌ Не удалось отправить файл по электронной почте.")
-                        else:
-                            logger.error("❌ Не удалось найти скачанный файл для отправки.")
-                    else:
-                        logger.error("Не удалось завершить взаимодействие с всплывающим окном.")
-                else:
-                    logger.error("Клик на кнопку 'Export' не удался.")
-            except TimeoutException:
-                logger.error("❌ Не удалось найти или нажать на кнопку 'Поиск' по заданному XPath.")
+                ok = handlers[stage]()
             except Exception as e:
-                logger.error(f"❌ Произошла непредвиденная ошибка при клике на 'Поиск': {e}")
+                logger.error(f"❌ Ошибка на этапе после '{stage}': {e}")
+                ok = False
+            if not ok:
+                self._recover(stage)
+                return False
+        return True
+
+    def _recover(self, stage):
+        """
+        Выбирает, с какого этапа продолжить после ошибки.
+        """
+        checkpoint = self.checkpoint
+        if stage in ("started", "downloaded", "normalized", "stored"):
+            # Вход повторяется целиком; письмо — повторной отправкой того же файла
+            checkpoint.rewind(stage, "ошибка этапа")
+            return
+        if not self.auth_worker.is_session_alive():
+            logger.warning("Сессия браузера потеряна. Следующая попытка начнется со входа.")
+            self.auth_worker.cleanup()
+            self.date_selector = None
+            self.exporter = None
+            checkpoint.rewind("started", "сессия браузера потеряна")
+        elif stage == "searched":
+            # Окно экспорта могло остаться открытым: перезагружаем страницу, сессия сохраняется
+            try:
+                self.auth_worker.get_driver().refresh()
+                Waiter(self.auth_worker.get_driver()).settle(page_idle(), 30, "перезагрузка страницы", stage="main_page")
+            except WebDriverException as e:
+                logger.warning(f"Не удалось перезагрузить страницу: {e}")
+            checkpoint.rewind("logged_in", "ошибка экспорта")
+        elif stage == "exported":
+            # Файл не пришел: нажимаем 'Export' еще раз на той же странице
+            checkpoint.rewind("searched", "файл не скачался")
         else:
-            logger.error("❌ Тест провален. Не удалось установить одну или обе даты.")
-    else:
-        logger.error("❌ Не удалось авторизоваться.")
-    
-    auth_worker.cleanup()
\ No newline at end of file
+            checkpoint.rewind(stage, "ошибка этапа")
+
+    def _login(self):
+        if self.use_http:
+            with self.auth_worker.stage("http_export") as span:
+                file_path = export_via_http(self.auth_worker.download_dir, self.start_date_str, self.end_date_str)
+                if file_path:
+                    self.checkpoint.advance("downloaded", file=file_path, method="http")
+                    return True
+                span.fail()
+            logger.warning("HTTP-экспорт не удался. Переходим к экспорту через браузер.")
+            self.use_http = False
+
+        if not self.auth_worker.is_session_alive():
+            if self.auth_worker.get_driver():
+                self.auth_worker.cleanup()
+            if not self.auth_worker.login():
+                logger.error("❌ Не удалось авторизоваться.")
+                return False
+            logger.info("Авторизация прошла успешно. Переходим к экспорту.")
+            Waiter(self.auth_worker.get_driver()).settle(page_idle(), 30, "загрузка главной страницы", stage="main_page")
+            log_browser_stats(self.auth_worker.get_driver(), "после входа")
+        driver = self.auth_worker.get_driver()
+        self.date_selector = DateSelector(driver)
+        self.exporter = Exporter(driver, self.report_type)
+        self.checkpoint.advance("logged_in")
+        return True
+
+    def _set_dates(self):
+        if not set_report_dates(self.auth_worker, self.date_selector, self.start_date_str, self.end_date_str):
+            return False
+        self.checkpoint.advance("dates_set")
+        return True
+
+    def _search(self):
+        if not run_search(self.auth_worker):
+            return False
+        self.checkpoint.advance("searched")
+        return True
+
+    def _export(self):
+        if self.exporter is None:
+            # Продолжение с контрольной точки в живой сессии: этапа входа в этом запуске не было
+            self.exporter = Exporter(self.auth_worker.get_driver(), self.report_type)
+        self.initial_files = trigger_export(self.auth_worker, self.exporter)
+        if self.initial_files is None:
+            return False
+        self.checkpoint.advance("exported")
+        return True
+
+    def _download(self):
+        if self.initial_files is None:
+            # Продолжение с 'exported': снимка папки до нажатия 'Export' нет, и без него
+            # любой старый файл в папке сошел бы за новый. Нажимаем 'Export' заново.
+            logger.warning("Нет списка файлов до начала выгрузки. Повторяем экспорт.")
+            self.checkpoint.rewind("searched", "нет снимка папки загрузок")
+            return True
+        file_path = wait_for_download(self.auth_worker, self.initial_files,
+                                      download_stage(self.start_date_str, self.end_date_str))
+        if not file_path:
+            logger.error("❌ Не удалось найти скачанный файл для отправки.")
+            return False
+        self.checkpoint.advance("downloaded", file=file_path, method="selenium")
+        return True
+
+    def _processor(self):
+        return ReportProcessor(self.file_path, parse_date(self.start_date_str), parse_date(self.end_date_str),
+                               receiver_email=self.receiver_email, key=self.checkpoint.job_id,
+                               stage=self.auth_worker.stage)
+
+    def _normalize(self):
+        processor = self._processor()
+        processor.normalize()
+        self.checkpoint.advance("normalized", **processor.entry)
+        return True
+
+    def _store(self):
+        processor = self._processor()
+        self.checkpoint.advance("stored", stored_rows=processor.store())
+        return True
+
+    def _mail(self):
+        processor = self._processor()
+        if not processor.mail():
+            return False
+        self.checkpoint.advance("mailed", outbox_id=processor.entry.get("outbox_id"))
+        return True
+
+def create_run_metrics(start_date_str, end_date_str, report_type=None):
+    if not METRICS_ENABLED:
+        return None
+    return RunMetrics(start_date_str, end_date_str, report_type or FILE_FORMAT_TEXT,
+                      METRICS_JSONL_PATH, METRICS_TEXTFILE_PATH)
+
+if __name__ == "__main__":
+    auth_worker = AuthWorker()
+
+    last_monday, current_monday = get_last_week_range()
+    start_date_str = last_monday.strftime("%Y-%m-%d 00:00:00")
+    end_date_str = current_monday.strftime("%Y-%m-%d 00:00:00")
+    auth_worker.metrics = create_run_metrics(start_date_str, end_date_str)
+    if OUTBOX_ENABLED:
+        get_outbox_worker()
+
+    state_machine = ExportStateMachine(auth_worker, start_date_str, end_date_str)
+    success = state_machine.run()
+
+    auth_worker.cleanup()
+    if auth_worker.metrics:
+        auth_worker.metrics.finish("ok" if success else "error")
+    drain_outbox()
@@ -0,0 +1,2 @@
+from .server import MockSettings, MockZKBioServer
+from .smtp_sink import SmtpSink
@@ -0,0 +1,176 @@
+// Минимальная имитация клиентской части ZKBio CVAccess: jQuery.serialize,
+// dhtmlxCalendar, ZKUI.Combo, грид с индикатором загрузки и окно экспорта.
+(function () {
+    var config = window.MOCK_CONFIG;
+
+    function pad(n) { return (n < 10 ? "0" : "") + n; }
+    function formatDate(d) {
+        return d.getFullYear() + "-" + pad(d.getMonth() + 1) + "-" + pad(d.getDate()) + " " +
+            pad(d.getHours()) + ":" + pad(d.getMinutes()) + ":" + pad(d.getSeconds());
+    }
+    function parseDate(text) {
+        var m = /^(\d{4})-(\d{2})-(\d{2})(?: (\d{2}):(\d{2}):(\d{2}))?$/.exec(text || "");
+        if (!m) { return new Date(); }
+        return new Date(+m[1], +m[2] - 1, +m[3], +(m[4] || 0), +(m[5] || 0), +(m[6] || 0));
+    }
+
+    // --- jQuery (только то, что использует экспортер) ---
+    function serialize(form) {
+        var parts = [];
+        var fields = form.querySelectorAll("input, select, textarea");
+        for (var i = 0; i < fields.length; i++) {
+            var f = fields[i];
+            if (!f.name || f.disabled) { continue; }
+            if ((f.type === "radio" || f.type === "checkbox") && !f.checked) { continue; }
+            parts.push(encodeURIComponent(f.name) + "=" + encodeURIComponent(f.value).replace(/%20/g, "+"));
+        }
+        return parts.join("&");
+    }
+    var jQuery = function (selector) {
+        var el = typeof selector === "string" ? document.querySelector(selector) : selector;
+        return { serialize: function () { return el ? serialize(el) : ""; } };
+    };
+    jQuery.active = 0;
+    window.jQuery = window.$ = jQuery;
+
+    // --- dhtmlxCalendar ---
+    function Calendar(inputId) {
+        var self = this;
+        var input = document.getElementById(inputId);
+        this.i = {};
+        this.i[inputId] = { input: input };
+        this.input = input;
+        this.current = parseDate(input.value);
+        this.base = document.createElement("div");
+        this.base.className = "dhtmlxcalendar_dhx_web";
+        document.body.appendChild(this.base);
+        input.addEventListener("click", function () { self.show(); });
+    }
+    Calendar.prototype.render = function () {
+        var self = this;
+        var year = this.current.getFullYear(), month = this.current.getMonth();
+        var html = '<div class="dhtmlxcalendar_month_cont">' +
+            '<div class="dhtmlxcalendar_month_arrow_left">&lt;</div>' +
+            '<span class="dhtmlxcalendar_month_label_month">' + config.months[month] + '</span> ' +
+            '<span class="dhtmlxcalendar_month_label_year">' + year + '</span>' +
+            '<div class="dhtmlxcalendar_month_arrow_right">&gt;</div></div><ul class="dhtmlxcalendar_dates_cont">';
+        var days = new Date(year, month + 1, 0).getDate();
+        for (var d = 1; d <= days; d++) {
+            html += '<li class="dhtmlxcalendar_cell dhtmlxcalendar_cell_month"><div class="dhtmlxcalendar_label">' + d + '</div></li>';
+        }
+        this.base.innerHTML = html + "</ul>";
+        this.base.querySelector(".dhtmlxcalendar_month_arrow_left").onclick = function () { self.shift(-1); };
+        this.base.querySelector(".dhtmlxcalendar_month_arrow_right").onclick = function () { self.shift(1); };
+        var labels = this.base.querySelectorAll(".dhtmlxcalendar_label");
+        for (var i = 0; i < labels.length; i++) {
+            labels[i].onclick = function () { self.pick(+this.textContent); };
+        }
+    };
+    Calendar.prototype.show = function () {
+        var rect = this.input.getBoundingClientRect();
+        this.base.style.left = rect.left + "px";
+        this.base.style.top = (rect.bottom + window.scrollY) + "px";
+        this.render();
+        this.base.style.display = "block";
+    };
+    Calendar.prototype.hide = function () { this.base.style.display = "none"; };
+    Calendar.prototype.shift = function (delta) {
+        var self = this;
+        // Перерисовка с задержкой, как у настоящего календаря
+        setTimeout(function () {
+            self.current = new Date(self.current.getFullYear(), self.current.getMonth() + delta, 1,
+                self.current.getHours(), self.current.getMinutes(), self.current.getSeconds());
+            self.render();
+        }, 50);
+    };
+    Calendar.prototype.pick = function (day) {
+        var time = parseDate(this.input.value);
+        this.current = new Date(this.current.getFullYear(), this.current.getMonth(), day,
+            time.getHours(), time.getMinutes(), time.getSeconds());
+        this.input.value = formatDate(this.current);
+        this.hide();
+    };
+    Calendar.prototype.setDate = function (date) {
+        this.current = new Date(date.getTime());
+        if (this.base.style.display === "block") { this.render(); }
+    };
+    Calendar.prototype.getDate = function () { return new Date(this.current.getTime()); };
+    Calendar.prototype.callEvent = function () { return true; };
+    window.dhtmlXCalendarObject = Calendar;
+    window.calendarFrom = new Calendar("startTime" + config.suffix);
+    window.calendarTo = new Calendar("endTime" + config.suffix);
+
+    // --- Грид и поиск ---
+    var progress = document.querySelector(".dhx_cell_progress_bar");
+    document.querySelector(".search_button_new").addEventListener("click", function () {
+        jQuery.active++;
+        progress.style.display = "block";
+        setTimeout(function () {
+            document.getElementById("grid").textContent =
+                document.getElementById("startTime" + config.suffix).value + " — " +
+                document.getElementById("endTime" + config.suffix).value;
+            progress.style.display = "none";
+            jQuery.active--;
+        }, config.gridLatencyMs);
+    });
+
+    // --- ZKUI.Combo ---
+    window.ZKUI = {
+        Combo: {
+            get: function (selector) {
+                return {
+                    combo: {
+                        setComboValue: function (value) {
+                            setTimeout(function () {
+                                var input = document.querySelector("input[name='reportType']");
+                                if (input) { input.value = value; }
+                            }, 100);
+                        }
+                    }
+                };
+            }
+        }
+    };
+
+    // --- Окно экспорта ---
+    function openExportWindow() {
+        var cover = document.createElement("div");
+        cover.className = "dhxwin_fr_cover";
+        var win = document.createElement("div");
+        win.className = "dhxwin_active";
+        win.innerHTML =
+            '<form id="editFormExport" method="post" action="/accTransaction.do?export" target="download_frame">' +
+            '<input type="hidden" name="startTime"><input type="hidden" name="endTime">' +
+            '<input type="radio" id="yes" name="isEncrypt" value="1" checked><label for="yes">' + config.yes + '</label>' +
+            '<input type="radio" id="no" name="isEncrypt" value="0"><label for="no">' + config.no + '</label>' +
+            '<input type="password" id="loginPwd" name="loginPwd">' +
+            '<div class="search-combo-box" comid="reportType_combo"></div>' +
+            '<input type="hidden" name="reportType" value="XLS">' +
+            '<input type="hidden" name="reportType_new_value" value="false">' +
+            '<button type="button" id="editFormOk">' + config.ok + '</button>' +
+            '</form>';
+        document.body.appendChild(cover);
+        document.body.appendChild(win);
+
+        var pwd = win.querySelector("#loginPwd");
+        function inputPassword() {
+            pwd.style.display = win.querySelector("#yes").checked ? "inline-block" : "none";
+        }
+        win.querySelector("#yes").addEventListener("change", inputPassword);
+        win.querySelector("#no").addEventListener("change", inputPassword);
+
+        win.querySelector("#editFormOk").addEventListener("click", function () {
+            var form = win.querySelector("form");
+            form.elements.startTime.value = document.getElementById("startTime" + config.suffix).value;
+            form.elements.endTime.value = document.getElementById("endTime" + config.suffix).value;
+            form.submit();
+            setTimeout(function () {
+                win.parentNode.removeChild(win);
+                cover.parentNode.removeChild(cover);
+            }, 300);
+        });
+    }
+    document.querySelector(".export_button").addEventListener("click", function () {
+        setTimeout(openExportWindow, 200);
+    });
+})();
@@ -0,0 +1,313 @@
+import argparse
+import json
+import logging
+import os
+import random
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger("stat2serg_logger")
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Подписи интерфейса для английской (корень репозитория) и русской (v02) версий
+LABELS = {
+    "en": {
+        "time_from": "Time From", "time_to": "To", "search": "Search", "export": "Export",
+        "ok": "OK", "no": "No", "yes": "Yes",
+        "username_label": "User Name", "password_label": "Password", "login_label": "Login",
+        "months": ["January", "February", "March", "April", "May", "June", "July",
+                   "August", "September", "October", "November", "December"],
+        "columns": ["Time", "Device Name", "Event Point", "Event Description", "Personnel ID",
+                    "First Name", "Last Name", "Card Number", "Department Name", "Reader Name",
+                    "Verification Mode"],
+        "events": ["Normal Verify Open", "Access Denied", "Exit Button Open"],
+        "verify": ["Card", "Fingerprint", "Face"],
+    },
+    "ru": {
+        "time_from": "Время с", "time_to": "До", "search": "Поиск", "export": "Экспорт",
+        "ok": "ОК", "no": "Нет", "yes": "Да",
+        "username_label": "Имя пользователя", "password_label": "Пароль", "login_label": "Вход",
+        "months": ["Январь", "Февраль", "Март", "Апрель", "Май", "Июнь", "Июль",
+                   "Август", "Сентябрь", "Октябрь", "Ноябрь", "Декабрь"],
+        "columns": ["Время", "Имя устройства", "Точка события", "Описание события", "Идентификатор персонала",
+                    "Имя", "Фамилия", "Номер карты", "Название отдела", "Имя считывателя",
+                    "Режим верификации"],
+        "events": ["Нормальное открытие", "Доступ запрещен", "Открытие кнопкой выхода"],
+        "verify": ["Карта", "Отпечаток", "Лицо"],
+    },
+}
+
+class MockSettings:
+    def __init__(self, username="admin", password="admin", rows=1000, latency=0.0,
+                 throughput=0, grid_latency_ms=300, seed=42):
+        """
+        :param rows: Количество строк в выгрузке.
+        :param latency: Задержка формирования файла на «устройстве», секунды.
+        :param throughput: Ограничение скорости отдачи файла, байт/с (0 — без ограничения).
+        :param grid_latency_ms: Время «загрузки» грида после нажатия Search.
+        """
+        self.username = username
+        self.password = password
+        self.rows = rows
+        self.latency = latency
+        self.throughput = throughput
+        self.grid_latency_ms = grid_latency_ms
+        self.seed = seed
+
+def _render(name, values):
+    with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+        text = f.read()
+    for key, value in values.items():
+        text = text.replace("{{" + key + "}}", str(value))
+    return text
+
+def _parse_time(value, default):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return default
+
+def generate_rows(settings, lang, start_dt, end_dt):
+    """
+    Синтетические события прохода, равномерно распределенные по периоду.
+    """
+    labels = LABELS[lang]
+    rnd = random.Random(settings.seed)
+    span = max((end_dt - start_dt).total_seconds(), 1)
+    step = span / max(settings.rows, 1)
+    for index in range(settings.rows):
+        person = rnd.randint(1, 300)
+        device = rnd.randint(1, 8)
+        yield [
+            (start_dt + timedelta(seconds=int(index * step))).strftime("%Y-%m-%d %H:%M:%S"),
+            f"Door-{device}",
+            f"Door-{device}-1",
+            rnd.choice(labels["events"]),
+            str(1000 + person),
+            f"Name{person}",
+            f"Surname{person}",
+            str(1000000 + person),
+            f"Dept-{person % 12}",
+            f"Door-{device}-In",
+            rnd.choice(labels["verify"]),
+        ]
+
+def _csv_line(values):
+    escaped = []
+    for value in values:
+        if any(ch in value for ch in ',"\n'):
+            value = '"' + value.replace('"', '""') + '"'
+        escaped.append(value)
+    return ",".join(escaped) + "\r\n"
+
+def render_export(settings, lang, report_type, start_dt, end_dt):
+    """
+    Генератор фрагментов файла выгрузки (CSV или HTML-таблица с расширением .xls).
+    """
+    columns = LABELS[lang]["columns"]
+    if report_type == "XLS":
+        yield "<html><head><meta charset=\"utf-8\"></head><body><table>\n"
+        yield "<tr>" + "".join(f"<th>{c}</th>" for c in columns) + "</tr>\n"
+        for row in generate_rows(settings, lang, start_dt, end_dt):
+            yield "<tr>" + "".join(f"<td>{v}</td>" for v in row) + "</tr>\n"
+        yield "</table></body></html>\n"
+    else:
+        yield "﻿" + _csv_line(columns)
+        for row in generate_rows(settings, lang, start_dt, end_dt):
+            yield _csv_line(row)
+
+class MockZKBioServer:
+    """
+    Локальная замена устройства ZKBio CVAccess для тестов и бенчмарков.
+    """
+    def __init__(self, settings=None, host="127.0.0.1", port=0):
+        self.settings = settings or MockSettings()
+        self.sessions = {}
+        self.exports = []
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-zkbio", daemon=True)
+        self._thread.start()
+        logger.info(f"Mock ZKBio запущен: {self.base_url}/bioLogin.do")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                logger.debug("mock-zkbio: " + format % args)
+
+            def _cookies(self):
+                cookie = SimpleCookie(self.headers.get("Cookie", ""))
+                return {key: morsel.value for key, morsel in cookie.items()}
+
+            def _session(self):
+                return server.sessions.get(self._cookies().get("JSESSIONID"))
+
+            def _lang(self, query):
+                lang = query.get("lang", [self._cookies().get("lang", "en_US")])[0]
+                return "ru" if lang.lower().startswith("ru") else "en"
+
+            def _send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=None):
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _redirect(self, location, headers=None):
+                headers = dict(headers or {})
+                headers["Location"] = location
+                self._send(302, headers=headers)
+
+            def _login_page(self, lang, error="", headers=None):
+                labels = LABELS[lang]
+                body = _render("login.html", {
+                    "username_label": labels["username_label"], "password_label": labels["password_label"],
+                    "login_label": labels["login_label"], "error": error,
+                })
+                self._send(200, body.encode("utf-8"), headers=headers)
+
+            def _form(self):
+                length = int(self.headers.get("Content-Length", 0))
+                return {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode("utf-8")).items()}
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == "/bioLogin.do":
+                    lang = self._lang(query)
+                    self._login_page(lang, headers={"Set-Cookie": f"lang={'ru_RU' if lang == 'ru' else 'en_US'}; Path=/"})
+                elif url.path == "/main.do":
+                    if not self._session():
+                        return self._redirect("/bioLogin.do")
+                    self._main_page(self._lang(query))
+                elif url.path == "/static/mock.js":
+                    with open(os.path.join(FIXTURES_DIR, "mock.js"), "rb") as f:
+                        self._send(200, f.read(), "application/javascript; charset=utf-8")
+                else:
+                    self._send(404, b"not found", "text/plain")
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                if url.path == "/bioLogin.do":
+                    form = self._form()
+                    lang = self._lang({})
+                    if form.get("username") == server.settings.username and \
+                            form.get("password") == server.settings.password:
+                        session_id = secrets.token_hex(16)
+                        server.sessions[session_id] = {"created": time.time()}
+                        return self._redirect("/main.do", {"Set-Cookie": f"JSESSIONID={session_id}; Path=/; HttpOnly"})
+                    return self._login_page(lang, error="Invalid user name or password")
+                if url.path == "/accTransaction.do":
+                    if not self._session():
+                        return self._redirect("/bioLogin.do")
+                    return self._export(self._form())
+                self._send(404, b"not found", "text/plain")
+
+            def _main_page(self, lang):
+                labels = LABELS[lang]
+                today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+                body = _render("main.html", {
+                    "lang": lang, "suffix": "_" + secrets.token_hex(3),
+                    "time_from": labels["time_from"], "time_to": labels["time_to"],
+                    "search": labels["search"], "export": labels["export"],
+                    "ok": labels["ok"], "no": labels["no"], "yes": labels["yes"],
+                    "months_json": json.dumps(labels["months"], ensure_ascii=False),
+                    "grid_latency_ms": server.settings.grid_latency_ms,
+                    "default_from": today.strftime("%Y-%m-%d %H:%M:%S"),
+                    "default_to": (today + timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S"),
+                })
+                self._send(200, body.encode("utf-8"))
+
+            def _export(self, form):
+                settings = server.settings
+                lang = self._lang({})
+                report_type = (form.get("reportType") or "XLS").upper()
+                end_dt = _parse_time(form.get("endTime"), datetime.now())
+                start_dt = _parse_time(form.get("startTime"), end_dt - timedelta(days=7))
+                with server._lock:
+                    server.exports.append(dict(form))
+                # Время формирования отчета на устройстве
+                time.sleep(settings.latency)
+
+                extension = "xls" if report_type == "XLS" else "csv"
+                content_type = "application/vnd.ms-excel" if report_type == "XLS" else "text/csv; charset=utf-8"
+                file_name = f"Transaction_{datetime.now().strftime('%Y%m%d%H%M%S')}.{extension}"
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Disposition", f'attachment; filename="{file_name}"')
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                buffer = []
+                buffered = 0
+                sent_started = time.time()
+                sent = 0
+                for piece in render_export(settings, lang, report_type, start_dt, end_dt):
+                    data = piece.encode("utf-8")
+                    buffer.append(data)
+                    buffered += len(data)
+                    if buffered >= 64 * 1024:
+                        sent += self._chunk(b"".join(buffer))
+                        buffer, buffered = [], 0
+                        if settings.throughput:
+                            ahead = sent / settings.throughput - (time.time() - sent_started)
+                            if ahead > 0:
+                                time.sleep(ahead)
+                if buffer:
+                    self._chunk(b"".join(buffer))
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                return len(data)
+
+        return Handler
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Локальная имитация ZKBio CVAccess.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8098)
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--rows", type=int, default=1000, help="Строк в выгрузке")
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка формирования файла, с")
+    parser.add_argument("--throughput", type=int, default=0, help="Скорость отдачи, байт/с (0 — без ограничения)")
+    parser.add_argument("--grid-latency-ms", type=int, default=300, help="Время загрузки грида после Search, мс")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(name)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    args = parse_args()
+    settings = MockSettings(args.username, args.password, args.rows, args.latency, args.throughput, args.grid_latency_ms)
+    server = MockZKBioServer(settings, args.host, args.port).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,126 @@
+import logging
+import socketserver
+import threading
+import time
+
+logger = logging.getLogger("stat2serg_logger")
+
+class SmtpSink:
+    """
+    Минимальный SMTP-сервер, который принимает и запоминает письма, никуда их не отправляя.
+    Поддерживает EHLO/HELO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA, RSET, NOOP и QUIT.
+    """
+    def __init__(self, host="127.0.0.1", port=0, data_delay=0.0, reject_recipients=(), max_messages_per_session=0):
+        """
+        :param data_delay: Искусственная задержка ответа на DATA, секунды.
+        :param reject_recipients: Адреса, на которые RCPT отвечает 550.
+        :param max_messages_per_session: Разрывать соединение после N писем (0 — не разрывать),
+            как релеи с лимитом писем на сессию.
+        """
+        self.messages = []
+        self.sessions = 0
+        self.data_delay = data_delay
+        self.reject_recipients = {address.lower() for address in reject_recipients}
+        self.max_messages_per_session = max_messages_per_session
+        self._lock = threading.Lock()
+        self.server = socketserver.ThreadingTCPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        return self.server.server_address[:2]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="smtp-sink", daemon=True)
+        self._thread.start()
+        logger.info(f"SMTP-заглушка запущена на {self.address[0]}:{self.address[1]}")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler_class(self):
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write((line + "\r\n").encode("ascii"))
+
+            def handle(self):
+                with sink._lock:
+                    sink.sessions += 1
+                sender, recipients = None, []
+                delivered = 0
+                self.reply("220 stat2serg-sink ESMTP")
+                while True:
+                    raw = self.rfile.readline()
+                    if not raw:
+                        return
+                    line = raw.decode("utf-8", "replace").rstrip("\r\n")
+                    command = line[:4].upper()
+                    if command == "EHLO":
+                        self.wfile.write(b"250-stat2serg-sink\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n250 SIZE 104857600\r\n")
+                    elif command == "HELO":
+                        self.reply("250 stat2serg-sink")
+                    elif command == "AUTH":
+                        parts = line.split()
+                        if len(parts) >= 2 and parts[1].upper() == "LOGIN":
+                            if len(parts) == 2:
+                                self.reply("334 VXNlcm5hbWU6")
+                                self.rfile.readline()
+                            self.reply("334 UGFzc3dvcmQ6")
+                            self.rfile.readline()
+                        elif len(parts) == 2:
+                            self.reply("334 ")
+                            self.rfile.readline()
+                        self.reply("235 2.7.0 Authentication successful")
+                    elif command == "MAIL":
+                        sender, recipients = line[10:].strip(), []
+                        self.reply("250 OK")
+                    elif command == "RCPT":
+                        recipient = line[8:].strip()
+                        if recipient.strip("<>").lower() in sink.reject_recipients:
+                            self.reply("550 5.1.1 Mailbox unavailable")
+                            continue
+                        recipients.append(recipient)
+                        self.reply("250 OK")
+                    elif command == "DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        self._read_data(sender, recipients)
+                        if sink.data_delay:
+                            time.sleep(sink.data_delay)
+                        self.reply("250 OK queued")
+                        sender, recipients = None, []
+                        delivered += 1
+                        if sink.max_messages_per_session and delivered >= sink.max_messages_per_session:
+                            return
+                    elif command == "RSET":
+                        sender, recipients = None, []
+                        self.reply("250 OK")
+                    elif command == "NOOP":
+                        self.reply("250 OK")
+                    elif command == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("502 Command not implemented")
+
+            def _read_data(self, sender, recipients):
+                chunks = []
+                while True:
+                    raw = self.rfile.readline()
+                    if not raw or raw in (b".\r\n", b".\n"):
+                        break
+                    chunks.append(raw[1:] if raw.startswith(b"..") else raw)
+                data = b"".join(chunks)
+                with sink._lock:
+                    sink.messages.append({
+                        "sender": sender,
+                        "recipients": recipients,
+                        "size": len(data),
+                        "received": time.time(),
+                        "data": data,
+                    })
+        return Handler
@@ -0,0 +1,280 @@
+import argparse
+import codecs
+import csv
+import logging
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from html.parser import HTMLParser
+
+logger = logging.getLogger("stat2serg_logger")
+
+READ_CHUNK = 256 * 1024
+
+# Канонические колонки и их подписи в английском и русском интерфейсе ZKBio
+CANONICAL_COLUMNS = {
+    "event_time": ("time", "event time", "date time", "время", "время события", "дата и время"),
+    "device_name": ("device name", "device", "имя устройства", "устройство"),
+    "event_point": ("event point", "точка события"),
+    "event_description": ("event description", "event name", "описание события", "событие"),
+    "person_id": ("personnel id", "person id", "pin", "идентификатор персонала", "id персонала", "табельный номер"),
+    "first_name": ("first name", "name", "имя"),
+    "last_name": ("last name", "фамилия"),
+    "card_number": ("card number", "номер карты"),
+    "department": ("department name", "department", "название отдела", "отдел"),
+    "reader_name": ("reader name", "имя считывателя", "считыватель"),
+    "verify_mode": ("verification mode", "verify mode", "режим верификации", "способ верификации"),
+    "area": ("area name", "area", "зона", "название зоны"),
+}
+_LABEL_TO_COLUMN = {label: column for column, labels in CANONICAL_COLUMNS.items() for label in labels}
+# Колонки-идентификаторы: Excel хранит их как числа ("1001.0"), ведущие нули не трогаем
+_ID_COLUMNS = ("person_id", "card_number")
+
+_TIME_FORMATS = (
+    "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y/%m/%d %H:%M:%S", "%d.%m.%Y %H:%M:%S",
+    "%d.%m.%Y %H:%M", "%d-%m-%Y %H:%M:%S", "%m/%d/%Y %H:%M:%S", "%Y-%m-%dT%H:%M:%S",
+)
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+
+def canonical_name(label):
+    key = re.sub(r"\s+", " ", str(label or "").replace("﻿", "")).strip().lower()
+    if key in _LABEL_TO_COLUMN:
+        return _LABEL_TO_COLUMN[key]
+    return re.sub(r"[^0-9a-zа-яё]+", "_", key).strip("_") or "column"
+
+def to_iso_time(value):
+    """
+    Время события в ISO 8601 (YYYY-MM-DDTHH:MM:SS). Нераспознанное значение возвращается как есть.
+    """
+    if isinstance(value, datetime):
+        return value.replace(microsecond=0).isoformat()
+    if isinstance(value, (int, float)):
+        # Серийная дата Excel
+        return (_EXCEL_EPOCH + timedelta(days=float(value))).replace(microsecond=0).isoformat()
+    text = str(value or "").strip()
+    # Быстрый путь для основного формата ZKBio 'YYYY-MM-DD HH:MM:SS'
+    if len(text) == 19 and text[4] == "-" and text[10] == " " and text[13] == ":":
+        return text[:10] + "T" + text[11:]
+    for fmt in _TIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).isoformat()
+        except ValueError:
+            continue
+    return text
+
+def to_identifier(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    text = str(value if value is not None else "").strip()
+    return text[:-2] if re.fullmatch(r"\d+\.0", text) else text
+
+# --- Чтение исходных форматов построчно ---
+
+def _detect_kind(path):
+    with open(path, "rb") as f:
+        head = f.read(512)
+    if head.startswith(b"\xd0\xcf\x11\xe0"):
+        return "xls"
+    if head.startswith(b"PK\x03\x04"):
+        return "xlsx"
+    if head.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"<"):
+        # Частый случай: «XLS» из веб-интерфейса — это HTML-таблица
+        return "html"
+    return "csv"
+
+def _detect_encoding(path):
+    with open(path, "rb") as f:
+        sample = f.read(READ_CHUNK)
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp1251"
+
+_DELIMITERS = ",;\t"
+
+def _sniff_dialect(sample):
+    """
+    Диалект определяется по строкам таблицы: строки-заголовки отчета (название, период)
+    сбивают csv.Sniffer, поэтому выборка начинается с первой строки, в которой
+    один из разделителей встречается хотя бы дважды.
+    """
+    lines = sample.splitlines(keepends=True)
+    for index, line in enumerate(lines):
+        if any(line.count(delimiter) >= 2 for delimiter in _DELIMITERS):
+            sample = "".join(lines[index:])
+            break
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=_DELIMITERS)
+    except csv.Error:
+        return csv.excel
+
+def _iter_csv(path):
+    encoding = _detect_encoding(path)
+    with open(path, "r", encoding=encoding, errors="replace", newline="") as f:
+        dialect = _sniff_dialect(f.read(64 * 1024))
+        f.seek(0)
+        for row in csv.reader(f, dialect):
+            yield row
+
+class _TableParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows = []
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tr":
+            self._row = []
+        elif tag in ("td", "th") and self._row is not None:
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th") and self._cell is not None:
+            self._row.append("".join(self._cell).strip())
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+def _iter_html(path):
+    parser = _TableParser()
+    with open(path, "r", encoding=_detect_encoding(path), errors="replace") as f:
+        while True:
+            chunk = f.read(READ_CHUNK)
+            if not chunk:
+                break
+            parser.feed(chunk)
+            # Отдаем готовые строки сразу, чтобы не держать всю таблицу в памяти
+            rows, parser.rows = parser.rows, []
+            yield from rows
+    parser.close()
+    yield from parser.rows
+
+def _iter_xlsx(path):
+    try:
+        import openpyxl
+    except ImportError:
+        raise RuntimeError("Для XLSX нужен пакет openpyxl (pip install openpyxl).")
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        workbook.close()
+
+def _iter_xls(path):
+    try:
+        import xlrd
+    except ImportError:
+        raise RuntimeError("Для двоичного XLS нужен пакет xlrd (pip install xlrd).")
+    # Формат BIFF не читается потоково: xlrd загружает лист целиком
+    workbook = xlrd.open_workbook(path, on_demand=True)
+    try:
+        sheet = workbook.sheet_by_index(0)
+        for index in range(sheet.nrows):
+            row = []
+            for cell in sheet.row(index):
+                if cell.ctype == xlrd.XL_CELL_DATE:
+                    row.append(xlrd.xldate_as_datetime(cell.value, workbook.datemode))
+                else:
+                    row.append(cell.value)
+            yield row
+    finally:
+        workbook.release_resources()
+
+_READERS = {"csv": _iter_csv, "html": _iter_html, "xlsx": _iter_xlsx, "xls": _iter_xls}
+
+# --- Нормализация ---
+
+def _find_header(rows, probe=20):
+    """
+    Пропускает строки-заголовки отчета до строки с именами колонок
+    (первая строка, где распознано хотя бы две известные колонки).
+    """
+    for index, row in enumerate(rows):
+        known = sum(1 for cell in row if str(cell or "").replace("﻿", "").strip().lower() in _LABEL_TO_COLUMN)
+        if known >= 2:
+            return row
+        if index + 1 >= probe:
+            break
+    return None
+
+def normalize_export(source_path, output_path=None):
+    """
+    Приводит выгрузку (CSV, XLS/HTML-таблица, XLSX) к единому CSV: UTF-8, канонические
+    имена колонок, время в ISO 8601. Файл читается построчно, поэтому память не зависит
+    от размера выгрузки. Возвращает (путь к CSV, статистика) или (None, статистика).
+    """
+    kind = _detect_kind(source_path)
+    if output_path is None:
+        output_path = os.path.splitext(source_path)[0] + ".normalized.csv"
+    stats = {"source": os.path.basename(source_path), "format": kind, "rows": 0,
+             "seconds": 0.0, "rows_per_sec": 0.0, "bytes_in": os.path.getsize(source_path)}
+    started = time.time()
+    rows = _READERS[kind](source_path)
+    tmp_path = output_path + ".part"
+    try:
+        header = _find_header(rows)
+        if header is None:
+            logger.error(f"❌ В файле {stats['source']} не найдена строка с названиями колонок.")
+            return None, stats
+        columns = [canonical_name(label) for label in header]
+        # Одинаковые подписи (например, две колонки 'Name') не должны склеиваться
+        seen = {}
+        for index, column in enumerate(columns):
+            if column in seen:
+                seen[column] += 1
+                columns[index] = f"{column}_{seen[column]}"
+            else:
+                seen[column] = 1
+        width = len(columns)
+        time_index = columns.index("event_time") if "event_time" in columns else None
+        id_indexes = [columns.index(column) for column in _ID_COLUMNS if column in columns]
+
+        with open(tmp_path, "w", encoding="utf-8", newline="") as out:
+            writer = csv.writer(out, lineterminator="\n")
+            writer.writerow(columns)
+            for row in rows:
+                if not row or all(cell in (None, "") for cell in row):
+                    continue
+                values = list(row[:width]) + [""] * (width - len(row))
+                if time_index is not None:
+                    values[time_index] = to_iso_time(values[time_index])
+                for index in id_indexes:
+                    values[index] = to_identifier(values[index])
+                writer.writerow(["" if value is None else value for value in values])
+                stats["rows"] += 1
+        os.replace(tmp_path, output_path)
+    except Exception as e:
+        logger.error(f"❌ Не удалось нормализовать {stats['source']}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None, stats
+
+    stats["seconds"] = round(time.time() - started, 3)
+    stats["rows_per_sec"] = round(stats["rows"] / stats["seconds"]) if stats["seconds"] else stats["rows"]
+    logger.info(f"✅ Нормализовано {stats['rows']} строк ({kind}) за {stats['seconds']:.1f} с "
+                f"({stats['rows_per_sec']} строк/с): {os.path.basename(output_path)}")
+    return output_path, stats
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Приведение выгрузки ZKBio (CSV/XLS) к единому CSV.")
+    parser.add_argument("source", help="Файл выгрузки")
+    parser.add_argument("-o", "--output", help="Куда записать CSV (по умолчанию <имя>.normalized.csv)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(name)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    args = parse_args()
+    output_path, _ = normalize_export(args.source, args.output)
+    if not output_path:
+        raise SystemExit(1)
@@ -0,0 +1,298 @@
+import argparse
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from config import (
+    OUTBOX_PATH, OUTBOX_MAX_ATTEMPTS, OUTBOX_BACKOFF_BASE, OUTBOX_BACKOFF_MAX, OUTBOX_LEASE_SECONDS,
+    OUTBOX_POLL_INTERVAL
+)
+
+logger = logging.getLogger("stat2serg_logger")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    file TEXT NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    recipients TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    lease_until REAL,
+    error TEXT,
+    recipient_status TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt);
+"""
+
+class Outbox:
+    """
+    Очередь писем в SQLite: готовая выгрузка ставится в нее сразу, а отправка идет
+    в фоне с повторами. Статусы: pending → sending → sent, после OUTBOX_MAX_ATTEMPTS
+    неудач — dead. Ключ идемпотентности не дает отправить одну выгрузку дважды.
+    """
+    def __init__(self, path=OUTBOX_PATH, max_attempts=OUTBOX_MAX_ATTEMPTS, backoff_base=OUTBOX_BACKOFF_BASE,
+                 backoff_max=OUTBOX_BACKOFF_MAX, lease_seconds=OUTBOX_LEASE_SECONDS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Соединение используется из потока доставки и из потока выгрузки
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(_SCHEMA)
+
+    def enqueue(self, key, file_path, start, end, recipients):
+        """
+        Ставит письмо в очередь. Повтор с тем же ключом не создает второе письмо:
+        уже отправленное не отправляется снова, а из dead письмо возвращается в очередь.
+        Возвращает (id, статус).
+        """
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO outbox (key, file, start, end, recipients, next_attempt, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET file = excluded.file, recipients = excluded.recipients, "
+                "status = 'pending', attempts = CASE outbox.status WHEN 'dead' THEN 0 ELSE outbox.attempts END, next_attempt = excluded.next_attempt, error = NULL, "
+                "updated = excluded.updated WHERE outbox.status IN ('pending', 'dead')",
+                (key, file_path, start, end, json.dumps(recipients), now, now, now)
+            )
+            row = self.conn.execute("SELECT id, status FROM outbox WHERE key = ?", (key,)).fetchone()
+        if row["status"] == "sent":
+            logger.info(f"Письмо {key} уже отправлено ранее, повторно не ставим.")
+        else:
+            logger.info(f"Письмо {key} поставлено в очередь отправки (#{row['id']}).")
+        return row["id"], row["status"]
+
+    def claim(self):
+        """
+        Забирает одно письмо, срок отправки которого наступил, и помечает его как sending
+        с арендой: если процесс упадет посреди отправки, письмо вернется в очередь.
+        """
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                "SELECT * FROM outbox WHERE (status = 'pending' AND next_attempt <= ?) "
+                "OR (status = 'sending' AND lease_until < ?) ORDER BY next_attempt LIMIT 1",
+                (now, now)
+            ).fetchone()
+            if row is None:
+                return None
+            claimed = self.conn.execute(
+                "UPDATE outbox SET status = 'sending', lease_until = ?, updated = ? "
+                "WHERE id = ? AND status = ? AND updated = ?",
+                (now + self.lease_seconds, now, row["id"], row["status"], row["updated"])
+            ).rowcount
+        if not claimed:
+            # Письмо забрал другой процесс
+            return None
+        item = dict(row)
+        item["recipients"] = json.loads(item["recipients"])
+        return item
+
+    def mark_sent(self, item_id, recipient_status):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE outbox SET status = 'sent', attempts = attempts + 1, lease_until = NULL, error = NULL, "
+                "recipient_status = ?, updated = ? WHERE id = ?",
+                (json.dumps(recipient_status, ensure_ascii=False), time.time(), item_id)
+            )
+
+    def mark_failed(self, item_id, error, recipient_status=None):
+        """
+        Неудачная попытка: следующая через экспоненциально растущую паузу (со случайным
+        разбросом), после max_attempts попыток — dead.
+        Возвращает новый статус.
+        """
+        now = time.time()
+        with self._lock, self.conn:
+            attempts = self.conn.execute("SELECT attempts FROM outbox WHERE id = ?", (item_id,)).fetchone()[0] + 1
+            status = "dead" if attempts >= self.max_attempts else "pending"
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+            self.conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?, lease_until = NULL, error = ?, "
+                "recipient_status = ?, updated = ? WHERE id = ?",
+                (status, attempts, now + delay, error,
+                 json.dumps(recipient_status, ensure_ascii=False) if recipient_status else None, now, item_id)
+            )
+        if status == "dead":
+            logger.error(f"❌ Письмо #{item_id} не отправлено после {attempts} попыток: {error}")
+        else:
+            logger.warning(f"Письмо #{item_id} не отправлено (попытка {attempts}): {error}. "
+                           f"Повтор через {delay:.0f} с.")
+        return status
+
+    def requeue(self, item_id):
+        with self._lock, self.conn:
+            return self.conn.execute(
+                "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt = ?, error = NULL, updated = ? "
+                "WHERE id = ? AND status = 'dead'",
+                (time.time(), time.time(), item_id)
+            ).rowcount > 0
+
+    def items(self, status=None, limit=50):
+        sql = "SELECT * FROM outbox"
+        params = []
+        if status:
+            sql += " WHERE status = ?"
+            params.append(status)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def counts(self):
+        with self._lock:
+            return dict(self.conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+    def next_due(self):
+        """
+        Через сколько секунд наступит срок ближайшего письма (None — очередь пуста).
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT MIN(CASE status WHEN 'pending' THEN next_attempt ELSE lease_until END) "
+                "FROM outbox WHERE status IN ('pending', 'sending')"
+            ).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+class OutboxWorker:
+    """
+    Фоновый поток, который отправляет письма из очереди.
+    deliver(item) должен вернуть статусы получателей {адрес: {"status": ...}}.
+    """
+    def __init__(self, outbox, deliver, poll_interval=OUTBOX_POLL_INTERVAL):
+        self.outbox = outbox
+        self.deliver = deliver
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._idle = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="outbox-delivery", daemon=True)
+            self._thread.start()
+        return self
+
+    def wake(self):
+        self._idle.clear()
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                item = self.outbox.claim()
+            except sqlite3.Error as e:
+                logger.warning(f"Очередь писем недоступна: {e}")
+                item = None
+            if item is None:
+                self._idle.set()
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self._idle.clear()
+            try:
+                self._process(item)
+            except sqlite3.Error as e:
+                # Письмо останется в sending и вернется в очередь по истечении аренды
+                logger.warning(f"Не удалось обновить очередь писем: {e}")
+
+    def _process(self, item):
+        if not os.path.exists(item["file"]):
+            self.outbox.mark_failed(item["id"], f"файл {item['file']} не найден")
+            return
+        try:
+            statuses = self.deliver(item)
+        except Exception as e:
+            self.outbox.mark_failed(item["id"], str(e))
+            return
+        if any(status["status"] == "sent" for status in statuses.values()):
+            # Отклоненные сервером адреса (5xx) повтором не исправить — они видны в recipient_status
+            self.outbox.mark_sent(item["id"], statuses)
+            logger.info(f"✅ Письмо #{item['id']} из очереди отправлено.")
+        else:
+            errors = {status.get("reply") for status in statuses.values()}
+            self.outbox.mark_failed(item["id"], "; ".join(str(error) for error in errors), statuses)
+
+    def drain(self, timeout):
+        """
+        Ждет, пока в очереди не останется писем, срок которых уже наступил или наступит
+        в пределах timeout. Возвращает True, если очередь пуста.
+        """
+        deadline = time.time() + timeout
+        self.wake()
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            if not self._idle.wait(min(1.0, remaining)):
+                # Поток еще отправляет письмо
+                continue
+            due = self.outbox.next_due()
+            if due is None:
+                return True
+            if due > remaining:
+                break
+            time.sleep(due)
+            self.wake()
+        pending = self.outbox.counts()
+        logger.warning(f"Не все письма отправлены, остаются в очереди: {pending}")
+        return False
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=30)
+            self._thread = None
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Очередь писем с отчетами.")
+    parser.add_argument("--db", default=OUTBOX_PATH, help="Путь к базе очереди")
+    commands = parser.add_subparsers(dest="command", required=True)
+    listing = commands.add_parser("list", help="Показать письма")
+    listing.add_argument("--status", choices=("pending", "sending", "sent", "dead"))
+    listing.add_argument("--limit", type=int, default=50)
+    requeue = commands.add_parser("requeue", help="Вернуть письмо из dead в очередь")
+    requeue.add_argument("ids", nargs="+", type=int)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(name)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    args = parse_args()
+    outbox = Outbox(args.db)
+    try:
+        if args.command == "list":
+            for item in outbox.items(args.status, args.limit):
+                print(f"#{item['id']} {item['status']:<8} попыток {item['attempts']} {item['key']} "
+                      f"{os.path.basename(item['file'])} {item['error'] or ''}")
+            print(f"Итого: {outbox.counts()}")
+        else:
+            for item_id in args.ids:
+                if outbox.requeue(item_id):
+                    logger.info(f"Письмо #{item_id} возвращено в очередь.")
+                else:
+                    logger.warning(f"Письмо #{item_id} не в статусе dead.")
+    finally:
+        outbox.close()
@@ -0,0 +1,295 @@
+import argparse
+import logging
+import os
+import queue
+import threading
+import time
+from main import ReportProcessor, drain_outbox
+from batch import BatchRunner, write_manifest
+from date_ranges import parse_range_spec, DATETIME_FORMAT
+from config import (
+    LOGGER_NAME, HTTP_EXPORT_ENABLED, FILE_FORMAT_TEXT, EMAIL_RECEIVER, PIPELINE_QUEUE_SIZE, PIPELINE_PROCESS_WORKERS,
+    PIPELINE_MAIL_WORKERS, PIPELINE_REPORT_INTERVAL, PIPELINE_TEXTFILE_PATH
+)
+
+logger = logging.getLogger(LOGGER_NAME)
+
+# Маркер конца потока заданий: каждый поток стадии передает его дальше один раз
+_DONE = object()
+
+class PipelineJob:
+    def __init__(self, start_dt, end_dt, report_type=None):
+        self.start_dt = start_dt
+        self.end_dt = end_dt
+        self.report_type = report_type or FILE_FORMAT_TEXT
+        self.file_path = None
+        self.entry = {
+            "start": start_dt.strftime(DATETIME_FORMAT),
+            "end": end_dt.strftime(DATETIME_FORMAT),
+            "report_type": self.report_type,
+            "status": "failed",
+            "file": None,
+            "method": None,
+            "error": None,
+            "stages": {},
+        }
+
+class PipelineStage:
+    """
+    Стадия конвейера: N потоков берут задания из входной очереди, обрабатывают
+    и кладут в выходную. Очереди ограничены, поэтому быстрая стадия ждет медленную,
+    а не копит файлы. Учитывается время простоя (нет входных заданий) и время
+    затора (выходная очередь полна).
+    """
+    def __init__(self, name, handler, inbox, outbox=None, workers=1):
+        """
+        :param handler: callable(job) -> True, если задание передается дальше.
+        """
+        self.name = name
+        self.handler = handler
+        self.inbox = inbox
+        self.outbox = outbox
+        self.workers = workers
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.idle_seconds = 0.0
+        self.stall_seconds = 0.0
+        self.max_depth = 0
+        # Сколько потоков у следующей стадии: каждому нужен свой маркер конца
+        self.downstream_workers = 0
+        self._lock = threading.Lock()
+        self._threads = []
+        self._finished = 0
+
+    def start(self):
+        self._threads = [
+            threading.Thread(target=self._loop, name=f"pipeline-{self.name}-{index}", daemon=True)
+            for index in range(1, self.workers + 1)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _add(self, **values):
+        with self._lock:
+            for field, value in values.items():
+                setattr(self, field, getattr(self, field) + value)
+
+    def _put(self, item):
+        if self.outbox is None:
+            return
+        started = time.time()
+        self.outbox.put(item)
+        self._add(stall_seconds=time.time() - started)
+
+    def _loop(self):
+        while True:
+            started = time.time()
+            job = self.inbox.get()
+            with self._lock:
+                self.idle_seconds += time.time() - started
+                self.max_depth = max(self.max_depth, self.inbox.qsize() + 1)
+            if job is _DONE:
+                with self._lock:
+                    self._finished += 1
+                    last = self._finished == self.workers
+                # Следующая стадия завершается, когда закончили все потоки этой
+                if last and self.outbox is not None:
+                    for _ in range(self.downstream_workers):
+                        self._put(_DONE)
+                return
+
+            started = time.time()
+            try:
+                ok = self.handler(job)
+            except Exception as e:
+                logger.error(f"❌ Стадия {self.name}: ошибка на периоде {job.entry['start']}: {e}")
+                job.entry["error"] = str(e)
+                ok = False
+            duration = time.time() - started
+            job.entry["stages"][self.name] = round(duration, 2)
+            self._add(processed=1, failed=0 if ok else 1, busy_seconds=duration)
+            if ok:
+                self._put(job)
+
+    def stats(self):
+        depth = self.inbox.qsize()
+        with self._lock:
+            return {
+                "queue_depth": depth,
+                "max_queue_depth": self.max_depth,
+                "processed": self.processed,
+                "failed": self.failed,
+                "busy_seconds": round(self.busy_seconds, 2),
+                "idle_seconds": round(self.idle_seconds, 2),
+                "stall_seconds": round(self.stall_seconds, 2),
+            }
+
+class ExportPipeline:
+    """
+    Конвейер для многих отчетов: браузер/HTTP выгружает следующий период, пока
+    предыдущий нормализуется и загружается в базу, а еще более ранний уходит по почте.
+    Общее время стремится ко времени самой медленной стадии, а не к сумме стадий.
+    """
+    def __init__(self, jobs, send=True, receiver_email=EMAIL_RECEIVER, use_http=HTTP_EXPORT_ENABLED,
+                 queue_size=PIPELINE_QUEUE_SIZE, process_workers=PIPELINE_PROCESS_WORKERS,
+                 mail_workers=PIPELINE_MAIL_WORKERS, runner=None):
+        """
+        :param jobs: Список (start_dt, end_dt, report_type).
+        :param queue_size: Сколько готовых заданий может ждать перед каждой стадией.
+        """
+        self.jobs = [PipelineJob(*job) for job in jobs]
+        self.send = send
+        self.receiver_email = receiver_email
+        self.runner = runner or BatchRunner([], send=False, use_http=use_http)
+        self.download_dir = self.runner.download_dir
+        # Вход стадии выгрузки не ограничен: туда сразу кладется весь список периодов
+        self.export_queue = queue.Queue()
+        self.process_queue = queue.Queue(maxsize=queue_size)
+        self.mail_queue = queue.Queue(maxsize=queue_size)
+        # Выгрузка одна: у процесса одна авторизованная сессия браузера/HTTP
+        self.stages = [
+            PipelineStage("export", self._export, self.export_queue, self.process_queue, workers=1),
+            PipelineStage("process", self._process, self.process_queue, self.mail_queue if send else None,
+                          workers=process_workers),
+        ]
+        if send:
+            self.stages.append(PipelineStage("mail", self._mail, self.mail_queue, workers=mail_workers))
+        for stage, next_stage in zip(self.stages, self.stages[1:] + [None]):
+            stage.downstream_workers = next_stage.workers if next_stage else 0
+        self._stop_reporter = threading.Event()
+
+    def _export(self, job):
+        file_path, detail = self.runner.export_range(job.start_dt, job.end_dt, job.report_type)
+        if not file_path:
+            job.entry["error"] = detail
+            return False
+        job.file_path = file_path
+        job.entry.update(status="exported", file=file_path, method=detail)
+        return True
+
+    def _processor(self, job):
+        return ReportProcessor(job.file_path, job.start_dt, job.end_dt, job.entry, receiver_email=self.receiver_email)
+
+    def _process(self, job):
+        processor = self._processor(job)
+        processor.normalize()
+        processor.store()
+        job.file_path = processor.file_path
+        if not self.send:
+            job.entry["status"] = "ok"
+        return True
+
+    def _mail(self, job):
+        if not self._processor(job).mail():
+            return False
+        job.entry["status"] = "ok"
+        return True
+
+    def stats(self):
+        return {stage.name: stage.stats() for stage in self.stages}
+
+    def _report_loop(self, interval):
+        while not self._stop_reporter.wait(interval):
+            stats = self.stats()
+            logger.info("Конвейер: " + "; ".join(
+                f"{name}: очередь {values['queue_depth']}, готово {values['processed']}, "
+                f"затор {values['stall_seconds']:.0f} с" for name, values in stats.items()
+            ))
+            write_pipeline_textfile(stats, PIPELINE_TEXTFILE_PATH)
+
+    def run(self, report_interval=PIPELINE_REPORT_INTERVAL):
+        """
+        Прогоняет все периоды через конвейер. Возвращает записи манифеста.
+        """
+        started = time.time()
+        logger.info(f"Запуск конвейера: периодов {len(self.jobs)}, стадии: "
+                    f"{', '.join(f'{stage.name}×{stage.workers}' for stage in self.stages)}")
+        for job in self.jobs:
+            self.export_queue.put(job)
+        self.export_queue.put(_DONE)
+
+        reporter = threading.Thread(target=self._report_loop, args=(report_interval,),
+                                    name="pipeline-report", daemon=True)
+        reporter.start()
+        try:
+            for stage in self.stages:
+                stage.start()
+            for stage in self.stages:
+                stage.join()
+        finally:
+            self._stop_reporter.set()
+            self.runner.close()
+
+        stats = self.stats()
+        wall = time.time() - started
+        busiest = max(stats.items(), key=lambda item: item[1]["busy_seconds"])
+        logger.info(f"✅ Конвейер завершен за {wall:.1f} с; сумма стадий "
+                    f"{sum(values['busy_seconds'] for values in stats.values()):.1f} с, "
+                    f"самая загруженная — {busiest[0]} ({busiest[1]['busy_seconds']:.1f} с).")
+        for name, values in stats.items():
+            logger.info(f"  {name}: {values}")
+        write_pipeline_textfile(stats, PIPELINE_TEXTFILE_PATH)
+
+        manifest = [job.entry for job in self.jobs]
+        write_manifest(manifest, self.download_dir, prefix="pipeline_manifest")
+        return manifest
+
+def write_pipeline_textfile(stats, path):
+    """
+    Глубина очередей и время простоя/затора стадий в формате textfile для node-exporter.
+    """
+    if not path:
+        return
+    lines = []
+    metrics = (
+        ("queue_depth", "gauge", "Заданий в очереди перед стадией"),
+        ("processed", "counter", "Обработано заданий"),
+        ("failed", "counter", "Заданий с ошибкой"),
+        ("busy_seconds", "counter", "Время работы стадии"),
+        ("idle_seconds", "counter", "Время ожидания входных заданий"),
+        ("stall_seconds", "counter", "Время ожидания места в очереди следующей стадии"),
+    )
+    for field, kind, help_text in metrics:
+        name = f"stat2serg_pipeline_{field}"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for stage, values in stats.items():
+            lines.append(f'{name}{{stage="{stage}"}} {values[field]}')
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Не удалось обновить файл метрик конвейера {path}: {e}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Конвейерная выгрузка: выгрузка, обработка и отправка параллельно.")
+    parser.add_argument("ranges", nargs="+", help="Периоды, как в batch.py: '2025-07-01..2025-10-01 by week'")
+    parser.add_argument("--report-type", action="append", dest="report_types",
+                        help="Формат отчета (можно указать несколько раз)")
+    parser.add_argument("--no-send", action="store_true", help="Не отправлять отчеты по почте")
+    parser.add_argument("--no-http", action="store_true", help="Не использовать HTTP-экспорт, только браузер")
+    parser.add_argument("--queue-size", type=int, default=PIPELINE_QUEUE_SIZE, help="Размер очереди перед стадией")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    jobs = [
+        (start_dt, end_dt, report_type)
+        for spec in args.ranges
+        for start_dt, end_dt in parse_range_spec(spec)
+        for report_type in args.report_types or [None]
+    ]
+    pipeline = ExportPipeline(jobs, send=not args.no_send, use_http=HTTP_EXPORT_ENABLED and not args.no_http,
+                              queue_size=args.queue_size)
+    manifest = pipeline.run()
+    drain_outbox()
+    if any(entry["status"] != "ok" for entry in manifest):
+        raise SystemExit(1)
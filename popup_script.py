@@ -0,0 +1,117 @@
+# Весь сценарий модального окна экспорта за один вызов execute_async_script.
+# Аргументы: префикс ID кнопки OK, список подписей кнопки OK, список подписей опции 'No',
+# пароль пользователя, формат отчета, таймаут в мс. Последний аргумент — callback Selenium.
+# Возвращает {ok, steps, reportType, form, timings, error}.
+EXPORT_POPUP_SCRIPT = """
+var okPrefix = arguments[0], okLabels = arguments[1], noLabels = [].concat(arguments[2]),
+    password = arguments[3], reportType = arguments[4], timeoutMs = arguments[5],
+    done = arguments[arguments.length - 1];
+var started = Date.now(), mark = started;
+var result = { ok: false, steps: [], reportType: null, form: null, timings: {}, error: null };
+
+function step(name) {
+    var now = Date.now();
+    result.steps.push(name);
+    result.timings[name] = now - mark;
+    mark = now;
+}
+function finish(error) {
+    result.error = error || null;
+    result.ok = !error;
+    result.timings.total = Date.now() - started;
+    done(result);
+}
+function visible(el) { return !!el && el.offsetParent !== null; }
+function waitFor(check, timeout, onReady, onTimeout) {
+    var deadline = Date.now() + timeout;
+    (function poll() {
+        var value;
+        try { value = check(); } catch (e) { value = null; }
+        if (value) { return onReady(value); }
+        if (Date.now() > deadline) { return onTimeout(); }
+        setTimeout(poll, 50);
+    })();
+}
+function findOkButton() {
+    var buttons = document.querySelectorAll("button[id^='" + okPrefix + "']");
+    for (var i = 0; i < buttons.length; i++) {
+        if (okLabels.indexOf(buttons[i].textContent.trim()) !== -1 && visible(buttons[i])) { return buttons[i]; }
+    }
+    return null;
+}
+function hidden(name) { return document.querySelector("input[name='" + name + "']"); }
+function fire(el, type) { el.dispatchEvent(new Event(type, { bubbles: true })); }
+
+waitFor(findOkButton, timeoutMs, function (okButton) {
+    step('ok_button');
+
+    var cover = document.querySelector('.dhxwin_fr_cover');
+    if (cover) { cover.style.display = 'none'; step('overlay_hidden'); }
+
+    var noRadio = document.getElementById('no');
+    if (noRadio) {
+        noRadio.checked = true;
+        fire(noRadio, 'change');
+        step('no_radio');
+    } else {
+        var labels = document.querySelectorAll('label'), clicked = false;
+        for (var i = 0; i < labels.length && !clicked; i++) {
+            for (var j = 0; j < noLabels.length; j++) {
+                if (labels[i].textContent.indexOf(noLabels[j]) !== -1) { labels[i].click(); step('no_label'); clicked = true; break; }
+            }
+        }
+    }
+
+    var pwd = document.getElementById('loginPwd');
+    if (visible(pwd) && !pwd.disabled) {
+        pwd.value = password;
+        fire(pwd, 'input');
+        fire(pwd, 'change');
+        fire(pwd, 'blur');
+        step('password');
+    }
+
+    var combo = document.querySelector("div.search-combo-box[comid*='reportType']");
+    try {
+        ZKUI.Combo.get('#' + combo.getAttribute('comid')).combo.setComboValue(reportType);
+        step('combo_api');
+    } catch (e) {
+        result.steps.push('combo_api_failed');
+    }
+
+    waitFor(function () {
+        var input = hidden('reportType');
+        return input && input.value.toLowerCase() === reportType.toLowerCase();
+    }, 2000, afterCombo, function () {
+        var input = hidden('reportType');
+        if (!input) { return finish('reportType input not found'); }
+        input.value = reportType;
+        fire(input, 'change');
+        step('hidden_inputs');
+        afterCombo();
+    });
+
+    function afterCombo() {
+        var flag = hidden('reportType_new_value');
+        if (flag) { flag.value = 'true'; }
+        result.reportType = hidden('reportType').value;
+
+        var form = document.querySelector("div.dhxwin_active form[id*='editForm']") || document.querySelector('form');
+        if (form && window.jQuery) { result.form = window.jQuery(form).serialize(); }
+        step('form_serialized');
+
+        okButton.removeAttribute('disabled');
+        okButton.click();
+        step('ok_clicked');
+
+        waitFor(function () { return !document.body.contains(okButton) || !visible(okButton); }, timeoutMs, function () {
+            step('modal_closed');
+            finish(null);
+        }, function () {
+            finish('modal did not close');
+        });
+    }
+}, function () {
+    finish('OK button not found');
+});
+"""
@@ -0,0 +1,178 @@
+import fcntl
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger("stat2serg_logger")
+
+# Границы корзин гистограммы длительности этапов (секунды)
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+class Span:
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.duration = None
+        self.outcome = "ok"
+        self.error = None
+
+    def fail(self, error=None):
+        self.outcome = "error"
+        self.error = error
+
+class _NullSpan:
+    def fail(self, error=None):
+        pass
+
+NULL_SPAN = _NullSpan()
+
+class RunMetrics:
+    """
+    Тайминги этапов одного запуска экспорта. Каждый этап пишется строкой JSON
+    в jsonl_path, а итоги запуска — в textfile для node-exporter (гистограммы
+    по этапам накапливаются между запусками, чтобы можно было считать p50/p95).
+    """
+    def __init__(self, date_from, date_to, report_type, jsonl_path, textfile_path, run_id=None):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.date_from = date_from
+        self.date_to = date_to
+        self.report_type = report_type
+        self.jsonl_path = jsonl_path
+        self.textfile_path = textfile_path
+        self.started = time.time()
+        self.spans = []
+
+    @contextmanager
+    def span(self, name):
+        span = Span(name)
+        try:
+            yield span
+        except Exception as e:
+            span.fail(str(e))
+            raise
+        finally:
+            span.duration = time.time() - span.started
+            self.spans.append(span)
+            self._write_line({
+                "type": "span",
+                "stage": name,
+                "duration_sec": round(span.duration, 3),
+                "outcome": span.outcome,
+                "error": span.error,
+            })
+
+    def finish(self, outcome):
+        """
+        Записывает итог запуска и обновляет textfile для Prometheus.
+        """
+        duration = time.time() - self.started
+        self._write_line({"type": "run", "duration_sec": round(duration, 3), "outcome": outcome})
+        try:
+            self._update_textfile(outcome, duration)
+        except OSError as e:
+            logger.warning(f"Не удалось обновить файл метрик {self.textfile_path}: {e}")
+        logger.info(f"Запуск {self.run_id} завершен ({outcome}) за {duration:.1f} с. "
+                    f"Этапы: {', '.join(f'{s.name}={s.duration:.1f}с' for s in self.spans)}")
+
+    def _write_line(self, payload):
+        record = {
+            "ts": round(time.time(), 3),
+            "run_id": self.run_id,
+            "date_from": self.date_from,
+            "date_to": self.date_to,
+            "report_type": self.report_type,
+        }
+        record.update(payload)
+        try:
+            os.makedirs(os.path.dirname(self.jsonl_path), exist_ok=True)
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"Не удалось записать метрики в {self.jsonl_path}: {e}")
+
+    def _update_textfile(self, outcome, duration):
+        os.makedirs(os.path.dirname(self.textfile_path), exist_ok=True)
+        state_path = self.textfile_path + ".state.json"
+        # Блокировка: несколько процессов (пул, демон, cron) пишут одни и те же счетчики
+        with open(state_path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(state_path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except (FileNotFoundError, ValueError):
+                state = {"histograms": {}, "runs": {}, "last": {}}
+
+            for span in self.spans:
+                key = f"{span.name}|{self.report_type}|{span.outcome}"
+                histogram = state["histograms"].setdefault(
+                    key, {"buckets": [0] * len(DURATION_BUCKETS), "count": 0, "sum": 0.0}
+                )
+                for index, bound in enumerate(DURATION_BUCKETS):
+                    if span.duration <= bound:
+                        histogram["buckets"][index] += 1
+                histogram["count"] += 1
+                histogram["sum"] += span.duration
+                state["last"][f"{span.name}|{self.report_type}"] = span.duration
+            run_key = f"{self.report_type}|{outcome}"
+            state["runs"][run_key] = state["runs"].get(run_key, 0) + 1
+            state["last_run"] = {
+                "timestamp": time.time(), "duration": duration,
+                "success": 1 if outcome == "ok" else 0, "report_type": self.report_type,
+            }
+
+            tmp_path = state_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, state_path)
+
+            tmp_path = self.textfile_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(render_textfile(state))
+            # node-exporter не должен видеть недописанный файл
+            os.replace(tmp_path, self.textfile_path)
+
+def render_textfile(state):
+    lines = [
+        "# HELP stat2serg_stage_duration_seconds Длительность этапов экспорта.",
+        "# TYPE stat2serg_stage_duration_seconds histogram",
+    ]
+    for key, histogram in sorted(state["histograms"].items()):
+        stage, report_type, outcome = key.split("|")
+        labels = f'stage="{stage}",report_type="{report_type}",outcome="{outcome}"'
+        for bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+            lines.append(f'stat2serg_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'stat2serg_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram["count"]}')
+        lines.append(f"stat2serg_stage_duration_seconds_sum{{{labels}}} {histogram['sum']:.3f}")
+        lines.append(f"stat2serg_stage_duration_seconds_count{{{labels}}} {histogram['count']}")
+
+    lines += [
+        "# HELP stat2serg_stage_last_duration_seconds Длительность этапа в последнем запуске.",
+        "# TYPE stat2serg_stage_last_duration_seconds gauge",
+    ]
+    for key, value in sorted(state["last"].items()):
+        stage, report_type = key.split("|")
+        lines.append(f'stat2serg_stage_last_duration_seconds{{stage="{stage}",report_type="{report_type}"}} {value:.3f}')
+
+    lines += [
+        "# HELP stat2serg_runs_total Количество запусков экспорта по результату.",
+        "# TYPE stat2serg_runs_total counter",
+    ]
+    for key, value in sorted(state["runs"].items()):
+        report_type, outcome = key.split("|")
+        lines.append(f'stat2serg_runs_total{{report_type="{report_type}",outcome="{outcome}"}} {value}')
+
+    last_run = state.get("last_run")
+    if last_run:
+        labels = f'report_type="{last_run["report_type"]}"'
+        lines += [
+            "# TYPE stat2serg_last_run_timestamp_seconds gauge",
+            f"stat2serg_last_run_timestamp_seconds{{{labels}}} {last_run['timestamp']:.0f}",
+            "# TYPE stat2serg_last_run_duration_seconds gauge",
+            f"stat2serg_last_run_duration_seconds{{{labels}}} {last_run['duration']:.3f}",
+            "# TYPE stat2serg_last_run_success gauge",
+            f"stat2serg_last_run_success{{{labels}}} {last_run['success']}",
+        ]
+    return "\n".join(lines) + "\n"
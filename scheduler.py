@@ -0,0 +1,292 @@
+import argparse
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+from main import AuthWorker, deliver_report, queue_report, drain_outbox
+from batch import BatchRunner
+from email_sender import parse_recipients
+from date_ranges import relative_range, parse_range_spec, DATETIME_FORMAT
+from cron import CronExpression
+from config import (
+    LOGGER_NAME, HTTP_EXPORT_ENABLED, LOGIN_URL, EMAIL_RECEIVER, OUTBOX_ENABLED, SCHEDULE_JOBS,
+    SCHEDULER_JITTER, SCHEDULER_MAX_CONCURRENT_PER_APPLIANCE, SCHEDULER_KEEPALIVE_INTERVAL,
+    SCHEDULER_WORKER_ROOT, SCHEDULER_WARM_BROWSER
+)
+
+logger = logging.getLogger(LOGGER_NAME)
+
+class ScheduledJob:
+    def __init__(self, name, cron, period, report_type=None, recipients=EMAIL_RECEIVER, appliance=None,
+                 jitter=SCHEDULER_JITTER):
+        """
+        :param period: Относительный период (previous_week, month_to_date, ...) или явный, как в batch.py.
+        :param appliance: Ключ устройства для ограничения параллельности (по умолчанию — хост LOGIN_URL).
+        :param jitter: Случайная задержка запуска, до стольких секунд.
+        """
+        self.name = name
+        self.cron = CronExpression(cron)
+        self.period = period
+        self.report_type = report_type
+        self.recipients = recipients
+        self.appliance = appliance or urlparse(LOGIN_URL).netloc
+        self.jitter = jitter
+        self.next_run = None
+        self.running = False
+
+    def schedule(self, after):
+        self.next_run = self.cron.next_after(after) + timedelta(seconds=random.uniform(0, self.jitter))
+        return self.next_run
+
+    def resolve_range(self, now):
+        """
+        Период вычисляется в момент запуска, а не при старте планировщика.
+        """
+        if ".." in self.period:
+            ranges = parse_range_spec(self.period)
+            return ranges[0][0], ranges[-1][1]
+        return relative_range(self.period, now)
+
+class Firing:
+    """
+    Один запуск: период и формат плюс получатели всех заданий, слившихся с ним.
+    """
+    def __init__(self, job, start_dt, end_dt):
+        self.job = job
+        self.start_dt = start_dt
+        self.end_dt = end_dt
+        self.key = (job.appliance, start_dt, end_dt, (job.report_type or "").upper())
+        self.names = [job.name]
+        self.recipients = parse_recipients(job.recipients or [])
+        self.mailing = False
+
+class Scheduler:
+    """
+    Выполняет задания по расписанию в одном долгоживущем процессе. Сессия
+    (HTTP и/или браузер) остается теплой между запусками; на каждое устройство —
+    не больше SCHEDULER_MAX_CONCURRENT_PER_APPLIANCE выгрузок одновременно.
+    Задание, чей прошлый запуск еще идет, пропускается; задания с одинаковым
+    периодом и форматом объединяются в одну выгрузку.
+    """
+    def __init__(self, jobs, use_http=HTTP_EXPORT_ENABLED, max_concurrent=SCHEDULER_MAX_CONCURRENT_PER_APPLIANCE,
+                 warm_browser=SCHEDULER_WARM_BROWSER, worker_root=SCHEDULER_WORKER_ROOT):
+        self.jobs = [job if isinstance(job, ScheduledJob) else ScheduledJob(**job) for job in jobs]
+        self.use_http = use_http
+        self.max_concurrent = max_concurrent
+        self.warm_browser = warm_browser
+        self.worker_root = worker_root
+        self.slots = {}
+        self.runners = []
+        self._runner_count = 0
+        self.in_flight = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stop = threading.Event()
+
+    def _slots(self, appliance):
+        """
+        Очередь свободных исполнителей устройства; исполнители создаются при первой нужде.
+        """
+        with self._lock:
+            if appliance not in self.slots:
+                slots = queue.Queue()
+                for _ in range(self.max_concurrent):
+                    slots.put(None)
+                self.slots[appliance] = slots
+            return self.slots[appliance]
+
+    def _create_runner(self):
+        with self._lock:
+            index = self._runner_count
+            self._runner_count += 1
+        if index == 0:
+            # Первый исполнитель использует обычный профиль и папку загрузок
+            runner = BatchRunner([], send=False, use_http=self.use_http)
+        else:
+            # Второму браузеру нужен свой профиль: Chrome блокирует профиль, открытый другим процессом
+            worker_dir = os.path.join(self.worker_root, f"worker_{index}")
+            auth_worker = AuthWorker(
+                download_dir=os.path.join(worker_dir, "downloads"),
+                profile_dir=os.path.join(worker_dir, "profile"),
+                session_cache_path=os.path.join(worker_dir, "session_cookies.json"),
+            )
+            runner = BatchRunner([], send=False, use_http=self.use_http, auth_worker=auth_worker)
+        with self._lock:
+            self.runners.append(runner)
+        return runner
+
+    def _fire(self, job, now):
+        try:
+            start_dt, end_dt = job.resolve_range(now)
+        except ValueError as e:
+            logger.warning(f"Задание {job.name}: {e} Пропускаем запуск.")
+            return
+        firing = Firing(job, start_dt, end_dt)
+        with self._lock:
+            if job.running:
+                logger.warning(f"Задание {job.name}: прошлый запуск еще выполняется, этот пропущен.")
+                return
+            existing = self.in_flight.get(firing.key)
+            if existing and not existing.mailing:
+                existing.names.append(job.name)
+                existing.recipients.extend(parse_recipients(job.recipients or []))
+                job.running = True
+                logger.info(f"Задание {job.name} объединено с '{existing.names[0]}': "
+                            f"период {start_dt:%Y-%m-%d %H:%M} — {end_dt:%Y-%m-%d %H:%M} уже выгружается.")
+                return
+            self.in_flight[firing.key] = firing
+            job.running = True
+        thread = threading.Thread(target=self._execute, args=(firing,), name=f"scheduled-{job.name}", daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def _execute(self, firing):
+        slots = self._slots(firing.job.appliance)
+        waited = time.time()
+        runner = slots.get()
+        try:
+            waited = time.time() - waited
+            if waited > 1:
+                logger.info(f"Задание {firing.job.name} ждало свободную сессию устройства {waited:.0f} с.")
+            runner = runner or self._create_runner()
+            runner.refresh_sessions()
+            logger.info(f"Запуск {', '.join(firing.names)}: {firing.start_dt:%Y-%m-%d %H:%M} — "
+                        f"{firing.end_dt:%Y-%m-%d %H:%M}")
+            entry = runner.run_one(firing.start_dt, firing.end_dt, firing.job.report_type)
+        except Exception as e:
+            logger.error(f"❌ Задание {firing.job.name}: ошибка выгрузки: {e}")
+            entry = {"status": "failed", "error": str(e)}
+        finally:
+            slots.put(runner)
+
+        with self._lock:
+            # С этого момента новые задания с тем же периодом уже не присоединятся
+            firing.mailing = True
+            recipients = list(dict.fromkeys(firing.recipients))
+        try:
+            if entry["status"] != "ok":
+                logger.error(f"❌ Задание {', '.join(firing.names)} не выполнено: {entry.get('error')}")
+            elif recipients and OUTBOX_ENABLED:
+                key = f"{'+'.join(firing.names)}|{firing.start_dt.strftime(DATETIME_FORMAT)}"
+                queue_report(entry["file"], firing.start_dt, firing.end_dt, recipients, key=key)
+            elif recipients:
+                deliver_report(entry["file"], firing.start_dt, firing.end_dt, recipients)
+        finally:
+            with self._lock:
+                self.in_flight.pop(firing.key, None)
+                for job in self.jobs:
+                    if job.name in firing.names:
+                        job.running = False
+
+    def _keep_warm(self):
+        """
+        Пока нет запусков, проверяет сессии свободных исполнителей.
+        """
+        for slots in list(self.slots.values()):
+            idle = []
+            while True:
+                try:
+                    idle.append(slots.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                for runner in idle:
+                    if runner:
+                        runner.refresh_sessions()
+            except Exception as e:
+                logger.warning(f"Не удалось проверить сессию: {e}")
+            finally:
+                for slot in idle:
+                    slots.put(slot)
+
+    def run(self):
+        now = datetime.now()
+        for job in self.jobs:
+            job.schedule(now)
+            logger.info(f"Задание {job.name} ({job.cron.expression}, {job.period}): следующий запуск {job.next_run:%Y-%m-%d %H:%M:%S}")
+
+        logger.info("Прогрев сессии...")
+        for appliance in {job.appliance for job in self.jobs}:
+            slots = self._slots(appliance)
+            runner = slots.get() or self._create_runner()
+            try:
+                runner.warm_up(browser=self.warm_browser)
+            finally:
+                slots.put(runner)
+
+        try:
+            while not self._stop.is_set():
+                now = datetime.now()
+                due = [job for job in self.jobs if job.next_run <= now]
+                for job in due:
+                    self._fire(job, now)
+                    # Пропущенные моменты (процесс спал или был занят) сливаются в один запуск
+                    job.schedule(now)
+                self._threads = [thread for thread in self._threads if thread.is_alive()]
+                next_run = min(job.next_run for job in self.jobs)
+                wait = (next_run - datetime.now()).total_seconds()
+                if wait > SCHEDULER_KEEPALIVE_INTERVAL:
+                    self._stop.wait(SCHEDULER_KEEPALIVE_INTERVAL)
+                    if not self._stop.is_set():
+                        self._keep_warm()
+                else:
+                    self._stop.wait(max(0.0, wait))
+        except KeyboardInterrupt:
+            logger.info("Остановка планировщика...")
+        finally:
+            self.close()
+
+    def run_once(self, name):
+        """
+        Выполняет задание немедленно (вне расписания) и дожидается результата.
+        """
+        job = next((job for job in self.jobs if job.name == name), None)
+        if job is None:
+            raise ValueError(f"Задание '{name}' не найдено.")
+        try:
+            self._fire(job, datetime.now())
+        finally:
+            self.close()
+
+    def close(self):
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        for runner in self.runners:
+            runner.close()
+        drain_outbox()
+
+    def stop(self):
+        self._stop.set()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Планировщик регулярных выгрузок в одном процессе.")
+    parser.add_argument("--list", action="store_true", help="Показать задания и ближайшие запуски")
+    parser.add_argument("--run-now", metavar="NAME", help="Один раз выполнить задание и выйти")
+    parser.add_argument("--no-http", action="store_true", help="Не использовать HTTP-экспорт, только браузер")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    scheduler = Scheduler(SCHEDULE_JOBS, use_http=HTTP_EXPORT_ENABLED and not args.no_http)
+    if args.list:
+        now = datetime.now()
+        for job in scheduler.jobs:
+            upcoming = job.cron.next_after(now)
+            try:
+                start_dt, end_dt = job.resolve_range(upcoming)
+                period = f"{start_dt:%Y-%m-%d %H:%M} — {end_dt:%Y-%m-%d %H:%M}"
+            except ValueError as e:
+                period = str(e)
+            print(f"{job.name:<15} {job.cron.expression:<15} следующий запуск {upcoming:%Y-%m-%d %H:%M} → {period}")
+    elif args.run_now:
+        try:
+            scheduler.run_once(args.run_now)
+        except ValueError as e:
+            raise SystemExit(str(e))
+    else:
+        scheduler.run()
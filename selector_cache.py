@@ -0,0 +1,135 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlparse
+from selenium.common.exceptions import TimeoutException
+from waits import first_match
+from config import SELECTOR_CACHE_ENABLED, SELECTOR_CACHE_PATH, UI_LOCALE, LOGIN_URL
+
+logger = logging.getLogger("stat2serg_logger")
+
+class SelectorCache:
+    """
+    Какой локатор или способ сработал на шаге в прошлый раз — отдельно для каждого
+    устройства и языка интерфейса. Победитель пробуется первым, а при неудаче
+    запись удаляется. Без path кэш живет только в памяти процесса.
+    """
+    def __init__(self, path, server, locale):
+        self.path = path
+        self.key = f"{server}|{locale}"
+        self._lock = threading.Lock()
+        self.entries = self._load().get(self.key, {})
+
+    def _load(self):
+        if not self.path:
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать кэш селекторов {self.path}: {e}")
+            return {}
+
+    def preferred(self, step):
+        entry = self.entries.get(step)
+        return entry["strategy"] if entry else None
+
+    def due_for_retry(self, step, every):
+        """
+        Раз в every успешных применений сохраненного способа стоит заново попробовать
+        вытесненный им вариант.
+        """
+        entry = self.entries.get(step)
+        return bool(entry) and every > 0 and entry["hits"] % every == 0
+
+    def order(self, step, candidates):
+        """
+        Переставляет кандидатов [(имя, ...), ...] так, чтобы сохраненный победитель шел первым.
+        """
+        winner = self.preferred(step)
+        return sorted(candidates, key=lambda candidate: candidate[0] != winner)
+
+    def remember(self, step, strategy):
+        with self._lock:
+            entry = self.entries.get(step)
+            if entry and entry["strategy"] == strategy:
+                # Счетчик сохраняется в файл: по нему due_for_retry решает, когда проверить
+                # вытесненный вариант, а за один запуск применений всего несколько
+                entry["hits"] += 1
+            else:
+                if entry:
+                    logger.info(f"Кэш селекторов: шаг '{step}' теперь '{strategy}' вместо '{entry['strategy']}'.")
+                self.entries[step] = {"strategy": strategy, "hits": 1, "updated": round(time.time())}
+        self._save(step, applied=True)
+
+    def forget(self, step):
+        with self._lock:
+            entry = self.entries.pop(step, None)
+        if entry:
+            logger.info(f"Кэш селекторов: запись '{entry['strategy']}' для шага '{step}' больше не работает, удалена.")
+            self._save(step)
+
+    def find(self, waiter, step, locators, timeout, clickable=False, stage=None):
+        """
+        Ждет первый совпавший локатор из [(имя, (By, значение)), ...] одним ожиданием:
+        запасные варианты проверяются на каждом опросе, а не после таймаута основного.
+        Возвращает (имя сработавшего локатора, элемент).
+        Выбрасывает TimeoutException, если не сработал ни один.
+        """
+        try:
+            name, element = waiter.until(first_match(self.order(step, locators), clickable), timeout, stage=stage)
+        except TimeoutException:
+            self.forget(step)
+            raise
+        self.remember(step, name)
+        return name, element
+
+    def _save(self, step, applied=False):
+        """
+        :param applied: Сохраняется применение способа: если в файле тот же способ, счетчик
+                        считается от значения в файле, чтобы параллельные процессы не затирали
+                        применения друг друга.
+        """
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + ".lock", "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                data = self._load()
+                section = data.setdefault(self.key, {})
+                with self._lock:
+                    entry = self.entries.get(step)
+                    stored = section.get(step)
+                    if entry and applied and stored and stored.get("strategy") == entry["strategy"]:
+                        entry["hits"] = max(entry["hits"], stored.get("hits", 0) + 1)
+                        entry["updated"] = min(entry["updated"], stored.get("updated", entry["updated"]))
+                    if entry:
+                        section[step] = entry
+                    else:
+                        section.pop(step, None)
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, indent=1)
+                os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить кэш селекторов {self.path}: {e}")
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_selector_cache():
+    """
+    Общий кэш процесса для устройства из LOGIN_URL и языка UI_LOCALE.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SelectorCache(SELECTOR_CACHE_PATH if SELECTOR_CACHE_ENABLED else None,
+                                   urlparse(LOGIN_URL).netloc, UI_LOCALE)
+        return _cache
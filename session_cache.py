@@ -0,0 +1,86 @@
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger("stat2serg_logger")
+
+class SessionCookieCache:
+    """
+    Хранит cookie авторизованной сессии (JSESSIONID и др.) в локальном файле,
+    чтобы повторные запуски не проходили форму входа заново.
+    Cookie хранятся в формате Selenium: {'name', 'value', 'domain', 'path', 'secure', ...}.
+    """
+    def __init__(self, cache_path, ttl):
+        self.cache_path = cache_path
+        self.ttl = ttl
+
+    def load(self):
+        """
+        Возвращает список cookie или None, если кэша нет или он устарел.
+        """
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать кэш сессии {self.cache_path}: {e}")
+            return None
+
+        if time.time() >= data.get("expires_at", 0):
+            logger.info("Кэш сессии устарел.")
+            self.clear()
+            return None
+        return data.get("cookies") or None
+
+    def save(self, cookies):
+        cookies = [cookie for cookie in cookies if cookie.get("name")]
+        if not cookies:
+            return
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        # Файл содержит действующую сессию, поэтому доступ только владельцу
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"expires_at": time.time() + self.ttl, "cookies": cookies}, f)
+        os.replace(tmp_path, self.cache_path)
+        logger.info(f"Cookie сессии сохранены в кэш ({len(cookies)} шт.).")
+
+    def clear(self):
+        try:
+            os.remove(self.cache_path)
+        except FileNotFoundError:
+            pass
+
+    # --- Перенос cookie между Selenium и requests ---
+
+    @staticmethod
+    def inject_into_driver(driver, cookies):
+        # add_cookie работает только для домена текущей страницы, поэтому
+        # домен не передаем: Chrome подставит домен открытой страницы входа
+        for cookie in cookies:
+            driver.add_cookie({
+                "name": cookie["name"],
+                "value": cookie["value"],
+                "path": cookie.get("path", "/"),
+                "secure": cookie.get("secure", False),
+            })
+
+    @staticmethod
+    def inject_into_session(session, cookies, default_domain):
+        for cookie in cookies:
+            session.cookies.set(
+                cookie["name"], cookie["value"],
+                domain=(cookie.get("domain") or default_domain).lstrip("."),
+                path=cookie.get("path", "/"),
+            )
+
+    @staticmethod
+    def from_session(session):
+        return [
+            {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path, "secure": c.secure}
+            for c in session.cookies
+        ]
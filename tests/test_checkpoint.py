@@ -0,0 +1,127 @@
+import os
+import pytest
+from checkpoint import JobCheckpoint, make_job_id
+
+def test_job_id_is_stable():
+    assert make_job_id("2025-03-01 00:00:00", "2025-03-08 00:00:00", "CSV") == "20250301_20250308_csv"
+
+def test_resume_from_saved_stage(tmp_path):
+    report = tmp_path / "report.csv"
+    report.write_text("Time\n")
+    checkpoint = JobCheckpoint("job", str(tmp_path))
+    checkpoint.advance("downloaded", file=str(report), method="http")
+
+    resumed = JobCheckpoint("job", str(tmp_path))
+    resumed.restore(browser_alive=False)
+    assert resumed.stage == "downloaded"
+    assert resumed.file == str(report)
+    assert resumed.reached("exported") and not resumed.reached("normalized")
+    assert [entry["stage"] for entry in resumed.data["history"]] == ["downloaded"]
+
+def test_browser_stage_without_session_restarts(tmp_path):
+    JobCheckpoint("job", str(tmp_path)).advance("searched")
+    resumed = JobCheckpoint("job", str(tmp_path))
+    resumed.restore(browser_alive=False)
+    assert resumed.stage == "started"
+
+    JobCheckpoint("job", str(tmp_path)).advance("searched")
+    alive = JobCheckpoint("job", str(tmp_path))
+    alive.restore(browser_alive=True)
+    assert alive.stage == "searched"
+
+def test_missing_file_restarts_export(tmp_path):
+    JobCheckpoint("job", str(tmp_path)).advance("stored", file=str(tmp_path / "gone.csv"))
+    resumed = JobCheckpoint("job", str(tmp_path))
+    resumed.restore(browser_alive=True)
+    assert (resumed.stage, resumed.file) == ("started", None)
+
+def test_rewind_only_goes_back(tmp_path):
+    checkpoint = JobCheckpoint("job", str(tmp_path))
+    checkpoint.advance("dates_set")
+    checkpoint.rewind("exported", error="late")
+    assert checkpoint.stage == "dates_set"
+    checkpoint.rewind("started", error="session lost")
+    assert (checkpoint.stage, checkpoint.data["error"]) == ("started", "session lost")
+
+def test_attempts_are_persisted_statistics(tmp_path):
+    checkpoint = JobCheckpoint("job", str(tmp_path))
+    assert checkpoint.start_attempt() == 1
+    assert JobCheckpoint("job", str(tmp_path)).start_attempt() == 2
+
+def test_retry_limit_applies_per_run(tmp_path, monkeypatch):
+    """
+    Неудачные прошлые запуски не должны съедать попытки нового: раньше после одного
+    неудачного запуска следующие получали единственную попытку.
+    """
+    pytest.importorskip("selenium")
+    pytest.importorskip("requests")
+    import main
+
+    class FailingMachine(main.ExportStateMachine):
+        runs = 0
+
+        def _run_stages(self):
+            FailingMachine.runs += 1
+            return False
+
+    class DeadBrowser:
+        def is_session_alive(self):
+            return False
+
+    monkeypatch.setattr(main, "EXPORT_RETRY_DELAY", 0)
+    for run in range(3):
+        FailingMachine.runs = 0
+        machine = FailingMachine(DeadBrowser(), "2025-03-01 00:00:00", "2025-03-08 00:00:00",
+                                 max_attempts=3, checkpoint_dir=str(tmp_path))
+        assert not machine.run()
+        assert FailingMachine.runs == 3
+    assert JobCheckpoint(machine.checkpoint.job_id, str(tmp_path)).data["attempts"] == 9
+
+def test_resume_at_exported_repeats_export(tmp_path, monkeypatch):
+    """
+    После перезапуска на этапе 'exported' снимка папки нет: старый файл в папке
+    загрузок не должен сойти за новую выгрузку.
+    """
+    pytest.importorskip("selenium")
+    pytest.importorskip("requests")
+    from contextlib import contextmanager
+    import main
+    from download_watcher import completed_new_files
+    from run_metrics import NULL_SPAN
+
+    download_dir = tmp_path / "downloads"
+    download_dir.mkdir()
+    (download_dir / "report_20250201_20250208.csv").write_text("Time\nold\n")
+
+    class LiveBrowser:
+        def __init__(self):
+            self.download_dir = str(download_dir)
+
+        def is_session_alive(self):
+            return True
+
+        @contextmanager
+        def stage(self, name):
+            yield NULL_SPAN
+
+    class ClickingMachine(main.ExportStateMachine):
+        clicks = 0
+
+        def _export(self):
+            ClickingMachine.clicks += 1
+            self.initial_files = os.listdir(download_dir)
+            (download_dir / "Transaction.csv").write_text("Time\nnew\n")
+            self.checkpoint.advance("exported")
+            return True
+
+    monkeypatch.setattr(main, "NORMALIZE_EXPORTS", False)
+    monkeypatch.setattr(main, "EVENT_STORE_ENABLED", False)
+    monkeypatch.setattr(main, "wait_for_download", lambda auth_worker, initial_files, stage: str(
+        download_dir / completed_new_files(str(download_dir), initial_files)[0]))
+    checkpoint_dir = str(tmp_path / "checkpoints")
+    machine = ClickingMachine(LiveBrowser(), "2025-03-01 00:00:00", "2025-03-08 00:00:00", send=False,
+                              checkpoint_dir=checkpoint_dir)
+    machine.checkpoint.advance("exported")
+    assert machine.run()
+    assert ClickingMachine.clicks == 1
+    assert machine.file_path == str(download_dir / "Transaction.csv")
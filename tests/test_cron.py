@@ -0,0 +1,48 @@
+from datetime import datetime
+import pytest
+from cron import CronExpression
+
+def test_every_fifteen_minutes():
+    cron = CronExpression("*/15 * * * *")
+    assert cron.next_after(datetime(2025, 3, 10, 8, 7, 30)) == datetime(2025, 3, 10, 8, 15)
+    assert cron.next_after(datetime(2025, 3, 10, 8, 45)) == datetime(2025, 3, 10, 9, 0)
+
+def test_next_after_is_strictly_later():
+    cron = CronExpression("30 6 * * *")
+    assert cron.next_after(datetime(2025, 3, 10, 6, 30)) == datetime(2025, 3, 11, 6, 30)
+
+def test_weekday_names_and_ranges():
+    cron = CronExpression("0 7 * * mon-fri")
+    # 2025-03-08 — суббота
+    assert cron.next_after(datetime(2025, 3, 8, 12, 0)) == datetime(2025, 3, 10, 7, 0)
+
+def test_sunday_as_seven():
+    assert CronExpression("0 0 * * 7").weekdays == {0}
+    assert CronExpression("0 0 * * sun").next_after(datetime(2025, 3, 10)) == datetime(2025, 3, 16)
+
+def test_aliases():
+    assert CronExpression("@monthly").next_after(datetime(2025, 1, 31, 23, 59)) == datetime(2025, 2, 1)
+    assert CronExpression("@weekly").next_after(datetime(2025, 3, 10)) == datetime(2025, 3, 17)
+
+def test_day_of_month_or_weekday():
+    # Как в cron: заданы оба поля — подходит любое
+    cron = CronExpression("0 0 13 * fri")
+    assert cron.next_after(datetime(2025, 6, 1)) == datetime(2025, 6, 6)
+    assert cron.next_after(datetime(2025, 6, 7)) == datetime(2025, 6, 13)
+
+def test_month_skip_across_year():
+    cron = CronExpression("0 9 1 jan *")
+    assert cron.next_after(datetime(2025, 2, 1)) == datetime(2026, 1, 1, 9, 0)
+
+def test_february_29_only_in_leap_years():
+    cron = CronExpression("0 0 29 2 *")
+    assert cron.next_after(datetime(2025, 1, 1)) == datetime(2028, 2, 29)
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "0 24 * * *", "0 0 0 * *", "0 0 * 13 *", "*/0 * * * *"])
+def test_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronExpression(expression)
+
+def test_never_matching_schedule():
+    with pytest.raises(ValueError):
+        CronExpression("0 0 31 2 *").next_after(datetime(2025, 1, 1))
@@ -0,0 +1,55 @@
+import csv
+from csv_merge import merge_csv_files
+
+HEADER = ["Time", "Device Name", "Personnel ID"]
+
+def write_csv(path, rows):
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f, lineterminator="\r\n")
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+    return str(path)
+
+def read_csv(path):
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return list(csv.reader(f))
+
+def event(day, hour, person="1001"):
+    return [f"2025-01-{day:02d} {hour:02d}:00:00", "Door 1", person]
+
+def test_boundary_duplicates_dropped_ascending(tmp_path):
+    first = write_csv(tmp_path / "a.csv", [event(1, 9), event(1, 18), event(2, 0)])
+    # Событие ровно на границе периодов есть в обоих файлах
+    second = write_csv(tmp_path / "b.csv", [event(2, 0), event(2, 9), event(2, 18)])
+    output = str(tmp_path / "merged.csv")
+    written, duplicates = merge_csv_files([first, second], output, edge_rows=2)
+    assert (written, duplicates) == (5, 1)
+    rows = read_csv(output)
+    assert rows[0] == HEADER
+    assert rows[1:] == [event(1, 9), event(1, 18), event(2, 0), event(2, 9), event(2, 18)]
+
+def test_boundary_duplicates_dropped_descending(tmp_path):
+    # Выгрузка по убыванию времени: общая строка в начале первого и в конце второго файла
+    first = write_csv(tmp_path / "a.csv", [event(3, 0), event(2, 18), event(2, 9)])
+    second = write_csv(tmp_path / "b.csv", [event(2, 9), event(1, 18), event(1, 9), event(3, 0)])
+    output = str(tmp_path / "merged.csv")
+    written, duplicates = merge_csv_files([first, second], output, edge_rows=2)
+    assert duplicates == 2
+    assert written == 5
+    assert len(read_csv(output)) == 6
+
+def test_same_rows_in_the_middle_are_kept(tmp_path):
+    # Дубли ищутся только на краях: одинаковые события внутри файла не трогаются
+    first = write_csv(tmp_path / "a.csv", [event(1, 1), event(1, 2), event(1, 2), event(1, 2), event(1, 3)])
+    second = write_csv(tmp_path / "b.csv", [event(2, 1), event(1, 2), event(2, 2), event(2, 3), event(2, 4)])
+    output = str(tmp_path / "merged.csv")
+    written, duplicates = merge_csv_files([first, second], output, edge_rows=1)
+    assert (written, duplicates) == (10, 0)
+
+def test_empty_file_is_skipped(tmp_path):
+    first = write_csv(tmp_path / "a.csv", [event(1, 9)])
+    empty = tmp_path / "empty.csv"
+    empty.write_text("")
+    output = str(tmp_path / "merged.csv")
+    assert merge_csv_files([first, str(empty)], output) == (1, 0)
+    assert not (tmp_path / "merged.csv.part").exists()
@@ -0,0 +1,46 @@
+from datetime import datetime
+import pytest
+from date_ranges import relative_range, parse_range_spec, split_span
+
+# 2025-03-12 — среда
+NOW = datetime(2025, 3, 12, 14, 35, 10)
+
+@pytest.mark.parametrize("name, expected", [
+    ("previous_day", (datetime(2025, 3, 11), datetime(2025, 3, 12))),
+    ("previous_week", (datetime(2025, 3, 3), datetime(2025, 3, 10))),
+    ("previous_month", (datetime(2025, 2, 1), datetime(2025, 3, 1))),
+    ("week_to_date", (datetime(2025, 3, 10), datetime(2025, 3, 12, 14, 0))),
+    ("month_to_date", (datetime(2025, 3, 1), datetime(2025, 3, 12, 14, 0))),
+    ("last_7d", (datetime(2025, 3, 5), datetime(2025, 3, 12))),
+])
+def test_relative_range(name, expected):
+    assert relative_range(name, NOW) == expected
+
+def test_previous_month_in_january():
+    assert relative_range("previous_month", datetime(2025, 1, 15, 9)) == (datetime(2024, 12, 1), datetime(2025, 1, 1))
+
+def test_previous_week_on_monday():
+    assert relative_range("previous_week", datetime(2025, 3, 10, 0, 5)) == (datetime(2025, 3, 3), datetime(2025, 3, 10))
+
+def test_empty_to_date_range():
+    with pytest.raises(ValueError):
+        relative_range("month_to_date", datetime(2025, 3, 1, 0, 30))
+
+@pytest.mark.parametrize("name", ["yesterday", "last_0d", "last_d"])
+def test_unknown_relative_range(name):
+    with pytest.raises(ValueError):
+        relative_range(name, NOW)
+
+def test_parse_range_spec_by_week():
+    ranges = parse_range_spec("2025-01-01..2025-01-20 by week")
+    assert ranges == [
+        (datetime(2025, 1, 1), datetime(2025, 1, 8)),
+        (datetime(2025, 1, 8), datetime(2025, 1, 15)),
+        (datetime(2025, 1, 15), datetime(2025, 1, 20)),
+    ]
+
+def test_split_span_by_month_starts_on_first_day():
+    assert split_span(datetime(2025, 1, 15), datetime(2025, 3, 1), "month") == [
+        (datetime(2025, 1, 15), datetime(2025, 2, 1)),
+        (datetime(2025, 2, 1), datetime(2025, 3, 1)),
+    ]
@@ -0,0 +1,128 @@
+import base64
+import email
+import io
+import smtplib
+import socket
+import zipfile
+from email.header import decode_header, make_header
+import pytest
+from email_sender import EmailSender, base64_lines, parse_recipients
+from mock_zkbio import SmtpSink
+
+@pytest.fixture(autouse=True)
+def no_starttls(monkeypatch):
+    # Заглушка SMTP работает без TLS
+    monkeypatch.setattr(smtplib.SMTP, "starttls", lambda self, *args, **kwargs: (220, b"TLS not used"))
+
+@pytest.fixture
+def make_sink():
+    sinks = []
+
+    def start(**kwargs):
+        sink = SmtpSink(**kwargs).start()
+        sinks.append(sink)
+        return sink
+    yield start
+    for sink in sinks:
+        sink.stop()
+
+def make_sender(sink, **kwargs):
+    host, port = sink.address
+    return EmailSender(host, "stat2serg@localhost", "secret", port=port, **kwargs)
+
+@pytest.fixture
+def report(tmp_path):
+    path = tmp_path / "report_20250301_20250308.csv"
+    path.write_text("Time,Device Name\n" + "2025-03-01 09:00:00,Door 1\n" * 500, encoding="utf-8")
+    return str(path)
+
+def test_parse_recipients():
+    assert parse_recipients("a@x, b@y; c@z ,") == ["a@x", "b@y", "c@z"]
+    assert parse_recipients(["a@x", " ", "b@y "]) == ["a@x", "b@y"]
+
+def test_base64_lines_match_whole_encoding():
+    data = bytes(range(256)) * 3
+    encoded = b"".join(base64_lines([data[:100], data[100:101], data[101:]]))
+    lines = encoded.split(b"\r\n")[:-1]
+    assert all(len(line) <= 76 for line in lines)
+    assert b"".join(lines) == base64.b64encode(data)
+
+def test_messages_reuse_one_connection(make_sink, report):
+    sink = make_sink()
+    with make_sender(sink) as sender:
+        for _ in range(3):
+            statuses = sender.send_message("reports@localhost", "Отчет", "Текст", report)
+            assert statuses["reports@localhost"]["status"] == "sent"
+    assert (sink.sessions, sender.connects, len(sink.messages)) == (1, 1, 3)
+
+def test_reconnects_when_server_drops_session(make_sink, report):
+    # Релей закрывает соединение после каждого письма: следующее уходит через новое
+    sink = make_sink(max_messages_per_session=1)
+    with make_sender(sink) as sender:
+        for _ in range(3):
+            assert sender.send_email_with_attachment("reports@localhost", "Отчет", "Текст", report)
+    assert len(sink.messages) == 3
+    assert sender.connects == sink.sessions == 3
+
+def test_idle_connection_checked_with_noop(make_sink, report):
+    sink = make_sink(max_messages_per_session=1)
+    with make_sender(sink, idle_check=0) as sender:
+        assert sender.send_email_with_attachment("reports@localhost", "Отчет", "Текст", report)
+        assert sender.send_email_with_attachment("reports@localhost", "Отчет", "Текст", report)
+    assert len(sink.messages) == 2 and sender.connects == 2
+
+def test_per_recipient_status(make_sink, report):
+    sink = make_sink(reject_recipients=["gone@localhost"])
+    with make_sender(sink) as sender:
+        statuses = sender.send_message("reports@localhost, gone@localhost", "Отчет", "Текст", report)
+    assert statuses["reports@localhost"]["status"] == "sent"
+    assert (statuses["gone@localhost"]["status"], statuses["gone@localhost"]["code"]) == ("refused", 550)
+    assert sink.messages[0]["recipients"] == ["<reports@localhost>"]
+
+def test_all_recipients_refused_sends_nothing(make_sink, report):
+    sink = make_sink(reject_recipients=["gone@localhost"])
+    with make_sender(sink) as sender:
+        assert not sender.send_email_with_attachment("gone@localhost", "Отчет", "Текст", report)
+    assert sink.messages == []
+
+def test_unreachable_server_reports_failure(report):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    sender = EmailSender("127.0.0.1", "stat2serg@localhost", "secret", port=port, reconnect_attempts=2)
+    statuses = sender.send_message("reports@localhost", "Отчет", "Текст", report)
+    assert statuses["reports@localhost"]["status"] == "failed"
+
+def test_zip_attachment_round_trip(make_sink, report):
+    sink = make_sink()
+    with make_sender(sink, compression="zip") as sender:
+        sender.send_message("reports@localhost", "Отчет", "Текст", report)
+    message = email.message_from_bytes(sink.messages[0]["data"])
+    attachment = next(part for part in message.walk() if part.get_filename())
+    assert attachment.get_filename() == "report_20250301_20250308.zip"
+    with zipfile.ZipFile(io.BytesIO(attachment.get_payload(decode=True))) as archive:
+        with open(report, "rb") as f:
+            assert archive.read("report_20250301_20250308.csv") == f.read()
+
+def test_long_subject_folded_with_crlf(make_sink, report):
+    subject = "Ежедневный отчет о событиях доступа за указанный период по всем устройствам"
+    sender = EmailSender("127.0.0.1", "stat2serg@localhost", "secret")
+    data = b"".join(sender.message_chunks("reports@localhost", subject, "Текст", report))
+    assert data.count(b"\n") == data.count(b"\r\n")
+    sink = make_sink()
+    with make_sender(sink) as sender:
+        assert sender.send_email_with_attachment("reports@localhost", subject, "Текст", report)
+    message = email.message_from_bytes(sink.messages[0]["data"])
+    assert str(make_header(decode_header(message["Subject"]))) == subject
+    assert message.get_content_type() == "multipart/mixed"
+
+def test_non_ascii_attachment_name(make_sink, tmp_path):
+    path = tmp_path / "отчет_20250301.csv"
+    path.write_text("Time,Device Name\n2025-03-01 09:00:00,Door 1\n", encoding="utf-8")
+    sink = make_sink()
+    with make_sender(sink) as sender:
+        assert sender.send_email_with_attachment("reports@localhost", "Отчет", "Текст", str(path))
+    message = email.message_from_bytes(sink.messages[0]["data"])
+    attachment = next(part for part in message.walk() if part.get_filename())
+    assert attachment.get_filename() == "отчет_20250301.csv"
+    assert attachment.get_payload(decode=True) == path.read_bytes()
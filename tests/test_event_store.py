@@ -0,0 +1,98 @@
+import csv
+import threading
+import time
+import pytest
+import event_store
+from event_store import EventStore, ingest_export
+
+HEADER = ["event_time", "device_name", "event_point", "person_id", "last_name", "first_name", "Temperature"]
+
+def write_export(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+    return str(path)
+
+def row(day, person="1001", last_name="Иванов", hour=9):
+    return [f"2025-03-{day:02d} {hour:02d}:00:00", "Door 1", "Door 1-1", person, last_name, "Иван", "36.6"]
+
+@pytest.fixture
+def store(tmp_path):
+    db = EventStore(str(tmp_path / "events.sqlite3"))
+    yield db
+    db.close()
+
+def test_reingest_updates_instead_of_duplicating(tmp_path, store):
+    first = write_export(tmp_path / "a.csv", [row(1), row(2)])
+    assert store.ingest(first) == 2
+    second = write_export(tmp_path / "b.csv", [row(2, last_name="Иванова"), row(3)])
+    assert store.ingest(second) == 2
+    events = store.query()
+    assert [event["event_time"] for event in events] == [
+        "2025-03-01T09:00:00", "2025-03-02T09:00:00", "2025-03-03T09:00:00"
+    ]
+    assert events[1]["last_name"] == "Иванова"
+
+def test_query_filters(tmp_path, store):
+    store.ingest(write_export(tmp_path / "a.csv", [row(1), row(2, person="1002", last_name="Петров"), row(3)]))
+    # Конец периода без времени — весь день
+    assert len(store.query(start="2025-03-02", end="2025-03-03")) == 2
+    assert [event["person_id"] for event in store.query(name="Петр")] == ["1002"]
+    assert len(store.query(person="1001", limit=1)) == 1
+    people = {person["person_id"]: person["events"] for person in store.people()}
+    assert people == {"1001": 2, "1002": 1}
+
+def test_file_without_time_column(tmp_path, store):
+    path = tmp_path / "bad.csv"
+    path.write_text("device_name,person_id\nDoor 1,1001\n", encoding="utf-8")
+    assert store.ingest(str(path)) is None
+    assert store.query() == []
+
+class _SlowConnection:
+    """
+    Соединение, которое держит транзакцию записи дольше busy timeout второго писателя.
+    """
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    def executemany(self, sql, rows):
+        result = self._conn.executemany(sql, rows)
+        time.sleep(0.3)
+        return result
+
+def test_concurrent_ingest_is_serialised(tmp_path, monkeypatch):
+    """
+    Потоки обработки конвейера загружают файлы одновременно: второй писатель
+    не должен получать 'database is locked' и терять файл.
+    """
+    class SlowStore(EventStore):
+        def __init__(self, path):
+            super().__init__(path, batch_size=1, timeout=0.1)
+            self.conn = _SlowConnection(self.conn)
+
+    monkeypatch.setattr(event_store, "EventStore", SlowStore)
+    db_path = str(tmp_path / "events.sqlite3")
+    files = [write_export(tmp_path / f"{index}.csv", [row(index + 1, person=str(1000 + index))]) for index in range(3)]
+    results = {}
+    threads = [threading.Thread(target=lambda path=path: results.update({path: ingest_export(path, db_path)}))
+               for path in files]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {path: 1 for path in files}
+    store = EventStore(db_path)
+    try:
+        assert len(store.query()) == 3
+    finally:
+        store.close()
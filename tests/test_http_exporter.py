@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+pytest.importorskip("requests")
+import http_exporter
+from http_exporter import HttpExporter
+from mock_zkbio import MockSettings, MockZKBioServer
+from run_metrics import NULL_SPAN
+from session_cache import SessionCookieCache
+
+class BrokenExportHandler(BaseHTTPRequestHandler):
+    """
+    Экспорт, который отвечает 200, но не файлом: JSON с ошибкой, HTML-страница
+    или обрыв соединения посреди потока.
+    """
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        mode = self.server.mode
+        if mode == "json":
+            self._reply(json.dumps({"ret": "error", "msg": "export failed"}).encode("utf-8"), "application/json")
+        elif mode == "html":
+            self._reply("<html><body>Внутренняя ошибка</body></html>".encode("utf-8"), "text/html; charset=utf-8")
+        else:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv")
+            self.send_header("Content-Disposition", 'attachment; filename="Transaction.csv"')
+            self.send_header("Content-Length", "100000")
+            self.end_headers()
+            self.wfile.write(b"Time,Device Name\n" * 100)
+            self.wfile.flush()
+            self.close_connection = True
+
+    def _reply(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+@pytest.fixture
+def mock_server(monkeypatch):
+    server = MockZKBioServer(MockSettings(rows=200)).start()
+    monkeypatch.setattr(http_exporter, "LOGIN_URL", f"{server.base_url}/bioLogin.do")
+    monkeypatch.setattr(http_exporter, "EXPORT_URL", f"{server.base_url}/accTransaction.do?export")
+    monkeypatch.setattr(http_exporter, "SESSION_CHECK_URL", f"{server.base_url}/main.do")
+    monkeypatch.setattr(http_exporter, "USERNAME", "admin")
+    monkeypatch.setattr(http_exporter, "PASSWORD", "admin")
+    yield server
+    server.stop()
+
+@pytest.fixture
+def broken_export(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BrokenExportHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(http_exporter, "EXPORT_URL", f"http://127.0.0.1:{server.server_address[1]}/export")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def make_exporter(tmp_path):
+    download_dir = tmp_path / "downloads"
+    download_dir.mkdir(exist_ok=True)
+    return HttpExporter(str(download_dir), session_cache_path=str(tmp_path / "session.json"))
+
+def test_export_saves_attachment(mock_server, tmp_path):
+    exporter = make_exporter(tmp_path)
+    assert exporter.login()
+    file_path = exporter.export("2025-03-01 00:00:00", "2025-03-02 00:00:00", "CSV")
+    exporter.close()
+    assert os.path.basename(file_path).startswith("Transaction_") and file_path.endswith(".csv")
+    assert os.listdir(os.path.dirname(file_path)) == [os.path.basename(file_path)]
+
+@pytest.mark.parametrize("mode", ["json", "html"])
+def test_non_file_response_rejected(broken_export, tmp_path, mode):
+    broken_export.mode = mode
+    exporter = make_exporter(tmp_path)
+    assert exporter.export("2025-03-01 00:00:00", "2025-03-02 00:00:00", "CSV") is None
+    assert os.listdir(exporter.download_dir) == []
+
+def test_broken_stream_leaves_no_part_file(broken_export, tmp_path):
+    broken_export.mode = "truncated"
+    exporter = make_exporter(tmp_path)
+    assert exporter.export("2025-03-01 00:00:00", "2025-03-02 00:00:00", "CSV") is None
+    assert os.listdir(exporter.download_dir) == []
+
+def test_batch_falls_back_to_browser(mock_server, broken_export, tmp_path):
+    """
+    Ответ 200 без файла не считается выгрузкой: период выгружается через браузер.
+    """
+    pytest.importorskip("selenium")
+    from batch import BatchRunner
+
+    class FakeAuthWorker:
+        download_dir = str(tmp_path)
+        session_cache = SessionCookieCache(str(tmp_path / "session.json"), 3600)
+        metrics = None
+
+        @contextmanager
+        def stage(self, name):
+            yield NULL_SPAN
+
+        def cleanup(self):
+            pass
+
+    class BrowserRunner(BatchRunner):
+        def _export_selenium(self, start_dt, end_dt, report_type=None):
+            path = os.path.join(self.download_dir, "Transaction_browser.csv")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("Time,Device Name\n")
+            return path
+
+    broken_export.mode = "json"
+    runner = BrowserRunner([], use_http=True, auth_worker=FakeAuthWorker(), chunk_span=None)
+    runner.date_selector = object()
+    file_path, method = runner.export_range(datetime(2025, 3, 1), datetime(2025, 3, 2))
+    runner.close()
+    assert method == "selenium"
+    assert os.path.basename(file_path) == "report_20250301_20250302.csv"
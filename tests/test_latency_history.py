@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+import latency_history
+from latency_history import LatencyHistory, range_stage, record_timeout
+
+def make_history(tmp_path, **kwargs):
+    options = dict(window=20, min_samples=5, fraction=0.95, factor=1.5, margin=2,
+                   bounds={"ok_button": (5, 120), "download": (30, 900)})
+    options.update(kwargs)
+    return LatencyHistory(str(tmp_path / "latency_history.json"), **options)
+
+def test_default_until_enough_samples(tmp_path):
+    history = make_history(tmp_path)
+    assert history.timeout("ok_button", 20) == 20
+    assert history.timeout("ok_button", 1) == 5
+    for _ in range(5):
+        history.record("ok_button", 1.0)
+    assert history.timeout("ok_button", 20) == 5
+
+def test_timeouts_grow_on_slow_server(tmp_path, monkeypatch):
+    """
+    Если ожидание каждый раз истекает, таймаут должен расти, а не оставаться
+    выученным по быстрым дням.
+    """
+    history = make_history(tmp_path)
+    monkeypatch.setattr(latency_history, "get_latency_history", lambda: history)
+    for _ in range(10):
+        history.record("ok_button", 1.0)
+    timeouts = [history.timeout("ok_button", 20)]
+    for _ in range(20):
+        record_timeout("ok_button", timeouts[-1])
+        timeouts.append(history.timeout("ok_button", 20))
+    assert timeouts[0] == 5
+    assert timeouts == sorted(timeouts) and timeouts[-1] > timeouts[0]
+    assert timeouts[-1] == 120
+
+def test_range_stage_uses_base_bounds(tmp_path):
+    history = make_history(tmp_path)
+    start = datetime(2025, 3, 1)
+    assert range_stage("download", start, start + timedelta(days=1)) == "download:1d"
+    assert range_stage("download", start, start + timedelta(days=5)) == "download:7d"
+    assert range_stage("download", start, start + timedelta(days=90)) == "download:long"
+    assert history.timeout("download:7d", 10) == 30
+    for _ in range(5):
+        history.record("download:7d", 1000)
+    assert history.timeout("download:7d", 10) == 900
+
+def test_flush_merges_with_other_processes(tmp_path):
+    first, second = make_history(tmp_path), make_history(tmp_path)
+    first.record("ok_button", 1.0)
+    second.record("ok_button", 2.0)
+    first.flush()
+    second.flush()
+    assert make_history(tmp_path).samples["ok_button"] == [1.0, 2.0]
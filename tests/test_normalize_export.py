@@ -0,0 +1,71 @@
+import csv
+from datetime import datetime
+import pytest
+from normalize_export import normalize_export, canonical_name, to_iso_time, to_identifier
+
+def read_csv(path):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return list(csv.reader(f))
+
+@pytest.mark.parametrize("value, expected", [
+    ("2025-03-01 08:15:00", "2025-03-01T08:15:00"),
+    ("01.03.2025 08:15:00", "2025-03-01T08:15:00"),
+    ("2025/03/01 08:15:00", "2025-03-01T08:15:00"),
+    (datetime(2025, 3, 1, 8, 15, 0, 500), "2025-03-01T08:15:00"),
+    (45717.34375, "2025-03-01T08:15:00"),
+    ("не дата", "не дата"),
+])
+def test_to_iso_time(value, expected):
+    assert to_iso_time(value) == expected
+
+@pytest.mark.parametrize("value, expected", [(1001.0, "1001"), ("1001.0", "1001"), ("00123", "00123"), (None, "")])
+def test_to_identifier(value, expected):
+    assert to_identifier(value) == expected
+
+def test_canonical_name_both_locales():
+    assert canonical_name("Personnel ID") == "person_id"
+    assert canonical_name("﻿Время") == "event_time"
+    assert canonical_name("  Имя   устройства ") == "device_name"
+    assert canonical_name("Custom Field #2") == "custom_field_2"
+
+def test_csv_with_title_lines_semicolon_cp1251(tmp_path):
+    source = tmp_path / "export.csv"
+    lines = [
+        "Отчет о событиях доступа",
+        "Период: 2025-03-01 - 2025-03-02",
+        "Время;Имя устройства;ID персонала;Фамилия",
+        "2025-03-01 08:15:00;Дверь 1;1001;Иванов",
+        "01.03.2025 18:40:00;Дверь 1;1001;Иванов",
+    ]
+    source.write_bytes(("\r\n".join(lines) + "\r\n").encode("cp1251"))
+    output_path, stats = normalize_export(str(source))
+    assert stats["rows"] == 2
+    assert read_csv(output_path) == [
+        ["event_time", "device_name", "person_id", "last_name"],
+        ["2025-03-01T08:15:00", "Дверь 1", "1001", "Иванов"],
+        ["2025-03-01T18:40:00", "Дверь 1", "1001", "Иванов"],
+    ]
+
+def test_html_table_with_duplicate_columns(tmp_path):
+    source = tmp_path / "export.xls"
+    source.write_text(
+        "<html><body><table>"
+        "<tr><td>Transaction report</td></tr>"
+        "<tr><th>Time</th><th>Device Name</th><th>Name</th><th>Name</th></tr>"
+        "<tr><td>2025-03-01 08:15:00</td><td>Door 1</td><td>Ivan</td><td>Petrov</td></tr>"
+        "</table></body></html>",
+        encoding="utf-8",
+    )
+    output_path, stats = normalize_export(str(source), str(tmp_path / "out.csv"))
+    assert stats["format"] == "html"
+    assert read_csv(output_path) == [
+        ["event_time", "device_name", "first_name", "first_name_2"],
+        ["2025-03-01T08:15:00", "Door 1", "Ivan", "Petrov"],
+    ]
+
+def test_file_without_header_row(tmp_path):
+    source = tmp_path / "export.csv"
+    source.write_text("a,b,c\n1,2,3\n", encoding="utf-8")
+    output_path, _ = normalize_export(str(source))
+    assert output_path is None
+    assert not (tmp_path / "export.normalized.csv.part").exists()
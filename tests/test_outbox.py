@@ -0,0 +1,103 @@
+import time
+import pytest
+from outbox import Outbox, OutboxWorker
+
+@pytest.fixture
+def outbox(tmp_path):
+    box = Outbox(str(tmp_path / "outbox.sqlite3"), max_attempts=3, backoff_base=60, backoff_max=600, lease_seconds=30)
+    yield box
+    box.close()
+
+def enqueue(outbox, key="report-1", file_path="/tmp/report.csv"):
+    return outbox.enqueue(key, file_path, "2025-03-01 00:00:00", "2025-03-08 00:00:00", ["a@example.com"])
+
+def status(outbox, item_id):
+    return next(item for item in outbox.items() if item["id"] == item_id)
+
+def test_claim_then_sent(outbox):
+    item_id, state = enqueue(outbox)
+    assert state == "pending"
+    item = outbox.claim()
+    assert item["id"] == item_id and item["recipients"] == ["a@example.com"]
+    assert status(outbox, item_id)["status"] == "sending"
+    # Письмо в аренде повторно не выдается
+    assert outbox.claim() is None
+    outbox.mark_sent(item_id, {"a@example.com": {"status": "sent"}})
+    assert status(outbox, item_id)["status"] == "sent"
+    assert outbox.counts() == {"sent": 1}
+
+def test_failures_back_off_then_dead(outbox):
+    item_id, _ = enqueue(outbox)
+    outbox.claim()
+    assert outbox.mark_failed(item_id, "relay down") == "pending"
+    # Следующая попытка только после паузы
+    assert outbox.claim() is None
+    assert 40 < outbox.next_due() < 80
+    outbox.mark_failed(item_id, "relay down")
+    assert outbox.mark_failed(item_id, "relay down") == "dead"
+    record = status(outbox, item_id)
+    assert (record["status"], record["attempts"], record["error"]) == ("dead", 3, "relay down")
+    assert outbox.next_due() is None
+
+def test_requeue_only_dead(outbox):
+    item_id, _ = enqueue(outbox)
+    assert not outbox.requeue(item_id)
+    for _ in range(3):
+        outbox.mark_failed(item_id, "relay down")
+    assert outbox.requeue(item_id)
+    record = status(outbox, item_id)
+    assert (record["status"], record["attempts"]) == ("pending", 0)
+
+def test_enqueue_is_idempotent(outbox):
+    item_id, _ = enqueue(outbox)
+    assert enqueue(outbox, file_path="/tmp/report-v2.csv") == (item_id, "pending")
+    assert status(outbox, item_id)["file"] == "/tmp/report-v2.csv"
+    outbox.claim()
+    outbox.mark_sent(item_id, {})
+    # Уже отправленное письмо не отправляется снова
+    assert enqueue(outbox) == (item_id, "sent")
+    assert outbox.claim() is None
+
+def test_enqueue_revives_dead_item(outbox):
+    item_id, _ = enqueue(outbox)
+    for _ in range(3):
+        outbox.mark_failed(item_id, "relay down")
+    assert enqueue(outbox) == (item_id, "pending")
+    assert status(outbox, item_id)["attempts"] == 0
+
+def test_expired_lease_is_claimed_again(outbox):
+    item_id, _ = enqueue(outbox)
+    outbox.claim()
+    # Процесс упал посреди отправки: аренда истекла
+    with outbox.conn:
+        outbox.conn.execute("UPDATE outbox SET lease_until = ? WHERE id = ?", (time.time() - 1, item_id))
+    assert outbox.claim()["id"] == item_id
+
+def test_worker_delivers_and_retries(tmp_path, outbox):
+    report = tmp_path / "report.csv"
+    report.write_text("Time\n")
+    calls = []
+
+    def deliver(item):
+        calls.append(item["id"])
+        if len(calls) == 1:
+            return {"a@example.com": {"status": "failed", "reply": "relay down"}}
+        return {"a@example.com": {"status": "sent"}}
+
+    outbox.backoff_base = 0.05
+    worker = OutboxWorker(outbox, deliver, poll_interval=0.05).start()
+    try:
+        item_id, _ = enqueue(outbox, file_path=str(report))
+        assert worker.drain(timeout=5)
+    finally:
+        worker.stop()
+    assert calls == [item_id, item_id]
+    record = status(outbox, item_id)
+    assert (record["status"], record["attempts"]) == ("sent", 2)
+
+def test_worker_marks_missing_file_failed(outbox):
+    worker = OutboxWorker(outbox, lambda item: pytest.fail("файла нет, отправлять нечего"))
+    item_id, _ = enqueue(outbox, file_path="/nonexistent/report.csv")
+    worker._process(outbox.claim())
+    record = status(outbox, item_id)
+    assert record["status"] == "pending" and "не найден" in record["error"]
@@ -0,0 +1,80 @@
+import csv
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pytest
+from run_metrics import NULL_SPAN
+from download_watcher import wait_for_download_polling
+
+pytest.importorskip("selenium")
+pytest.importorskip("requests")
+import main
+import pipeline as pipeline_module
+from batch import BatchRunner
+from pipeline import ExportPipeline
+
+ROWS_PER_REPORT = 20000
+
+class FakeAuthWorker:
+    def __init__(self, download_dir):
+        self.download_dir = download_dir
+        self.metrics = None
+
+    @contextmanager
+    def stage(self, name):
+        yield NULL_SPAN
+
+    def cleanup(self):
+        pass
+
+class BrowserLikeRunner(BatchRunner):
+    """
+    Выгрузка как у браузера: снимок папки, затем файл появляется под временным
+    именем и переименовывается, а загрузка определяется по новым файлам в папке.
+    """
+    def __init__(self, download_dir):
+        super().__init__([], use_http=False, auth_worker=FakeAuthWorker(download_dir), chunk_span=None)
+        self.date_selector = object()
+
+    def _export_selenium(self, start_dt, end_dt, report_type=None):
+        initial_files = os.listdir(self.download_dir)
+        marker = start_dt.strftime("%Y-%m-%d")
+
+        def download():
+            time.sleep(0.5)
+            partial = os.path.join(self.download_dir, "export.csv.crdownload")
+            with open(partial, "w", encoding="utf-8", newline="") as f:
+                f.write("Time,Device Name,Personnel ID,Last Name\n")
+                for index in range(ROWS_PER_REPORT):
+                    f.write(f"{marker} 08:00:00,Door 1,{index},{marker}\n")
+            os.replace(partial, os.path.join(self.download_dir, "export.csv"))
+
+        threading.Thread(target=download, daemon=True).start()
+        return wait_for_download_polling(self.download_dir, initial_files, timeout=20, check_interval=0.01)
+
+def test_pipeline_browser_download_keeps_files_apart(tmp_path, monkeypatch):
+    """
+    Нормализованный файл предыдущего периода появляется, пока ждется загрузка
+    следующего, и не должен быть принят за нее.
+    """
+    monkeypatch.setattr(main, "EVENT_STORE_ENABLED", False)
+    monkeypatch.setattr(main, "NORMALIZE_EXPORTS", True)
+    monkeypatch.setattr(pipeline_module, "PIPELINE_TEXTFILE_PATH", None)
+    download_dir = str(tmp_path)
+    start = datetime(2025, 3, 1)
+    jobs = [(start + timedelta(days=day), start + timedelta(days=day + 1), None) for day in range(3)]
+    pipeline = ExportPipeline(jobs, send=False, runner=BrowserLikeRunner(download_dir))
+    pipeline.run(report_interval=60)
+
+    for job in pipeline.jobs:
+        marker = job.start_dt.strftime("%Y-%m-%d")
+        assert job.entry["status"] == "ok", job.entry
+        assert os.path.dirname(job.entry["source_file"]) == download_dir
+        with open(job.entry["source_file"], encoding="utf-8") as f:
+            assert f"Door 1,0,{marker}\n" in f.read()
+        with open(job.entry["file"], encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+        assert len(rows) == ROWS_PER_REPORT
+        assert {row["last_name"] for row in rows} == {marker}
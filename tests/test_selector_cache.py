@@ -0,0 +1,48 @@
+import json
+import pytest
+
+pytest.importorskip("selenium")
+from selector_cache import SelectorCache
+
+def make_cache(tmp_path, server="10.0.0.5", locale="ru"):
+    return SelectorCache(str(tmp_path / "selector_cache.json"), server, locale)
+
+def test_winner_goes_first(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.remember("search", "Поиск")
+    assert cache.order("search", [("Search", 1), ("Поиск", 2)]) == [("Поиск", 2), ("Search", 1)]
+    assert make_cache(tmp_path).preferred("search") == "Поиск"
+    assert make_cache(tmp_path, locale="en").preferred("search") is None
+
+def test_hits_survive_restarts_and_trigger_retry(tmp_path):
+    """
+    За запуск дата ставится всего пару раз: проверка вытесненного варианта должна
+    наступить по счетчику, накопленному за несколько запусков.
+    """
+    retries = []
+    for run in range(10):
+        cache = make_cache(tmp_path)
+        for _ in range(2):
+            if cache.due_for_retry("date_input", 5):
+                retries.append(run)
+            cache.remember("date_input", "click_walk")
+    assert make_cache(tmp_path).entries["date_input"]["hits"] == 20
+    assert retries == [2, 5, 7]
+
+def test_parallel_processes_add_up_hits(tmp_path):
+    first, second = make_cache(tmp_path), make_cache(tmp_path)
+    first.remember("date_input", "calendar_api")
+    second.remember("date_input", "calendar_api")
+    first.remember("date_input", "calendar_api")
+    second.remember("date_input", "calendar_api")
+    assert make_cache(tmp_path).entries["date_input"]["hits"] == 4
+
+def test_new_strategy_resets_and_forget_removes(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.remember("date_input", "calendar_api")
+    cache.remember("date_input", "calendar_api")
+    cache.remember("date_input", "click_walk")
+    assert make_cache(tmp_path).entries["date_input"]["hits"] == 1
+    cache.forget("date_input")
+    with open(tmp_path / "selector_cache.json", encoding="utf-8") as f:
+        assert json.load(f)["10.0.0.5|ru"] == {}
@@ -10,8 +10,39 @@ from datetime import datetime
 logger = logging.getLogger("stat2serg_logger")
 
 class DateSelector:
-    def __init__(self, driver):
+    def __init__(self, driver, set_date_script=None):
+        """
+        :param set_date_script: Скрипт установки даты через API календаря (SET_DATE_SCRIPT
+            из calendar_script.py в корне проекта). Без него дата выбирается кликами по календарю.
+        """
         self.driver = driver
+        self.set_date_script = set_date_script
+
+    def set_date_via_api(self, title, date_time_str):
+        """
+        Быстрый путь: устанавливает дату через API dhtmlxCalendar одним вызовом
+        и проверяет дату, которую принял календарь. Время не зависит от удаленности месяца.
+        :param title: Заголовок поля ввода.
+        :param date_time_str: Строка с датой и временем в формате 'YYYY-MM-DD HH:MM:SS'.
+        """
+        target_dt = datetime.strptime(date_time_str, "%Y-%m-%d %H:%M:%S")
+        parts = [target_dt.year, target_dt.month, target_dt.day, target_dt.hour, target_dt.minute, target_dt.second]
+        try:
+            result = self.driver.execute_script(self.set_date_script, title, parts, date_time_str) or {}
+        except WebDriverException as e:
+            logger.warning(f"Не удалось установить дату через API календаря: {e}")
+            return False
+
+        status = result.get("status")
+        if status != "ok":
+            logger.info(f"Быстрая установка даты недоступна ({status}). Используем навигацию по календарю.")
+            return False
+        # Секунды календарь может не хранить: сравниваем с точностью до минуты
+        if (result.get("calendar") or [])[:5] != parts[:5]:
+            logger.warning(f"Календарь принял дату {result.get('calendar')}, ожидалось '{date_time_str}'.")
+            return False
+        logger.info(f"✅ Дата '{result.get('input')}' установлена через API календаря для поля '{title}'.")
+        return True
 
     def select_date_and_time(self, title, date_time_str):
         """
@@ -19,6 +50,9 @@ class DateSelector:
         :param title: Заголовок поля ввода ('Время с' или 'Время до').
         :param date_time_str: Строка с датой и временем в формате 'YYYY-MM-DD HH:MM:SS'.
         """
+        if self.set_date_script and self.set_date_via_api(title, date_time_str):
+            return True
+
         try:
             target_dt = datetime.strptime(date_time_str, "%Y-%m-%d %H:%M:%S")
             logger.info(f"Начинаем процесс выбора даты: {target_dt.strftime('%Y-%m-%d')} для поля с заголовком '{title}'")
@@ -2,6 +2,7 @@ import logging
 import time
 import os
 import re
+import sys
 from date_selector import DateSelector
 from email_sender import EmailSender
 from datetime import datetime, timedelta
@@ -273,12 +274,17 @@ def find_new_file(download_dir, initial_files, timeout=60, check_interval=1):
     return None
 
 if __name__ == "__main__":
+    # Скрипт календаря общий с основной версией и лежит в корне проекта. Каталог v02
+    # остается первым в sys.path, чтобы config и остальные модули брались отсюда
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from calendar_script import SET_DATE_SCRIPT
+
     auth_worker = AuthWorker()
     if auth_worker.login():
         logger.info("Авторизация прошла успешно. Переходим к экспорту.")
         time.sleep(15)
         driver = auth_worker.get_driver()
-        date_selector = DateSelector(driver)
+        date_selector = DateSelector(driver, set_date_script=SET_DATE_SCRIPT)
 
         now = datetime.now()
         days_since_monday = now.weekday()
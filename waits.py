@@ -0,0 +1,163 @@
+import logging
+import time
+from latency_history import adaptive_timeout, record_latency, record_timeout
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException, StaleElementReferenceException, WebDriverException
+
+logger = logging.getLogger("stat2serg_logger")
+
+# Условия ожидания в стиле expected_conditions: каждая функция возвращает
+# callable(driver), который возвращает истинное значение, когда страница готова.
+
+CALENDAR_XPATH = "//div[contains(@class, 'dhtmlxcalendar_dhx_web')]"
+MONTH_LABEL_XPATH = ".//span[contains(@class, 'dhtmlxcalendar_month_label_month')]"
+YEAR_LABEL_XPATH = ".//span[contains(@class, 'dhtmlxcalendar_month_label_year')]"
+
+_PAGE_IDLE_JS = """
+return document.readyState === 'complete'
+    && (!window.jQuery || window.jQuery.active === 0);
+"""
+
+_GRID_LOADED_JS = """
+if (document.readyState !== 'complete') { return false; }
+if (window.jQuery && window.jQuery.active > 0) { return false; }
+var busy = document.querySelectorAll('.dhx_loading, .dhxgrid_loading, .dhx_cell_progress_bar, .dhx_cell_progress_img');
+for (var i = 0; i < busy.length; i++) {
+    if (busy[i].offsetParent !== null) { return false; }
+}
+return true;
+"""
+
+_OVERLAY_GONE_JS = """
+var covers = document.querySelectorAll('.dhxwin_fr_cover');
+for (var i = 0; i < covers.length; i++) {
+    if (covers[i].offsetParent !== null && getComputedStyle(covers[i]).display !== 'none') { return false; }
+}
+return true;
+"""
+
+def page_idle():
+    """Документ загружен и нет активных AJAX-запросов jQuery."""
+    def _predicate(driver):
+        return driver.execute_script(_PAGE_IDLE_JS)
+    return _predicate
+
+def grid_loaded():
+    """dhtmlx-грид закончил загрузку: нет AJAX-запросов и видимых индикаторов загрузки."""
+    def _predicate(driver):
+        return driver.execute_script(_GRID_LOADED_JS)
+    return _predicate
+
+def overlay_gone():
+    """Оверлей модального окна .dhxwin_fr_cover отсутствует или скрыт."""
+    def _predicate(driver):
+        return driver.execute_script(_OVERLAY_GONE_JS)
+    return _predicate
+
+def visible_calendar():
+    """Возвращает первый видимый dhtmlx-календарь."""
+    def _predicate(driver):
+        for calendar in driver.find_elements(By.XPATH, CALENDAR_XPATH):
+            try:
+                if calendar.is_displayed():
+                    return calendar
+            except StaleElementReferenceException:
+                continue
+        return False
+    return _predicate
+
+def calendar_label(calendar):
+    month = calendar.find_element(By.XPATH, MONTH_LABEL_XPATH).text.strip()
+    year = calendar.find_element(By.XPATH, YEAR_LABEL_XPATH).text.strip()
+    return month, year
+
+def calendar_label_changed(calendar, previous_label):
+    """Подпись месяца/года календаря отличается от previous_label и не пуста."""
+    def _predicate(driver):
+        try:
+            label = calendar_label(calendar)
+        except (StaleElementReferenceException, WebDriverException):
+            return False
+        return label if all(label) and label != previous_label else False
+    return _predicate
+
+def input_value_contains(element, text):
+    """В поле ввода попало значение, содержащее text (например, выбранная дата)."""
+    def _predicate(driver):
+        try:
+            return text in (element.get_attribute("value") or "")
+        except StaleElementReferenceException:
+            return False
+    return _predicate
+
+def combo_value_committed(input_name, expected):
+    """Скрытое поле combo-box (input[name=...]) приняло ожидаемое значение."""
+    def _predicate(driver):
+        value = driver.execute_script(
+            "var el = document.querySelector(\"input[name='\" + arguments[0] + \"']\");"
+            "return el ? el.value : null;", input_name
+        )
+        return value is not None and value.lower() == expected.lower()
+    return _predicate
+
+def first_match(locators, clickable=False):
+    """
+    Первый найденный элемент из списка [(имя, (By, значение)), ...] в порядке списка.
+    Возвращает (имя, элемент). clickable=True — только видимые и активные элементы.
+    """
+    def _predicate(driver):
+        for name, locator in locators:
+            try:
+                for element in driver.find_elements(*locator):
+                    if not clickable or (element.is_displayed() and element.is_enabled()):
+                        return name, element
+            except StaleElementReferenceException:
+                continue
+        return False
+    return _predicate
+
+class Waiter:
+    """
+    Обертка над WebDriverWait: шаг завершается, как только страница готова,
+    вместо фиксированных time.sleep.
+    """
+    def __init__(self, driver, timeout=10, poll_frequency=0.2):
+        self.driver = driver
+        self.timeout = timeout
+        self.poll_frequency = poll_frequency
+
+    def until(self, condition, timeout=None, message="", stage=None):
+        """
+        Ждет выполнения условия и возвращает его результат.
+        При истечении таймаута выбрасывает TimeoutException.
+        :param stage: Имя этапа в истории задержек. Если задано, timeout служит
+                      значением по умолчанию, а фактический берется из истории.
+        """
+        timeout = timeout or self.timeout
+        if stage:
+            timeout = adaptive_timeout(stage, timeout)
+        started = time.time()
+        try:
+            result = WebDriverWait(
+                self.driver, timeout, poll_frequency=self.poll_frequency,
+                ignored_exceptions=(StaleElementReferenceException,)
+            ).until(condition, message)
+        except TimeoutException:
+            if stage:
+                record_timeout(stage, timeout)
+            raise
+        if stage:
+            record_latency(stage, time.time() - started)
+        return result
+
+    def settle(self, condition, timeout=None, description="", stage=None):
+        """
+        Мягкое ожидание: возвращает True/False вместо исключения и пишет предупреждение в лог.
+        """
+        try:
+            self.until(condition, timeout, stage=stage)
+            return True
+        except TimeoutException:
+            logger.warning(f"Не дождались условия '{description}'. Продолжаем.")
+            return False
@@ -0,0 +1,124 @@
+import argparse
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from main import AuthWorker
+from batch import BatchRunner, write_manifest
+from date_ranges import parse_range_spec
+from config import LOGGER_NAME, HTTP_EXPORT_ENABLED
+
+logger = logging.getLogger(LOGGER_NAME)
+
+class ExportJob:
+    def __init__(self, start_dt, end_dt, report_type=None):
+        self.start_dt = start_dt
+        self.end_dt = end_dt
+        self.report_type = report_type
+
+class ExportWorkerPool:
+    """
+    Пул из N браузеров. У каждого воркера свой профиль Chrome, своя папка
+    загрузок и свой кэш сессии, поэтому они не блокируют друг друга.
+    """
+    def __init__(self, workers, download_root=None, profile_root=None, use_http=HTTP_EXPORT_ENABLED, send=False):
+        """
+        :param workers: Количество параллельных браузеров.
+        :param download_root: Корневая папка загрузок; воркер пишет в download_root/worker_N.
+        :param profile_root: Если задан, профили worker_N хранятся там между запусками,
+                             иначе создаются временные и удаляются по завершении.
+        """
+        self.workers = workers
+        self.download_root = download_root or os.path.join(os.path.expanduser("~"), "Downloads", "My_Exports")
+        self.profile_root = profile_root
+        self.use_http = use_http
+        self.send = send
+        self.jobs = queue.Queue()
+        self.results = {}
+        self._lock = threading.Lock()
+
+    def submit(self, start_dt, end_dt, report_type=None):
+        self.jobs.put(ExportJob(start_dt, end_dt, report_type))
+
+    def _profile_dir(self, worker_id):
+        if self.profile_root:
+            path = os.path.join(self.profile_root, f"worker_{worker_id}")
+            os.makedirs(path, exist_ok=True)
+            return path, False
+        return tempfile.mkdtemp(prefix=f"stat2serg_profile_{worker_id}_"), True
+
+    def _worker(self, worker_id):
+        profile_dir, temporary = self._profile_dir(worker_id)
+        download_dir = os.path.join(self.download_root, f"worker_{worker_id}")
+        auth_worker = AuthWorker(
+            download_dir=download_dir,
+            profile_dir=profile_dir,
+            session_cache_path=os.path.join(profile_dir, "session_cookies.json"),
+        )
+        # Пул сам распараллеливает задания, поэтому части периодов внутри воркера не нужны
+        runner = BatchRunner([], send=self.send, use_http=self.use_http, auth_worker=auth_worker, chunk_span=None)
+        results = []
+        try:
+            while True:
+                try:
+                    job = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                logger.info(f"[worker {worker_id}] Период {job.start_dt:%Y-%m-%d} — {job.end_dt:%Y-%m-%d}")
+                entry = runner.run_one(job.start_dt, job.end_dt, job.report_type)
+                entry["worker"] = worker_id
+                results.append(entry)
+        finally:
+            runner.close()
+            if temporary:
+                shutil.rmtree(profile_dir, ignore_errors=True)
+        with self._lock:
+            self.results[worker_id] = results
+
+    def run(self):
+        """
+        Запускает воркеры, дожидается выполнения всех заданий и возвращает
+        результаты по воркерам: {worker_id: [записи манифеста]}.
+        """
+        workers = min(self.workers, self.jobs.qsize()) or 1
+        logger.info(f"Запуск пула: {workers} браузер(ов), заданий: {self.jobs.qsize()}")
+        threads = [
+            threading.Thread(target=self._worker, args=(worker_id,), name=f"export-worker-{worker_id}")
+            for worker_id in range(1, workers + 1)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        manifest = [entry for worker_id in sorted(self.results) for entry in self.results[worker_id]]
+        manifest.sort(key=lambda entry: (entry["start"], entry["report_type"]))
+        write_manifest(manifest, self.download_root, prefix="pool_manifest")
+        return self.results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Параллельная выгрузка отчетов несколькими браузерами.")
+    parser.add_argument("ranges", nargs="+", help="Периоды, как в batch.py: '2025-07-01..2025-10-01 by week'")
+    parser.add_argument("-w", "--workers", type=int, default=3, help="Количество браузеров")
+    parser.add_argument("--report-type", action="append", dest="report_types",
+                        help="Формат отчета (можно указать несколько раз)")
+    parser.add_argument("--profile-root", help="Папка для постоянных профилей воркеров")
+    parser.add_argument("--send", action="store_true", help="Отправлять каждый отчет по почте")
+    parser.add_argument("--no-http", action="store_true", help="Не использовать HTTP-экспорт, только браузер")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    pool = ExportWorkerPool(
+        args.workers, profile_root=args.profile_root,
+        use_http=HTTP_EXPORT_ENABLED and not args.no_http, send=args.send
+    )
+    for spec in args.ranges:
+        for start_dt, end_dt in parse_range_spec(spec):
+            for report_type in args.report_types or [None]:
+                pool.submit(start_dt, end_dt, report_type)
+    results = pool.run()
+    if any(entry["status"] != "ok" for entries in results.values() for entry in entries):
+        raise SystemExit(1)